@@ -0,0 +1,151 @@
+"""
+Battery dispatch: state of charge through a daily or hourly time series.
+
+dispatch() takes per-step solar surplus and household deficit (kWh) and
+returns what goes into the battery, what comes out, and the state of charge
+after every step, with round-trip losses, a depth-of-discharge limit, a
+charge/discharge power limit and carry-over from one step to the next. A
+whole array of candidate capacities is dispatched in one pass: the result
+arrays are (sizes, steps).
+
+State of charge depends on every step before it, but within a run of
+surplus steps it only rises and within a run of deficit steps it only
+falls, so each run is a capped cumulative sum. The sequential part is a
+loop over run totals (about two runs a day), done for every size at once;
+every per-step value is then rebuilt with NumPy.
+
+Hourly series come from hourly_sim; daily_series() turns an average-day
+split (daytime surplus, night-time use) into a two-steps-per-day series.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+# Candidate sizes: the 5 kWh modules the engine prices at RM 3300 each
+BATTERY_MODULE_KWH = 5
+BATTERY_SIZES = np.arange(1, 11) * BATTERY_MODULE_KWH
+
+# Defaults: LFP round trip, usable depth of discharge, max kW per kWh of capacity
+ROUND_TRIP_EFFICIENCY = 0.9
+DEPTH_OF_DISCHARGE = 0.9
+C_RATE = 0.5
+
+
+@dataclass(frozen=True)
+class Dispatch:
+    """kWh per step for each capacity; arrays are capacity.shape + (steps,)."""
+    capacity_kwh: np.ndarray
+    charge: np.ndarray          # surplus sent to the battery
+    discharge: np.ndarray       # battery energy delivered to the household
+    soc: np.ndarray             # usable kWh stored at the end of each step
+
+    def cycles(self):
+        """Equivalent full cycles over the series, per capacity (0 for a zero capacity)."""
+        delivered = self.discharge.sum(axis=-1)
+        capacity = np.where(self.capacity_kwh > 0, self.capacity_kwh, 1.0)
+        return np.where(self.capacity_kwh > 0, delivered / capacity, 0.0)
+
+
+def daily_series(day_surplus_kwh, night_use_kwh, day_shortfall_kwh=0.0):
+    """
+    (surplus, deficit) with two steps per day: daytime, then night.
+
+    The daytime step carries the solar surplus, or the shortfall on days
+    when solar doesn't cover daytime use; the night step the night's use.
+    """
+    day_surplus_kwh, night_use_kwh, day_shortfall_kwh = (a.ravel() for a in np.broadcast_arrays(
+        np.asarray(day_surplus_kwh, dtype=float), np.asarray(night_use_kwh, dtype=float),
+        np.asarray(day_shortfall_kwh, dtype=float),
+    ))
+    surplus = np.zeros(day_surplus_kwh.size * 2)
+    deficit = np.zeros_like(surplus)
+    surplus[0::2] = day_surplus_kwh
+    deficit[0::2] = day_shortfall_kwh
+    deficit[1::2] = night_use_kwh
+    return surplus, deficit
+
+
+def _run_start_soc(run_charging, run_flow, usable_kwh):
+    """State of charge at the start of each run, (sizes, runs). Two passes: the second starts in steady state."""
+    if usable_kwh.size == 1:
+        # One size: plain floats are several times faster than 1-element arrays
+        usable, flow = usable_kwh.item(), run_flow[0].tolist()
+        soc = 0.0
+        for _ in range(2):
+            start = []
+            for is_charging, amount in zip(run_charging, flow):
+                start.append(soc)
+                soc = min(usable, soc + amount) if is_charging else max(0.0, soc - amount)
+        return np.array([start])
+
+    usable = usable_kwh[:, 0]
+    columns = list(run_flow.T)
+    start = np.empty_like(run_flow)
+    soc = np.zeros(len(usable))
+    for _ in range(2):
+        for k, (is_charging, amount) in enumerate(zip(run_charging, columns)):
+            start[:, k] = soc
+            soc = np.minimum(usable, soc + amount) if is_charging else np.maximum(0.0, soc - amount)
+    return start
+
+
+def dispatch(surplus, deficit, capacity_kwh, round_trip_efficiency=ROUND_TRIP_EFFICIENCY,
+             depth_of_discharge=DEPTH_OF_DISCHARGE, c_rate=C_RATE, step_hours=1.0):
+    """
+    Dispatch one series for every capacity in capacity_kwh (scalar or 1-D).
+
+    surplus and deficit are kWh per step and at most one of them may be
+    non-zero in any step. Surplus charges the battery up to capacity *
+    depth_of_discharge; deficits are served until it is empty. Each step
+    moves at most capacity * c_rate * step_hours kWh (c_rate=None for no
+    limit) and charging and discharging each lose the square root of the
+    round-trip efficiency. The series is treated as repeating, so it starts
+    from its own steady state rather than from empty.
+    """
+    surplus = np.asarray(surplus, dtype=float)
+    deficit = np.asarray(deficit, dtype=float)
+    if surplus.ndim != 1 or surplus.shape != deficit.shape:
+        raise ValueError("surplus and deficit must be 1-D series of the same length")
+    if np.any((surplus > 0) & (deficit > 0)):
+        raise ValueError("a step cannot have both a surplus and a deficit")
+    capacity = np.asarray(capacity_kwh, dtype=float)
+    if capacity.ndim > 1:
+        raise ValueError("capacity_kwh must be a scalar or a 1-D array of sizes")
+
+    cap = capacity.reshape(-1, 1)
+    usable = cap * depth_of_discharge
+    max_step = np.inf if c_rate is None else cap * (c_rate * step_hours)
+    one_way = round_trip_efficiency ** 0.5
+
+    charging = surplus > 0
+    offer = np.minimum(surplus, max_step) * one_way     # kWh that could go into the battery
+    ask = np.minimum(deficit, max_step) / one_way       # kWh the battery would have to give up
+    flow = np.where(charging, offer, ask)
+
+    new_run = np.empty(len(charging), dtype=bool)
+    new_run[:1] = True
+    np.not_equal(charging[1:], charging[:-1], out=new_run[1:])
+    starts = np.flatnonzero(new_run)
+    lengths = np.diff(np.append(starts, len(charging)))
+
+    start_soc = np.repeat(
+        _run_start_soc(charging[starts].tolist(), np.add.reduceat(flow, starts, axis=1), usable),
+        lengths, axis=1,
+    )
+
+    # Per step: the run's cumulative flow, capped by the room (or charge) it started with
+    cumulative = np.cumsum(flow, axis=1)
+    within_run = cumulative - np.repeat(cumulative[:, starts] - flow[:, starts], lengths, axis=1)
+    moved = np.minimum(within_run, np.where(charging, usable - start_soc, start_soc))
+    previous = np.zeros_like(moved)
+    previous[:, 1:] = moved[:, :-1]
+    previous[:, starts] = 0.0
+    step = np.maximum(moved - previous, 0.0)
+
+    shape = capacity.shape + surplus.shape
+    return Dispatch(
+        capacity_kwh=capacity,
+        charge=np.where(charging, step / one_way, 0.0).reshape(shape),
+        discharge=np.where(charging, 0.0, step * one_way).reshape(shape),
+        soc=np.where(charging, start_soc + moved, start_soc - moved).reshape(shape),
+    )
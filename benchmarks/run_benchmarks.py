@@ -0,0 +1,286 @@
+"""
+Benchmarks for the quote engine, the PDF report and the Streamlit rerun path.
+
+    python benchmarks/run_benchmarks.py                   # run everything, compare with baseline.json
+    python benchmarks/run_benchmarks.py --only batch      # cases whose name contains "batch"
+    python benchmarks/run_benchmarks.py --quick           # fewer repeats, for a fast check
+    python benchmarks/run_benchmarks.py --save-baseline   # make this run the new baseline
+
+Every case runs on a fixed, seeded input corpus (CORPUS_SEED), so two runs
+price exactly the same leads:
+
+    calculate_values          one lead per call
+    quote_batch_1k/100k/1m    quote_batch() over 1,000 / 100,000 / 1,000,000 leads
+    build_pdf                 one report, with the full-page closing image
+    build_pdf_no_closing      the same report without it
+    ui_rerun                  one full main() rerun of solar_calculator.py in AppTest
+    import_*                  cold-start import of a module in a fresh interpreter
+
+Each case reports throughput (items per second), p50 and p99 latency per
+call and the peak Python heap during one call (tracemalloc, which also sees
+NumPy's buffers). Import cases time just the import statement inside the
+new process and report its peak RSS instead. The headless modules in
+LIGHT_IMPORTS must not load any of HEAVY_MODULES (Streamlit, PIL, fpdf,
+pandas, pyarrow); if one does, the run fails. Cases whose throughput falls, or whose p50 or peak memory
+grows, by more than --tolerance against baseline.json are flagged and the
+exit status is 1. Timings only compare on the same machine: save a
+baseline there before comparing.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+CORPUS_SEED = 20240501
+TOLERANCE = 0.25
+
+HEAVY_MODULES = ("streamlit", "PIL", "fpdf", "pandas", "pyarrow")
+LIGHT_IMPORTS = ("solar_engine", "quote_api")
+
+
+def lead_corpus(n, seed=CORPUS_SEED):
+    """n leads as quote_batch() arrays: panels, sunlight hours, bill, daytime share, online view, battery."""
+    from solar_engine import AREA_SUN_MAP, DAYTIME_OPTIONS, PANEL_RANGE
+
+    rng = np.random.default_rng(seed)
+    return (
+        rng.integers(PANEL_RANGE[0], PANEL_RANGE[1] + 1, n).astype(float),
+        rng.choice(np.array(list(AREA_SUN_MAP.values())), n),
+        np.round(rng.uniform(50, 3000, n), 2),
+        rng.choice(np.array(DAYTIME_OPTIONS), n),
+        rng.random(n) < 0.2,
+        rng.random(n) < 0.3,
+    )
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    items: int              # leads or reports per call
+    repeats: int
+    setup: object           # () -> the call to time
+    self_timed: bool = False  # the call returns its own (seconds, peak MiB)
+
+
+def _calculate_values():
+    from solar_engine import calculate_values
+
+    panels, sunlight, bill, daytime, online, _ = lead_corpus(2_000)
+    leads = itertools.cycle(list(zip(panels.astype(int).tolist(), sunlight.tolist(), bill.tolist(),
+                                     daytime.tolist(), online.tolist())))
+    return lambda: calculate_values(*next(leads))
+
+
+def _quote_batch(n):
+    def setup():
+        from solar_engine import quote_batch
+
+        corpus = lead_corpus(n)
+        return lambda: quote_batch(*corpus)
+    return setup
+
+
+def _build_pdf(closing_page):
+    def setup():
+        from pdf_report import build_pdf
+        from report_assets import load_assets
+        from solar_engine import AREA_SUN_MAP, quote, recommend_panels
+
+        load_assets()
+        bill, sunlight = 450.0, AREA_SUN_MAP["Kuala Lumpur"]
+        recommended = recommend_panels(bill, sunlight)
+        c = quote(recommended, sunlight, bill, 0.3, include_battery=True).result
+        return lambda: build_pdf(bill, recommended, recommended, c, closing_page=closing_page)
+    return setup
+
+
+def _ui_rerun():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "solar_calculator.py"), default_timeout=120)
+    at.run()
+    at.text_input(key="bill_input").input("450")
+    at.button[0].click().run()
+    if at.exception:
+        raise RuntimeError(f"solar_calculator.py failed: {at.exception}")
+    return at.run
+
+
+# Runs in a fresh interpreter: times one import and names the heavy modules it pulled in.
+# Peak RSS comes from VmHWM: on Linux ru_maxrss keeps the parent's peak across fork and exec.
+_IMPORT_PROBE = """
+import resource, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = [m for m in {heavy!r} if m in sys.modules]
+try:
+    with open("/proc/self/status") as f:
+        peak_kib = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+except (OSError, StopIteration):
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, peak_kib / 1024, ",".join(heavy) or "-")
+"""
+
+
+def _cold_import(module):
+    def setup():
+        code = _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+
+        def call():
+            out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+            seconds, rss_mib, heavy = out.stdout.split()
+            if module in LIGHT_IMPORTS and heavy != "-":
+                raise RuntimeError(f"import {module} loaded {heavy}; it must stay headless")
+            return float(seconds), float(rss_mib)
+        return call
+    return setup
+
+
+CASES = (
+    Case("calculate_values", 1, 2_000, _calculate_values),
+    Case("quote_batch_1k", 1_000, 200, _quote_batch(1_000)),
+    Case("quote_batch_100k", 100_000, 10, _quote_batch(100_000)),
+    Case("quote_batch_1m", 1_000_000, 3, _quote_batch(1_000_000)),
+    Case("build_pdf", 1, 50, _build_pdf(True)),
+    Case("build_pdf_no_closing", 1, 50, _build_pdf(False)),
+    Case("ui_rerun", 1, 10, _ui_rerun),
+    Case("import_solar_engine", 1, 10, _cold_import("solar_engine"), self_timed=True),
+    Case("import_quote_api", 1, 10, _cold_import("quote_api"), self_timed=True),
+    Case("import_solar_calculator", 1, 5, _cold_import("solar_calculator"), self_timed=True),
+)
+
+
+def run_case(case, repeat_scale=1.0):
+    """{metric: value} for one case: one warm-up call, timed calls, then one traced call for peak memory."""
+    call = case.setup()
+    call()
+    repeats = max(int(case.repeats * repeat_scale), 2)
+    latencies = np.empty(repeats)
+    if case.self_timed:
+        peak_mib = 0.0
+        for i in range(repeats):
+            latencies[i], mib = call()
+            peak_mib = max(peak_mib, mib)
+        peak = peak_mib * 2**20
+    else:
+        for i in range(repeats):
+            started = time.perf_counter()
+            call()
+            latencies[i] = time.perf_counter() - started
+
+        tracemalloc.start()
+        try:
+            call()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "throughput": round(case.items * repeats / latencies.sum(), 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1e3, 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1e3, 4),
+        "peak_mib": round(peak / 2**20, 3),
+        "repeats": repeats,
+    }
+
+
+def regressions(result, baseline, tolerance=TOLERANCE):
+    """Metric names that are more than tolerance worse than the baseline."""
+    worse = []
+    if result["throughput"] < baseline["throughput"] * (1 - tolerance):
+        worse.append("throughput")
+    for metric in ("p50_ms", "peak_mib"):
+        if result[metric] > baseline[metric] * (1 + tolerance):
+            worse.append(metric)
+    return worse
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _change(value, base):
+    return f"{(value / base - 1) * 100:+.0f}%" if base else "n/a"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the quote engine, PDF report and UI rerun.")
+    parser.add_argument("--only", action="append", metavar="TEXT",
+                        help="run cases whose name contains TEXT (repeatable)")
+    parser.add_argument("--quick", action="store_true", help="a fifth of the repeats")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file (default benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run to the baseline file")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help=f"allowed slowdown / growth before a case is flagged (default {TOLERANCE})")
+    parser.add_argument("--json", metavar="FILE", help="also write the results to FILE")
+    args = parser.parse_args(argv)
+
+    cases = [c for c in CASES if not args.only or any(text in c.name for text in args.only)]
+    if not cases:
+        parser.error(f"no case matches {args.only}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    base_cases = baseline.get("cases", {})
+
+    results, flagged = {}, []
+    print(f"{'case':<26}{'items/s':>12}{'p50 ms':>11}{'p99 ms':>11}{'peak MiB':>10}   vs baseline")
+    for case in cases:
+        r = results[case.name] = run_case(case, 0.2 if args.quick else 1.0)
+        line = f"{case.name:<26}{r['throughput']:>12,.0f}{r['p50_ms']:>11.3f}{r['p99_ms']:>11.3f}{r['peak_mib']:>10.2f}"
+        base = base_cases.get(case.name)
+        if base:
+            worse = regressions(r, base, args.tolerance)
+            line += (f"   {_change(r['throughput'], base['throughput'])} items/s, "
+                     f"{_change(r['p50_ms'], base['p50_ms'])} p50, {_change(r['peak_mib'], base['peak_mib'])} peak")
+            if worse:
+                flagged.append(case.name)
+                line += f"   REGRESSION ({', '.join(worse)})"
+        else:
+            line += "   (no baseline)"
+        print(line, flush=True)
+
+    report = {"environment": environment(), "cases": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        # Keep baseline entries for cases this run skipped (--only)
+        report["cases"] = {**base_cases, **results}
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+    elif baseline and baseline.get("environment") != environment():
+        print(f"note: baseline was recorded on {baseline.get('environment')}", file=sys.stderr)
+
+    if flagged and not args.save_baseline:
+        print(f"{len(flagged)} case(s) regressed by more than {args.tolerance:.0%}: {', '.join(flagged)}",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Generate proposal PDFs for a CSV of leads without going through the UI.
+
+    python bulk_proposals.py leads.csv --out proposals/
+    python bulk_proposals.py leads.csv --zip proposals.zip --workers 8
+    python bulk_proposals.py leads.csv --out proposals/ --bands
+
+One row per lead, header required. Columns:
+
+    bill      monthly bill in RM, >= 0 (required)
+    area      one of AREA_SUN_MAP, e.g. "Kuala Lumpur" (default "Default")
+    daytime   daytime usage share, 0-1 or a whole percentage up to 100:
+              0.3 or 30 (default 0.3)
+    panels    whole number of panels, 10-100 (required)
+    battery   include battery storage: 1/0, yes/no, true/false (default no)
+    online    online view pricing (+RM 3000): 1/0, yes/no, true/false (default no)
+    name      optional, used in the PDF file name
+
+The CSV is read lazily and only a bounded number of leads is in flight at a
+time, so memory stays flat however long the file is. Quotes are priced with
+solar_engine.quote() exactly as the proposal UI prices them and rendered with
+build_pdf_from_template() in a process pool. Rows that can't be quoted
+(unknown area, bad numbers) are reported and skipped.
+With --bands each PDF also carries the seeded Monte Carlo P10-P90 savings
+and payback from monte_carlo.uncertainty_bands(), as the UI download does.
+"""
+import argparse
+import csv
+import math
+import os
+import re
+import sys
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from solar_engine import PANEL_RANGE
+
+Lead = namedtuple("Lead", ["row", "name", "bill", "area", "daytime", "panels", "battery", "online"])
+
+TRUE_VALUES = {"1", "y", "yes", "true", "t"}
+FALSE_VALUES = {"", "0", "n", "no", "false", "f"}
+
+
+def _flag(value):
+    value = (value or "").strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"expected yes/no, got {value!r}")
+
+
+def _number(row, name):
+    value = float(row[name])
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number, got {row[name]!r}")
+    return value
+
+
+def parse_lead(row_no, row):
+    """Lead for one csv.DictReader row (header names are case-insensitive). Raises ValueError."""
+    row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+    if not row.get("bill"):
+        raise ValueError("bill is required")
+    if not row.get("panels"):
+        raise ValueError("panels is required")
+
+    bill = _number(row, "bill")
+    if bill < 0:
+        raise ValueError("The monthly bill cannot be negative")
+    panels = _number(row, "panels")
+    if not PANEL_RANGE[0] <= panels <= PANEL_RANGE[1] or panels != int(panels):
+        raise ValueError(f"panels must be a whole number from {PANEL_RANGE[0]} to {PANEL_RANGE[1]}, "
+                         f"got {row['panels']!r}")
+    daytime = float(row.get("daytime") or 0.3)
+    if 1 < daytime <= 100 and daytime == int(daytime):
+        daytime /= 100  # given as a percentage
+    if not 0 <= daytime <= 1:
+        raise ValueError(f"daytime must be a share from 0 to 1 or a whole percentage up to 100, "
+                         f"got {row['daytime']!r}")
+
+    return Lead(
+        row=row_no,
+        name=row.get("name", ""),
+        bill=bill,
+        area=row.get("area") or "Default",
+        daytime=daytime,
+        panels=int(panels),
+        battery=_flag(row.get("battery")),
+        online=_flag(row.get("online")),
+    )
+
+
+def read_leads(path):
+    """Yield (row_no, Lead or None, error) for every data row of the CSV, one at a time."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row_no, row in enumerate(csv.DictReader(f), start=2):  # row 1 is the header
+            try:
+                yield row_no, parse_lead(row_no, row), None
+            except ValueError as e:
+                yield row_no, None, str(e)
+
+
+def pdf_name(lead):
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", lead.name).strip("_")[:60]
+    return f"proposal_{lead.row:06d}{'_' + slug if slug else ''}.pdf"
+
+
+def render_lead(lead, bands=False):
+    """Worker: quote and render one lead. Returns (lead, pdf bytes or None, error or None)."""
+    from monte_carlo import uncertainty_bands
+    from pdf_report import build_pdf_from_template
+    from solar_engine import AREA_SUN_MAP, quote, recommend_panels
+
+    try:
+        if lead.area not in AREA_SUN_MAP:
+            raise ValueError(f"unknown area {lead.area!r}")
+        c = quote(
+            lead.panels, AREA_SUN_MAP[lead.area], lead.bill, lead.daytime,
+            online_view=lead.online, include_battery=lead.battery,
+        ).result
+        if bands:
+            bands = uncertainty_bands(
+                lead.panels, AREA_SUN_MAP[lead.area], lead.bill, lead.daytime,
+                online_view=lead.online, include_battery=lead.battery,
+            )
+        raw_needed = recommend_panels(lead.bill, AREA_SUN_MAP[lead.area])
+        pdf = build_pdf_from_template(lead.bill, raw_needed, lead.panels, c, bands or None)
+        return lead, pdf.getvalue(), None
+    except ValueError as e:
+        return lead, None, str(e)
+
+
+class _DirWriter:
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+    def write(self, name, data):
+        with open(os.path.join(self.path, name), "wb") as f:
+            f.write(data)
+
+    def close(self):
+        pass
+
+
+class _ZipWriter:
+    def __init__(self, path):
+        # PDF streams are already deflated, storing them is as small and much faster
+        self.zf = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED)
+
+    def write(self, name, data):
+        self.zf.writestr(name, data)
+
+    def close(self):
+        self.zf.close()
+
+
+def generate(csv_path, writer, workers=None, max_pending=None, progress_every=100, log=sys.stderr, bands=False):
+    """Render every lead in csv_path through writer; returns a summary dict."""
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    done = failed = nbytes = 0
+    started = time.perf_counter()
+
+    def report_error(row_no, error):
+        print(f"row {row_no}: skipped ({error})", file=log)
+
+    def collect(futures):
+        nonlocal done, failed, nbytes
+        for fut in futures:
+            lead, data, error = fut.result()
+            if error:
+                failed += 1
+                report_error(lead.row, error)
+                continue
+            writer.write(pdf_name(lead), data)
+            done += 1
+            nbytes += len(data)
+            if progress_every and done % progress_every == 0:
+                elapsed = time.perf_counter() - started
+                print(f"{done} PDFs, {done / elapsed:.1f}/s", file=log)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for row_no, lead, error in read_leads(csv_path):
+            if error:
+                failed += 1
+                report_error(row_no, error)
+                continue
+            pending.add(pool.submit(render_lead, lead, bands))
+            if len(pending) >= max_pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(wait(pending)[0])
+
+    elapsed = time.perf_counter() - started
+    return {
+        "pdfs": done,
+        "skipped": failed,
+        "bytes": nbytes,
+        "seconds": elapsed,
+        "pdfs_per_second": done / elapsed if elapsed else 0.0,
+        "workers": workers,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate proposal PDFs for a CSV of leads.")
+    parser.add_argument("csv", help="leads CSV (bill, area, daytime, panels, battery, online[, name])")
+    out = parser.add_mutually_exclusive_group(required=True)
+    out.add_argument("--out", metavar="DIR", help="write one PDF per lead into DIR")
+    out.add_argument("--zip", metavar="FILE", help="write all PDFs into a single zip archive")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--progress-every", type=int, default=100, metavar="N",
+                        help="print progress every N PDFs (0 to disable)")
+    parser.add_argument("--bands", action="store_true",
+                        help="add Monte Carlo P10-P90 saving and payback ranges to each PDF")
+    args = parser.parse_args(argv)
+
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    writer = _ZipWriter(args.zip) if args.zip else _DirWriter(args.out)
+    try:
+        summary = generate(args.csv, writer, args.workers, progress_every=args.progress_every, bands=args.bands)
+    finally:
+        writer.close()
+
+    print(
+        f"{summary['pdfs']} PDFs ({summary['bytes'] / 1e6:.1f} MB) in {summary['seconds']:.1f}s "
+        f"with {summary['workers']} workers: {summary['pdfs_per_second']:.1f} PDFs/s, "
+        f"{summary['skipped']} rows skipped"
+    )
+    return 1 if summary["skipped"] and not summary["pdfs"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+25-year cash-flow projection for quotes.
+
+The engine's ROI is one year's saving against the price. project() and
+project_batch() instead build the yearly cash flows over PROJECTION_YEARS:
+
+    saving   the quote's yearly saving, falling with panel degradation and
+             rising with tariff escalation
+    O&M      the quote's om_fee_monthly (1% of the solar price a year),
+             escalating with inflation
+    payment  the cash price up front (year 0), or the 48 instalments of the
+             4-year 8% plan spread over years 1-4
+
+and report NPV, IRR, discounted payback and the yearly table. Every step is
+array math over all quotes at once, looping only over the 25 years, so
+100k quotes take well under a second.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+PROJECTION_YEARS = 25
+DISCOUNT_RATE = 0.05
+DEGRADATION_RATE = 0.005       # panel output lost per year
+TARIFF_ESCALATION = 0.02       # tariff increase per year
+OM_ESCALATION = 0.03           # O&M cost increase per year
+INSTALLMENT_MONTHS = 48
+PAYMENTS = ("cash", "installment")
+
+_IRR_ITERATIONS = 50
+_IRR_TOLERANCE = 1e-10
+
+
+def cash_flows(yearly_saving, om_yearly, cost_cash, installment_monthly, payment="cash",
+               years=PROJECTION_YEARS, degradation_rate=DEGRADATION_RATE,
+               tariff_escalation=TARIFF_ESCALATION, om_escalation=OM_ESCALATION):
+    """
+    Yearly (saving, O&M, payment) for years 0..years, each (..., years + 1).
+
+    Inputs, including the rates, are scalars or arrays broadcast together;
+    payment is "cash" or "installment". All three are positive amounts;
+    net = saving - O&M - payment.
+    """
+    if payment not in PAYMENTS:
+        raise ValueError(f"payment must be one of {PAYMENTS}, got {payment!r}")
+    yearly_saving, om_yearly, cost_cash, installment_monthly, saving_growth, om_growth = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (
+            yearly_saving, om_yearly, cost_cash, installment_monthly,
+            (1 - np.asarray(degradation_rate)) * (1 + np.asarray(tariff_escalation)), 1 + np.asarray(om_escalation),
+        ))
+    )
+    # Stored year-major so each year is one contiguous row; the caller sees (..., years + 1) views
+    shape = (years + 1,) + yearly_saving.shape
+    saving, om, paid = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+
+    # One year at a time: a loop over ~25 years of whole arrays beats (quotes, years) power tables
+    year_saving, year_om = yearly_saving, om_yearly
+    for t in range(1, years + 1):
+        saving[t] = year_saving
+        om[t] = year_om
+        year_saving = year_saving * saving_growth
+        year_om = year_om * om_growth
+    if payment == "cash":
+        paid[0] = cost_cash
+    else:
+        for t in range(1, years + 1):
+            months = min(max(INSTALLMENT_MONTHS - 12 * (t - 1), 0), 12)
+            if months:
+                paid[t] = installment_monthly * months
+    return tuple(np.moveaxis(a, 0, -1) for a in (saving, om, paid))
+
+
+def npv(net, discount_rate=DISCOUNT_RATE):
+    """Net present value of (..., years + 1) flows, year 0 undiscounted."""
+    return net @ (1 + discount_rate) ** -np.arange(net.shape[-1], dtype=float)
+
+
+def _payback_step(t, cumulative, flow, payback):
+    """Fold year t's (discounted) flow into (cumulative, payback); see discounted_payback()."""
+    after = cumulative + flow
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing = t - 1 - cumulative / flow  # only used where cumulative < 0 <= after, so flow > 0
+    return after, np.where(after < 0, np.inf, np.where(cumulative < 0, crossing, payback))
+
+
+def discounted_payback(net, discount_rate=DISCOUNT_RATE):
+    """
+    Years until the discounted cumulative cash flow turns non-negative for good.
+
+    Interpolated within the crossing year; 0 when it is never negative
+    (e.g. instalments smaller than the savings), inf when it never recovers.
+    """
+    net = np.asarray(net, dtype=float)
+    discount = (1 + discount_rate) ** -np.arange(net.shape[-1], dtype=float)
+    cumulative = np.zeros(net.shape[:-1])
+    payback = np.zeros(net.shape[:-1])
+    for t in range(net.shape[-1]):
+        cumulative, payback = _payback_step(t, cumulative, net[..., t] * discount[t], payback)
+    return np.where(np.isnan(cumulative), np.nan, payback)
+
+
+def cash_payback(yearly_saving, om_yearly, cost_cash, years=PROJECTION_YEARS, discount_rate=0.0,
+                 degradation_rate=DEGRADATION_RATE, tariff_escalation=TARIFF_ESCALATION, om_escalation=OM_ESCALATION):
+    """
+    discounted_payback() of a cash purchase, without building the yearly table.
+
+    Same flows as cash_flows(..., "cash") in a single pass; discount_rate=0
+    gives the simple payback. Inputs and rates broadcast as in cash_flows().
+    """
+    yearly_saving, om_yearly, cost_cash, saving_growth, om_growth = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (
+            yearly_saving, om_yearly, cost_cash,
+            (1 - np.asarray(degradation_rate)) * (1 + np.asarray(tariff_escalation)), 1 + np.asarray(om_escalation),
+        ))
+    )
+    cumulative, payback = _payback_step(0, np.zeros(cost_cash.shape), -cost_cash, np.zeros(cost_cash.shape))
+    year_saving, year_om = yearly_saving, om_yearly
+    for t in range(1, years + 1):
+        cumulative, payback = _payback_step(t, cumulative, (year_saving - year_om) / (1 + discount_rate) ** t, payback)
+        year_saving = year_saving * saving_growth
+        year_om = year_om * om_growth
+    return np.where(np.isnan(cumulative), np.nan, payback)
+
+
+def irr(net):
+    """
+    Internal rate of return of (..., years + 1) flows, NaN unless conventional.
+
+    Conventional means money out in year 0 and nothing negative after it,
+    which makes NPV(v) = sum(net_t v^t), v = 1/(1+r), increasing and convex
+    in v with exactly one positive root. Newton's method on v then converges
+    from any start, for every row at once.
+    """
+    net = np.asarray(net, dtype=float)
+    conventional = (net[..., 0] < 0) & (net[..., 1:] >= 0).all(axis=-1) & (net[..., 1:] > 0).any(axis=-1)
+    coefficients = np.where(conventional[..., None], net, 0.0)
+    coefficients[..., 0] = np.where(conventional, coefficients[..., 0], -1.0)
+    coefficients[..., 1] = np.where(conventional, coefficients[..., 1], 1.0)  # dummy root v=1 for the rest
+
+    v = np.ones(net.shape[:-1])
+    for _ in range(_IRR_ITERATIONS):
+        value = np.zeros_like(v)
+        slope = np.zeros_like(v)
+        for c in np.moveaxis(coefficients[..., :0:-1], -1, 0):  # Horner from the last year down to year 1
+            slope = slope * v + value
+            value = value * v + c
+        slope = slope * v + value
+        value = value * v + coefficients[..., 0]
+        step = value / slope
+        v = np.maximum(v - step, 1e-12)
+        if np.all(np.abs(step) < _IRR_TOLERANCE):
+            break
+    return np.where(conventional, 1 / v - 1, np.nan)
+
+
+@dataclass(frozen=True)
+class CashFlowProjection:
+    """Yearly flows (years 0..PROJECTION_YEARS) and summary metrics for one quote and payment option."""
+    payment: str
+    years: np.ndarray
+    saving_rm: np.ndarray
+    om_rm: np.ndarray
+    payment_rm: np.ndarray
+    net_rm: np.ndarray
+    cumulative_rm: np.ndarray
+    npv_rm: float
+    irr: float                  # NaN when not defined (e.g. no upfront payment)
+    discounted_payback_years: float
+    discount_rate: float
+
+    def table(self):
+        """The yearly table as a DataFrame, one row per year."""
+        import pandas as pd  # only for display; the projection itself needs NumPy alone
+
+        return pd.DataFrame({
+            "Year": self.years,
+            "Saving (RM)": self.saving_rm,
+            "O&M (RM)": self.om_rm,
+            "Payment (RM)": self.payment_rm,
+            "Net (RM)": self.net_rm,
+            "Cumulative (RM)": self.cumulative_rm,
+        })
+
+
+def project(c, payment="cash", years=PROJECTION_YEARS, discount_rate=DISCOUNT_RATE, **rates):
+    """CashFlowProjection for one QuoteResult. rates: degradation_rate, tariff_escalation, om_escalation."""
+    saving, om, paid = cash_flows(
+        c.yearly_saving_rm, c.om_fee_monthly * 12, c.cost_cash, c.installment_monthly, payment, years, **rates,
+    )
+    net = saving - om - paid
+    return CashFlowProjection(
+        payment=payment,
+        years=np.arange(years + 1),
+        saving_rm=saving,
+        om_rm=om,
+        payment_rm=paid,
+        net_rm=net,
+        cumulative_rm=np.cumsum(net),
+        npv_rm=float(npv(net, discount_rate)),
+        irr=float(irr(net)),
+        discounted_payback_years=float(discounted_payback(net, discount_rate)),
+        discount_rate=discount_rate,
+    )
+
+
+def project_batch(r, payment="cash", years=PROJECTION_YEARS, discount_rate=DISCOUNT_RATE, **rates):
+    """
+    NPV, IRR and discounted payback for a solar_engine.quote_batch() result.
+
+    Returns {"npv_rm", "irr", "discounted_payback_years"} arrays shaped like
+    the batch. The yearly flows are (quotes, years + 1) and never stored
+    beyond this call.
+    """
+    saving, om, paid = cash_flows(
+        r["yearly_saving_rm"], r["om_fee_monthly"] * 12, r["cost_cash"], r["installment_monthly"],
+        payment, years, **rates,
+    )
+    net = saving - om - paid
+    return {
+        "npv_rm": npv(net, discount_rate),
+        "irr": irr(net),
+        "discounted_payback_years": discounted_payback(net, discount_rate),
+    }
@@ -0,0 +1,244 @@
+"""
+Hourly-resolution simulation: one full year, 8760 hours, per lead.
+
+The monthly engine splits an average day into direct use, battery and
+export. This module instead steps through every hour of a year:
+
+    generation_profile()  kWh/kWp per hour, a clear-sky year for the area
+                          (or a supplied TMY irradiance series), scaled so
+                          the yearly yield matches AREA_SUN_MAP
+    load_profile()        kWh per hour from the bill's consumption, a
+                          24-hour shape and the daytime usage share
+    simulate_year()       direct use, battery charge/discharge and state of
+                          charge, export and grid import for each hour
+    quote_hourly()        solar_engine.quote() priced on the simulated year
+
+The battery is stepped through the year by battery_dispatch.dispatch(),
+which only loops over runs of surplus and deficit hours (about two a day)
+and rebuilds every hourly value with NumPy. A year with a battery
+simulates in about a millisecond.
+"""
+import functools
+from dataclasses import dataclass
+
+import numpy as np
+
+from battery_dispatch import C_RATE, DEPTH_OF_DISCHARGE, ROUND_TRIP_EFFICIENCY, dispatch
+from solar_engine import AREA_SUN_MAP, _system, consumption_for_bill, quote
+
+DAYS_PER_YEAR = 365
+HOURS_PER_YEAR = DAYS_PER_YEAR * 24
+
+# Local clock hours counted as daytime use: 07:00–19:00
+DAY_HOURS = np.arange(7, 19)
+
+# (latitude, longitude) used for the clear-sky sun path of each area
+AREA_LOCATION = {
+    "Johor Bahru":   (1.49, 103.76),
+    "BP/Muar":       (1.95, 102.75),
+    "Kuala Lumpur":  (3.14, 101.69),
+    "North":         (5.41, 100.33),
+    "Default": (3.00, 102.00),
+}
+UTC_OFFSET = 8  # Malaysia Time
+
+# Relative household use per clock hour (00:00 first): low overnight, a
+# morning bump and an evening peak. load_profile() rescales the day and
+# night hours to the lead's daytime share.
+RESIDENTIAL_LOAD_SHAPE = np.array([
+    0.6, 0.5, 0.5, 0.5, 0.5, 0.6, 0.8, 1.0, 0.9, 0.8, 0.8, 0.9,
+    1.0, 1.0, 1.0, 1.0, 1.0, 1.1, 1.3, 1.6, 1.7, 1.6, 1.3, 0.9,
+])
+
+# True for every hour of the year that falls in DAY_HOURS
+IS_DAY_HOUR = np.isin(np.arange(HOURS_PER_YEAR) % 24, DAY_HOURS)
+
+
+@functools.lru_cache(maxsize=None)
+def _clear_sky_shape(latitude, longitude):
+    """Clear-sky global horizontal irradiance for each hour of the year, normalised to sum to 1."""
+    day = np.arange(HOURS_PER_YEAR) // 24
+    clock = np.arange(HOURS_PER_YEAR) % 24 + 0.5  # middle of each hour
+
+    b = 2 * np.pi * (day - 81) / 364
+    equation_of_time = (9.87 * np.sin(2 * b) - 7.53 * np.cos(b) - 1.5 * np.sin(b)) / 60  # hours
+    solar_time = clock + (longitude - 15 * UTC_OFFSET) / 15 + equation_of_time
+
+    declination = np.radians(23.45) * np.sin(2 * np.pi * (284 + day + 1) / 365)
+    hour_angle = np.radians(15 * (solar_time - 12))
+    lat = np.radians(latitude)
+    cos_zenith = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+
+    # Haurwitz clear-sky model
+    up = cos_zenith > 0
+    safe = np.where(up, cos_zenith, 1.0)
+    ghi = np.where(up, 1098 * safe * np.exp(-0.057 / safe), 0.0)
+    shape = ghi / ghi.sum()
+    shape.flags.writeable = False
+    return shape
+
+
+def _location(area):
+    if area is None:
+        area = "Default"
+    if isinstance(area, str):
+        if area not in AREA_LOCATION:
+            raise ValueError(f"unknown area {area!r}")
+        return AREA_LOCATION[area]
+    latitude, longitude = area
+    return float(latitude), float(longitude)
+
+
+def area_for_sunlight(sunlight_hours):
+    """The AREA_SUN_MAP name with these sunlight hours, or "Default"."""
+    for name, hours in AREA_SUN_MAP.items():
+        if hours == sunlight_hours:
+            return name
+    return "Default"
+
+
+def read_profile(path):
+    """One value per line (or the first CSV column) -> float array, e.g. an exported TMY GHI series."""
+    return np.loadtxt(path, delimiter=",", usecols=0, ndmin=1, comments="#")
+
+
+def generation_profile(sunlight_hours, area=None, irradiance=None):
+    """
+    kWh per kWp for each hour of the year.
+
+    area is an AREA_LOCATION name or a (latitude, longitude) pair and picks
+    the clear-sky sun path. irradiance, if given, is an 8760-hour series
+    (e.g. TMY global horizontal irradiance, any unit) used instead. Either
+    way the year is scaled to sunlight_hours kWh/kWp per day on average,
+    the same yield the monthly engine uses.
+    """
+    if irradiance is None:
+        shape = _clear_sky_shape(*_location(area))
+    else:
+        irradiance = np.clip(np.asarray(irradiance, dtype=float), 0, None)
+        if irradiance.shape != (HOURS_PER_YEAR,):
+            raise ValueError(f"irradiance must have {HOURS_PER_YEAR} hourly values, got shape {irradiance.shape}")
+        if not irradiance.sum() > 0:
+            raise ValueError("irradiance has no positive values")
+        shape = irradiance / irradiance.sum()
+    return shape * (sunlight_hours * DAYS_PER_YEAR)
+
+
+def load_profile(monthly_kwh, daytime_option=0.7, shape=None):
+    """
+    kWh drawn by the household for each hour of the year.
+
+    monthly_kwh is the engine's 30-day consumption. A 24-value shape (default
+    RESIDENTIAL_LOAD_SHAPE) is rescaled so the DAY_HOURS carry daytime_option
+    of each day's use and repeated for every day. An 8760-value shape is a
+    full hourly load profile and is only scaled to the yearly consumption.
+    """
+    daily_kwh = monthly_kwh / 30
+    shape = RESIDENTIAL_LOAD_SHAPE if shape is None else np.clip(np.asarray(shape, dtype=float), 0, None)
+    if shape.shape == (HOURS_PER_YEAR,):
+        total = shape.sum()
+        if not total > 0:
+            raise ValueError("load shape has no positive values")
+        return shape * (daily_kwh * DAYS_PER_YEAR / total)
+    if shape.shape != (24,):
+        raise ValueError(f"load shape must have 24 or {HOURS_PER_YEAR} values, got shape {shape.shape}")
+
+    is_day = np.isin(np.arange(24), DAY_HOURS)
+    day_total, night_total = shape[is_day].sum(), shape[~is_day].sum()
+    if (daytime_option > 0 and not day_total > 0) or (daytime_option < 1 and not night_total > 0):
+        raise ValueError("load shape has no use in the hours needed for this daytime share")
+    day = np.where(is_day, shape * daytime_option / (day_total or 1), 0.0)
+    night = np.where(is_day, 0.0, shape * (1 - daytime_option) / (night_total or 1))
+    return np.tile((day + night) * daily_kwh, DAYS_PER_YEAR)
+
+
+@dataclass(frozen=True)
+class HourlySimulation:
+    """kWh per hour of one simulated year; every array has HOURS_PER_YEAR values."""
+    generation: np.ndarray
+    load: np.ndarray
+    direct: np.ndarray          # solar used as it is generated
+    charge: np.ndarray          # solar sent to the battery
+    discharge: np.ndarray       # battery energy delivered to the household
+    export: np.ndarray
+    grid_import: np.ndarray
+    soc: np.ndarray             # usable kWh stored at the end of each hour
+
+    def totals(self):
+        """Yearly kWh for every flow."""
+        return {
+            name: float(getattr(self, name).sum())
+            for name in ("generation", "load", "direct", "charge", "discharge", "export", "grid_import")
+        }
+
+    def daily_flows(self):
+        """Average-day split in solar_engine.DAILY_FLOW_KEYS form, for quote(..., flows=...)."""
+        return {
+            "direct_used": self.direct.sum() / DAYS_PER_YEAR,
+            "battery_store": self.charge.sum() / DAYS_PER_YEAR,
+            "battery_discharge": self.discharge.sum() / DAYS_PER_YEAR,
+            "night_from_grid": self.grid_import[~IS_DAY_HOUR].sum() / DAYS_PER_YEAR,
+            "day_from_grid": self.grid_import[IS_DAY_HOUR].sum() / DAYS_PER_YEAR,
+            "export": self.export.sum() / DAYS_PER_YEAR,
+        }
+
+
+def simulate_year(kwp, generation_per_kwp, load, battery_kwh=0.0, round_trip_efficiency=ROUND_TRIP_EFFICIENCY,
+                  depth_of_discharge=DEPTH_OF_DISCHARGE, c_rate=C_RATE):
+    """
+    Hour-by-hour energy balance for one year.
+
+    Solar serves the household first; surplus charges the battery (up to
+    battery_kwh * depth_of_discharge usable, at most battery_kwh * c_rate kW)
+    and the rest is exported. Shortfalls are met from the battery, then the
+    grid. Charging and discharging each lose the square root of the round
+    trip efficiency (see battery_dispatch.dispatch()).
+    """
+    generation = np.asarray(generation_per_kwp, dtype=float) * kwp
+    load = np.asarray(load, dtype=float)
+    if generation.shape != (HOURS_PER_YEAR,) or load.shape != (HOURS_PER_YEAR,):
+        raise ValueError(f"generation and load must have {HOURS_PER_YEAR} hourly values")
+
+    direct = np.minimum(generation, load)
+    surplus = generation - direct
+    deficit = load - direct
+
+    if battery_kwh > 0:
+        battery = dispatch(surplus, deficit, battery_kwh, round_trip_efficiency, depth_of_discharge, c_rate)
+        charge, discharge, soc = battery.charge, battery.discharge, battery.soc
+    else:
+        charge = discharge = soc = np.zeros(HOURS_PER_YEAR)
+
+    return HourlySimulation(
+        generation=generation,
+        load=load,
+        direct=direct,
+        charge=charge,
+        discharge=discharge,
+        export=surplus - charge,
+        grid_import=deficit - discharge,
+        soc=soc,
+    )
+
+
+def quote_hourly(no_panels, sunlight_hours, monthly_bill, daytime_option=0.7, online_view=False,
+                 include_battery=False, area=None, irradiance=None, load_shape=None):
+    """
+    solar_engine.quote() with the energy split taken from simulate_year().
+
+    area defaults to the AREA_SUN_MAP entry with these sunlight hours.
+    """
+    monthly_bill = float(monthly_bill) if monthly_bill else 0.0
+    monthly_kwh = consumption_for_bill(monthly_bill)
+    if area is None:
+        area = area_for_sunlight(sunlight_hours)
+
+    system = _system(no_panels, float(sunlight_hours), float(daytime_option), bool(online_view), bool(include_battery))
+    sim = simulate_year(
+        float(system["kwp"]),
+        generation_profile(sunlight_hours, area, irradiance),
+        load_profile(monthly_kwh, daytime_option, load_shape),
+        float(system["storage_kwh"]),
+    )
+    return quote(no_panels, sunlight_hours, monthly_bill, daytime_option, online_view, include_battery,
+                 flows=sim.daily_flows())
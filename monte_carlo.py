@@ -0,0 +1,82 @@
+"""
+Monte Carlo uncertainty bands for a quote's savings and payback.
+
+A quote prices one set of assumptions. uncertainty_bands() re-prices it for
+MC_SAMPLES draws of the inputs that actually vary from customer to customer
+and year to year:
+
+    sunlight hours   normal around the area's AREA_SUN_MAP value
+    daytime share    normal around the chosen share, kept within 5–95%
+    degradation      uniform per-year panel output loss
+    tariff change    normal per-year tariff escalation
+
+Savings come from one engine pass (solar_engine._compute) over all samples,
+payback from the cashflow projection with each sample's own degradation and
+tariff path. The generator is seeded (MC_SEED by default), so the same
+quote always gets the same bands and a PDF can be regenerated exactly.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from cashflow import PROJECTION_YEARS, cash_payback
+from solar_engine import _compute
+
+MC_SAMPLES = 10_000
+MC_SEED = 20240501
+PERCENTILES = (10, 50, 90)
+
+SUNLIGHT_SD = 0.25                    # hours/day
+DAYTIME_SD = 0.10                     # share of daily use
+DAYTIME_LIMITS = (0.05, 0.95)
+DEGRADATION_RANGE = (0.003, 0.008)    # per year
+TARIFF_ESCALATION_MEAN = 0.02         # per year
+TARIFF_ESCALATION_SD = 0.015
+
+
+@dataclass(frozen=True)
+class UncertaintyBands:
+    """P10/P50/P90 of the sampled outcomes: 10% of samples fall below P10, 90% below P90."""
+    samples: int
+    seed: int
+    monthly_saving_rm: tuple      # (p10, p50, p90), first year
+    payback_years: tuple          # (p10, p50, p90), cash purchase; inf if not within PROJECTION_YEARS
+
+    def saving_range(self):
+        p10, _, p90 = self.monthly_saving_rm
+        return f"RM {p10:,.0f} - RM {p90:,.0f}"
+
+    def payback_range(self):
+        p10, _, p90 = (f"{p:.1f}" if np.isfinite(p) else f"> {PROJECTION_YEARS}" for p in self.payback_years)
+        return f"{p10} - {p90} years"
+
+
+def _percentiles(values):
+    # inverted_cdf picks sample values, so an inf payback never turns into NaN by interpolation
+    return tuple(float(p) for p in np.percentile(values, PERCENTILES, method="inverted_cdf"))
+
+
+def uncertainty_bands(no_panels, sunlight_hours, monthly_bill, daytime_option=0.7, online_view=False,
+                      include_battery=False, samples=MC_SAMPLES, seed=MC_SEED):
+    """Bands for one quote."""
+    monthly_bill = float(monthly_bill) if monthly_bill else 0.0
+
+    rng = np.random.default_rng(seed)
+    sunlight = np.maximum(rng.normal(sunlight_hours, SUNLIGHT_SD, samples), 0.0)
+    daytime = np.clip(rng.normal(daytime_option, DAYTIME_SD, samples), *DAYTIME_LIMITS)
+    degradation = rng.uniform(*DEGRADATION_RANGE, samples)
+    escalation = rng.normal(TARIFF_ESCALATION_MEAN, TARIFF_ESCALATION_SD, samples)
+
+    # One bill for every sample: the unmasked engine pass skips quote_batch's validity masking
+    r = _compute(no_panels, sunlight, monthly_bill, daytime, bool(online_view), bool(include_battery))
+    payback = cash_payback(
+        r["yearly_saving_rm"], r["om_fee_monthly"] * 12, r["cost_cash"],
+        degradation_rate=degradation, tariff_escalation=escalation,
+    )
+
+    return UncertaintyBands(
+        samples=samples,
+        seed=seed,
+        monthly_saving_rm=_percentiles(r["monthly_saving_rm"]),
+        payback_years=_percentiles(payback),
+    )
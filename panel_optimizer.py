@@ -0,0 +1,197 @@
+"""
+Which panel count pays back fastest, or is worth the most over 25 years.
+
+optimize_panels() prices every panel count on the UI slider (10–100), with
+and without a battery, in a single solar_engine.quote_batch() call and
+scores each system for cash and for installment payment with
+cashflow.project_batch(), so the numbers match the cash-flow panel:
+
+    payback  discounted payback years of the 25-year cash flow
+    npv      25-year net present value of the same cash flow (degradation,
+             tariff escalation and O&M included)
+
+The returned PanelSweep carries the best combination for the chosen
+objective and the whole curve (panels x battery x payment) for charting.
+
+optimize_battery() sizes the battery for a chosen system: every candidate
+size (5 kWh modules) goes through one battery_dispatch.dispatch() pass over
+an hourly year (or an average-day series), with losses, depth of discharge
+and carry-over, and the size that pays for itself fastest is recommended
+in place of the kWp-based rule.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from battery_dispatch import BATTERY_MODULE_KWH, BATTERY_SIZES, daily_series, dispatch
+from cashflow import DISCOUNT_RATE, PAYMENTS, PROJECTION_YEARS, project_batch
+from hourly_sim import DAYS_PER_YEAR, IS_DAY_HOUR, area_for_sunlight, generation_profile, load_profile
+from solar_engine import PANEL_RANGE, _daily_flows, _system, _with_bill, consumption_for_bill, quote_batch
+
+OBJECTIVES = ("payback", "npv")
+NPV_YEARS = PROJECTION_YEARS
+# Battery sizes whose payback is within 2% of the best count as equally good
+BATTERY_PAYBACK_TOLERANCE = 0.02
+
+
+@dataclass(frozen=True)
+class PanelSweep:
+    """Scores for every (panels, battery, payment) combination plus the best one."""
+    objective: str
+    panels: np.ndarray          # (n,)
+    battery: np.ndarray         # (b,) bool
+    payment: tuple              # (p,) names from PAYMENTS
+    monthly_saving_rm: np.ndarray  # (n, b)
+    price_rm: np.ndarray        # (n, b, p) cash price or instalment total
+    payback_years: np.ndarray   # (n, b, p) discounted, inf when not within the years
+    npv_rm: np.ndarray          # (n, b, p)
+    best_panels: int
+    best_battery: bool
+    best_payment: str
+    best_payback_years: float
+    best_npv_rm: float
+
+    def curve(self, battery=False, payment="cash"):
+        """(panels, payback_years, npv_rm) for one battery/payment option, ready to chart."""
+        i = int(np.flatnonzero(self.battery == battery)[0])
+        j = self.payment.index(payment)
+        return self.panels, self.payback_years[:, i, j], self.npv_rm[:, i, j]
+
+
+@dataclass(frozen=True)
+class BatterySweep:
+    """Every candidate battery size for one system, plus the best one."""
+    sizes_kwh: np.ndarray          # (s,)
+    price_rm: np.ndarray           # (s,)
+    yearly_saving_rm: np.ndarray   # (s,) whole system with that battery
+    extra_saving_rm: np.ndarray    # (s,) over the same system without a battery
+    payback_years: np.ndarray      # (s,) battery price / extra saving, inf when it adds nothing
+    cycles_per_year: np.ndarray    # (s,) equivalent full cycles
+    rule_kwh: float                # the engine's kWp-based size
+    best_kwh: float
+    best_payback_years: float
+
+
+def optimize_panels(monthly_bill, sunlight_hours, daytime_option=0.7, online_view=False, objective="payback",
+                    battery=(False, True), payment=PAYMENTS, panel_range=PANEL_RANGE,
+                    years=NPV_YEARS, discount_rate=DISCOUNT_RATE):
+    """
+    Sweep every panel count in panel_range (inclusive) for one lead.
+
+    objective="payback" minimises the discounted payback; objective="npv"
+    maximises the NPV over years. Ties go to the smaller system, then no battery, then the
+    first payment option. Raises ValueError for an unknown objective/payment.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objective must be one of {OBJECTIVES}, got {objective!r}")
+    payment = tuple(payment)
+    if not payment or set(payment) - set(PAYMENTS):
+        raise ValueError(f"payment must be taken from {PAYMENTS}, got {payment!r}")
+
+    panels = np.arange(panel_range[0], panel_range[1] + 1)
+    battery = np.array(battery, dtype=bool)
+    r = quote_batch(panels[:, None], sunlight_hours, monthly_bill, daytime_option, online_view, battery[None, :])
+
+    projections = [project_batch(r, p, years, discount_rate) for p in payment]
+    price = np.stack([r["cost_cash"] if p == "cash" else r["installment_total"] for p in payment], axis=-1)
+    payback = np.stack([projection["discounted_payback_years"] for projection in projections], axis=-1)
+    npv = np.stack([projection["npv_rm"] for projection in projections], axis=-1)
+
+    # C order is panels, then battery, then payment: argmin/argmax pick the first (smallest) on ties
+    if objective == "payback":
+        best = np.unravel_index(np.argmin(payback), payback.shape)
+    else:
+        best = np.unravel_index(np.argmax(npv), npv.shape)
+
+    return PanelSweep(
+        objective=objective,
+        panels=panels,
+        battery=battery,
+        payment=payment,
+        monthly_saving_rm=r["monthly_saving_rm"],
+        price_rm=price,
+        payback_years=payback,
+        npv_rm=npv,
+        best_panels=int(panels[best[0]]),
+        best_battery=bool(battery[best[1]]),
+        best_payment=payment[best[2]],
+        best_payback_years=float(payback[best]),
+        best_npv_rm=float(npv[best]),
+    )
+
+
+def optimize_battery(no_panels, sunlight_hours, monthly_bill, daytime_option=0.7, online_view=False,
+                     sizes=None, hourly=True, area=None):
+    """
+    Dispatch and price every battery size in sizes for one system.
+
+    sizes defaults to BATTERY_SIZES, extended in 5 kWh modules up to the
+    kWp-based rule size for large systems.
+    hourly=True steps through hourly_sim's clear-sky year for the area
+    (default: the AREA_SUN_MAP entry with these sunlight hours);
+    hourly=False repeats the engine's average day, two steps a day.
+
+    A battery that cycles fully every day saves in proportion to its size,
+    so paybacks are flat until it stops filling up. The recommendation is
+    the largest size within BATTERY_PAYBACK_TOLERANCE of the shortest
+    payback (the smallest when none saves anything).
+    """
+    monthly_bill = float(monthly_bill) if monthly_bill else 0.0
+    monthly_kwh = consumption_for_bill(monthly_bill)
+    base = _system(no_panels, float(sunlight_hours), float(daytime_option), bool(online_view), False)
+    rule = _system(no_panels, float(sunlight_hours), float(daytime_option), bool(online_view), True)
+    rule_kwh = float(rule["battery_kwh"])
+    if sizes is None:
+        sizes = np.arange(BATTERY_MODULE_KWH, max(BATTERY_SIZES[-1], rule_kwh) + 1, BATTERY_MODULE_KWH)
+    sizes = np.asarray(sizes, dtype=float)
+    candidates = np.append(0.0, sizes)  # 0: the same system without a battery
+
+    if hourly:
+        generation = generation_profile(sunlight_hours, area or area_for_sunlight(sunlight_hours)) * base["kwp"]
+        load = load_profile(monthly_kwh, daytime_option)
+        direct = np.minimum(generation, load)
+        surplus, deficit = generation - direct, load - direct
+        is_day = IS_DAY_HOUR
+        step_hours = 1.0
+    else:
+        day = _daily_flows(base, monthly_kwh)
+        day_surplus = base["total_solar_kwh"] / 30 - day["direct_used"]
+        surplus, deficit = daily_series(
+            np.full(DAYS_PER_YEAR, day_surplus), day["night_from_grid"], day["day_from_grid"],
+        )
+        direct = np.full(DAYS_PER_YEAR, day["direct_used"])
+        is_day = np.arange(len(surplus)) % 2 == 0
+        step_hours = 12.0
+
+    battery = dispatch(surplus, deficit, candidates, step_hours=step_hours)
+    grid_import = deficit - battery.discharge
+    flows = {
+        "direct_used": direct.sum() / DAYS_PER_YEAR,
+        "battery_store": battery.charge.sum(axis=1) / DAYS_PER_YEAR,
+        "battery_discharge": battery.discharge.sum(axis=1) / DAYS_PER_YEAR,
+        "night_from_grid": grid_import[:, ~is_day].sum(axis=1) / DAYS_PER_YEAR,
+        "day_from_grid": grid_import[:, is_day].sum(axis=1) / DAYS_PER_YEAR,
+        "export": (surplus - battery.charge).sum(axis=1) / DAYS_PER_YEAR,
+    }
+    system = _system(no_panels, float(sunlight_hours), float(daytime_option), bool(online_view),
+                     candidates > 0, battery_kwh=candidates)
+    r = _with_bill(system, monthly_bill, flows)
+
+    yearly_saving = r["yearly_saving_rm"]
+    extra = yearly_saving[1:] - yearly_saving[0]
+    price = system["battery_price"][1:]
+    payback = np.where(extra > 0, price / np.where(extra > 0, extra, 1.0), np.inf)
+    shortest = payback.min()
+    best = int(np.flatnonzero(payback <= shortest * (1 + BATTERY_PAYBACK_TOLERANCE))[-1]) if np.isfinite(shortest) else 0
+
+    return BatterySweep(
+        sizes_kwh=sizes,
+        price_rm=price,
+        yearly_saving_rm=yearly_saving[1:],
+        extra_saving_rm=extra,
+        payback_years=payback,
+        cycles_per_year=battery.cycles()[1:],
+        rule_kwh=rule_kwh,
+        best_kwh=float(sizes[best]),
+        best_payback_years=float(payback[best]),
+    )
@@ -0,0 +1,480 @@
+"""
+PDF report for one quote.
+
+build_pdf() lays out and renders a report from scratch.
+
+build_pdf_from_template() produces the same document for bulk runs. The
+static layout (header band, section headers, table labels, disclaimers,
+footer and closing page) is drawn once per process for each battery and
+uncertainty-band variant. After that, each quote only stamps its value cells onto a copy.
+A report with a sensitivity (tornado) chart has quote-specific bars, so it
+is always rendered by build_pdf(). Both are timed as "pdf.*" stages when
+stage_timing is on.
+"""
+import io
+import math
+import re
+import threading
+import zlib
+from datetime import datetime
+
+from fpdf import FPDF
+
+from report_assets import _LEGACY_FPDF, get_asset
+from stage_timing import laps
+
+# ---------- Color Palette ----------
+GREEN = (76, 175, 80)
+YELLOW = (255, 193, 7)
+LIGHT_BG = (255, 249, 230)
+TEXT = (60, 60, 60)
+GREY = (140, 140, 140)
+
+
+def report_values(bill, pkg, c, bands=None):
+    """Every quote-specific string printed in the report, keyed by value slot."""
+    d = c.display()
+
+    def get_str(key):
+        return str(d.get(key) or "-")
+
+    # ---------- PDF-only Financial Logic ----------
+    BASE_COST = math.floor(c.cost_cash + 0.5)
+    PDF_ESTIMATED_COST = BASE_COST
+
+    MONTHLY_SAVING = math.floor(c.monthly_saving_rm + 0.5)
+    YEARLY_SAVING = MONTHLY_SAVING * 12 if MONTHLY_SAVING else 0
+
+    PDF_ROI_CASH = round(PDF_ESTIMATED_COST / YEARLY_SAVING, 1) if YEARLY_SAVING else "-"
+
+    values = {key: get_str(key) for key in (
+        "general_tariff", "monthly_kwh", "monthly_gen_kwh", "Daytime Saving (kWh)",
+        "Daily Saving (RM)", "Monthly Saving (RM)", "Yearly Saving (RM)", "new_monthly",
+        "kwp_installed", "kwac", "per_panel_monthly_total", "Battery Capacity (kWh)",
+        "total_fossil", "total_trees", "total_co2",
+    )}
+    values.update({
+        "bill": f"{float(bill):,.2f}" if bill else "0.00",
+        "system_size": f"{get_str('kwp_installed')} kWp",
+        "panels": f"{pkg} panels",
+        "inverter": f"{get_str('kwac')} kWac",
+        "battery_summary": f"{get_str('Battery Capacity (kWh)')} kWh" if c.include_battery else "-",
+        "monthly_saving": f"RM {MONTHLY_SAVING:,.0f}",
+        "yearly_saving": f"RM {YEARLY_SAVING:,.0f}",
+        "new_monthly_rm": f"RM {get_str('new_monthly')}",
+        "price": f"RM {PDF_ESTIMATED_COST:,.0f}",
+        "roi_cash": f"{PDF_ROI_CASH} years",
+    })
+    if bands is not None:
+        values.update({
+            "saving_range": bands.saving_range(),
+            "payback_range": bands.payback_range(),
+            "bands_note": f"Likely ranges: 10th-90th percentile of {bands.samples:,} simulated scenarios (seed {bands.seed}).",
+        })
+    return values
+
+
+def _payback_delta(years):
+    return f"{round(years, 1) + 0.0:+.1f}" if math.isfinite(years) else "n/a"  # + 0.0: no "-0.0"
+
+
+def _draw_tornado(pdf, sensitivity):
+    """Payback tornado chart: one row per input, bars from the base payback, largest swing on top."""
+    label_w, range_w, bar_w, row_h = 50, 40, 60, 7
+    deltas = [
+        tuple(years - sensitivity.base_payback_years for years in bar.payback_years)
+        for bar in sensitivity.bars
+    ]
+    finite = [abs(d) for pair in deltas for d in pair if math.isfinite(d)]
+    scale = (bar_w / 2) / (max(finite) or 1.0) if finite else 0.0
+
+    pdf.set_font("Helvetica", "", 10)
+    pdf.cell(0, 6, f"Cash payback {sensitivity.base_payback_years:.1f} years. Change in years when each input "
+                   "moves to its low / high value:", ln=True)
+    pdf.ln(2)
+    center = pdf.l_margin + label_w + range_w + bar_w / 2
+    top = pdf.get_y()
+    for bar, pair in zip(sensitivity.bars, deltas):
+        y = pdf.get_y()
+        pdf.cell(label_w, row_h, bar.label)
+        pdf.cell(range_w, row_h, f"{bar.low_text} / {bar.high_text}")
+        for delta in pair:
+            width = bar_w / 2 if not math.isfinite(delta) else abs(delta) * scale
+            if width > 0:
+                pdf.set_fill_color(*(GREEN if delta < 0 else YELLOW))
+                pdf.rect(center - width if delta < 0 else center, y + 1, width, row_h - 2, "F")
+        pdf.set_x(pdf.l_margin + label_w + range_w + bar_w)
+        pdf.cell(0, row_h, " / ".join(_payback_delta(d) for d in pair), ln=True, align="R")
+    pdf.set_draw_color(*GREY)
+    pdf.line(center, top, center, pdf.get_y())
+    pdf.set_draw_color(0)
+    pdf.ln(3)
+
+
+def _draw_report(pdf, put_value, include_battery, with_bands=False, sensitivity=None, closing_page=True, lap=None):
+    """
+    Lay out the whole report on an empty FPDF document.
+
+    Only put_value(key, w, h, **cell_kwargs) prints quote-specific text; the
+    layout itself depends on nothing but include_battery and with_bands
+    (the Monte Carlo ranges). sensitivity, if given, is drawn directly as a
+    tornado chart, so such a layout can't be used as a template.
+    closing_page=False leaves out the full-page closing image. lap, if
+    given, continues the caller's stage_timing laps.
+    """
+    lap = lap or laps("pdf")
+
+    # ---------- PDF Setup ----------
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    # ---------- Header ----------
+    pdf.set_fill_color(*GREEN)
+    pdf.rect(0, 0, 210, 30, "F")
+
+    logo = get_asset("company_logo.png")
+    if logo:
+        logo.draw(pdf, 10, 6, 18)
+
+    pdf.set_xy(35, 8)
+    pdf.set_font("Helvetica", "B", 18)
+    pdf.set_text_color(255, 255, 255)
+    pdf.cell(0, 10, "Preliminary Solar Assessment Report", ln=True)
+
+    pdf.ln(20)
+    pdf.set_text_color(*TEXT)
+    lap("header")
+
+    # ---------- UI Components ----------
+    def section(title):
+        pdf.ln(4)
+        pdf.set_font("Helvetica", "B", 14)
+        pdf.set_fill_color(*YELLOW)
+        pdf.cell(0, 9, f"  {title}", ln=True, fill=True)
+        pdf.ln(3)
+
+    def table(rows):
+        label_w, value_w = 100, 90
+        for label, key in rows:
+            pdf.set_font("Helvetica", "", 11)
+            pdf.set_fill_color(*LIGHT_BG)
+            pdf.cell(label_w, 8, label, border=1, fill=True)
+            pdf.set_font("Helvetica", "B", 11)
+            put_value(key, value_w, 8, border=1, ln=True, fill=True, align="C")
+        pdf.ln(3)
+
+    def summary_block(rows, highlight_label=None):
+        start_y = pdf.get_y()
+        block_height = len(rows) * 9 + 6
+
+        pdf.set_fill_color(245, 245, 245)
+        pdf.rect(10, start_y, 190, block_height, "F")
+
+        pdf.ln(4)
+        for label, key in rows:
+            is_highlight = (label == highlight_label)
+
+            pdf.set_font("Helvetica", "B" if is_highlight else "", 11)
+            pdf.set_text_color(0 if is_highlight else 60)
+
+            pdf.cell(120, 8, label)
+            put_value(key, 0, 8, ln=True, align="C")
+
+        pdf.ln(6)
+        pdf.set_text_color(*TEXT)
+
+    # ---------- Input Summary ----------
+    section("Input Summary")
+    table([
+        ("Monthly Bill (RM)", "bill"),
+        ("Tariff Rate (RM/kWh)", "general_tariff"),
+        ("Estimated Monthly Consumption (kWh)", "monthly_kwh"),
+    ])
+
+    # ---------- System Size Overview ----------
+    section("System Size Overview")
+    summary_block([
+        ("System Size", "system_size"),
+        ("Solar Panels Installed", "panels"),
+        ("Inverter Capacity", "inverter"),
+        ("Battery Capacity", "battery_summary"),
+    ], highlight_label="Solar Panels Installed")
+
+    # ---------- Key Savings Overview ----------
+    section("Key Savings Overview")
+    summary_block([
+        ("Estimated Monthly Saving", "monthly_saving"),
+        ("Estimated Yearly Saving", "yearly_saving"),
+        ("New Estimated Monthly Bill", "new_monthly_rm"),
+    ] + ([("Likely Monthly Saving (P10-P90)", "saving_range")] if with_bands else []),
+        highlight_label="Estimated Monthly Saving")
+
+    # ---------- Financial Details (PDF-only adjusted) ----------
+    section("Financial Details")
+    summary_block([
+        ("Estimated System Price", "price"),
+        ("Estimated ROI (Cash Purchase)", "roi_cash"),
+    ] + ([("Likely Payback (P10-P90)", "payback_range")] if with_bands else []),
+        highlight_label="Estimated System Price")
+
+    pdf.set_font("Helvetica", "I", 9)
+    pdf.set_text_color(*GREY)
+    pdf.multi_cell(
+        0, 5,
+        "Pricing shown is an estimated budgetary figure for preliminary assessment only. "
+        "Final system price and return on investment will be confirmed after site survey "
+        "and detailed engineering design."
+    )
+    if with_bands:
+        put_value("bands_note", 0, 5, ln=True)
+    pdf.set_text_color(*TEXT)
+    pdf.ln(40)
+    pdf.ln(60)
+
+    # ---------- Key Metrics ----------
+    section("Key Metrics")
+    table([
+        ("Estimated Monthly Generation (kWh)", "monthly_gen_kwh"),
+        ("Estimated Daytime Saving (kWh/day)", "Daytime Saving (kWh)"),
+        ("Estimated Daily Saving (RM)", "Daily Saving (RM)"),
+        ("Estimated Monthly Saving (RM)", "Monthly Saving (RM)"),
+        ("Estimated Yearly Saving (RM)", "Yearly Saving (RM)"),
+        ("Estimated New Monthly Bill (RM)", "new_monthly"),
+    ])
+
+    # ---------- Solar System Details ----------
+    section("Solar System Details")
+    table([
+        ("Installed Capacity (kWp)", "kwp_installed"),
+        ("Inverter Output (kWac)", "kwac"),
+        ("Per Panel Yield (kWh / month)", "per_panel_monthly_total"),
+    ])
+
+    # ---------- Battery ----------
+    if include_battery:
+        section("Battery Details")
+        table([
+            ("Battery Capacity (kWh)", "Battery Capacity (kWh)"),
+        ])
+
+    # ---------- Environmental Impact ----------
+    section("Environmental Impact")
+    table([
+        ("Fossil Fuel Saved (kg)", "total_fossil"),
+        ("Trees Saved", "total_trees"),
+        ("CO2 Avoided (tons)", "total_co2"),
+    ])
+
+    # ---------- Payback Sensitivity ----------
+    if sensitivity is not None:
+        section("Payback Sensitivity")
+        _draw_tornado(pdf, sensitivity)
+
+    # ---------- Footer ----------
+    pdf.ln(5)
+    pdf.set_font("Helvetica", "I", 9)
+    pdf.set_text_color(*GREY)
+    pdf.multi_cell(
+        0, 5,
+        "Note: All figures shown are estimates based on provided inputs. "
+        "Actual savings and performance may vary depending on site conditions, "
+        "weather, and usage behavior."
+    )
+    lap("tables")
+
+    # ==========================================
+    # Closing Page (Full Page Image)
+    # ==========================================
+    if not closing_page:
+        return
+    closing_image = get_asset("closing_page.png")
+
+    if closing_image:
+
+        # Add new page
+        pdf.add_page()
+
+        # PDF page size
+        PAGE_W = pdf.w
+        PAGE_H = pdf.h
+
+        # Image size (read once when the asset was loaded)
+        img_w_px, img_h_px = closing_image.width_px, closing_image.height_px
+
+        img_ratio = img_w_px / img_h_px
+        page_ratio = PAGE_W / PAGE_H
+
+        # Scale image to completely cover page
+        if img_ratio > page_ratio:
+            # Image is wider than page
+            img_h = PAGE_H
+            img_w = img_h * img_ratio
+            x = -(img_w - PAGE_W) / 2
+            y = 0
+        else:
+            # Image is taller than page
+            img_w = PAGE_W
+            img_h = img_w / img_ratio
+            x = 0
+            y = -(img_h - PAGE_H) / 2
+
+        # Draw image
+        closing_image.draw(pdf, x=x, y=y, w=img_w, h=img_h)
+        lap("closing_image")
+
+    else:
+        print("Closing image not found: assets/closing_page.png")
+
+    # def draw_page_background(pdf, color):
+    #     pdf.set_fill_color(*color)
+    #     pdf.rect(0, 0, 248, 352, style="F")  # A4 size in mm
+
+    # LIGHT_GREEN_BG = (235, 245, 235)  # RGB
+    # draw_page_background(pdf, LIGHT_GREEN_BG)
+
+
+def _output_bytes(pdf):
+    pdf_bytes = pdf.output(dest="S")
+    if isinstance(pdf_bytes, str):
+        pdf_bytes = pdf_bytes.encode("latin-1")
+    return bytes(pdf_bytes)
+
+
+def build_pdf(bill, raw_needed, pkg, c, bands=None, sensitivity=None, closing_page=True):
+    """
+    Render the report for one quote from scratch. Returns a BytesIO.
+
+    bands (UncertaintyBands) and sensitivity (sensitivity.Sensitivity) are
+    optional; closing_page=False omits the full-page closing image.
+    """
+    lap = laps("pdf")
+    values = report_values(bill, pkg, c, bands)
+    lap("values")
+    pdf = FPDF()
+    _draw_report(pdf, lambda key, w, h, **kw: pdf.cell(w, h, values[key], **kw), c.include_battery,
+                 bands is not None, sensitivity, closing_page, lap)
+
+    # ---------- Output ----------
+    data = _output_bytes(pdf)
+    lap("output")
+    return io.BytesIO(data)
+
+
+class _ReportTemplate:
+    """
+    The static report, drawn and serialised once.
+
+    Value cells are drawn empty (border and fill only) and everything needed
+    to place their text is recorded. render() emits the same text operators
+    FPDF.cell() would, appends them to each page's static content and
+    splices the re-compressed streams, a new creation date and a rebuilt
+    xref table into the pre-serialised document. This relies on PyFPDF 1.x's
+    fixed object layout: page n's content stream is object 2n+2 and the info
+    dictionary is the second-to-last object.
+    """
+
+    def __init__(self, include_battery, with_bands=False):
+        pdf = FPDF()
+        slots = []
+
+        def record(key, w, h, **kw):
+            k, x, y = pdf.k, pdf.get_x(), pdf.get_y()
+            if w == 0:
+                w = pdf.w - pdf.r_margin - x
+            slots.append((
+                key, pdf.page, (pdf.current_font["i"], pdf.font_size_pt), pdf.current_font["cw"],
+                pdf.font_size, pdf.text_color, kw.get("align", ""), x, w, pdf.c_margin, k,
+                (pdf.h - (y + .5 * h + .3 * pdf.font_size)) * k,
+            ))
+            pdf.cell(w, h, "", **kw)
+
+        _draw_report(pdf, record, include_battery, with_bands)
+        self.slots = slots
+        self.static_pages = {page: pdf.pages[page].encode("latin-1") for page in {slot[1] for slot in slots}}
+        self.content_objects = {2 * page + 2: page for page in self.static_pages}
+
+        pdf.set_compression(0)
+        raw = _output_bytes(pdf)
+        xref_at = raw.rindex(b"\nxref\n") + 1
+        order = sorted(pdf.offsets, key=pdf.offsets.get)
+        ends = [pdf.offsets[n] for n in order[1:]] + [xref_at]
+        self.header = raw[:pdf.offsets[order[0]]]
+        self.objects = [(n, raw[pdf.offsets[n]:end]) for n, end in zip(order, ends)]
+        self.trailer = raw[raw.index(b"trailer\n", xref_at):raw.rindex(b"startxref")]
+        self.object_count = pdf.n
+        self.info_object = pdf.n - 1
+
+    def _stamp(self, values):
+        """Value text for each stamped page, as FPDF.cell() would write it."""
+        pages = {}
+        fonts = {}
+        for key, page, font, cw, size, text_color, align, x, w, c_margin, k, baseline in self.slots:
+            txt = values[key]
+            if not txt:
+                continue
+            ops = pages.setdefault(page, [])
+            if fonts.get(page) != font:
+                ops.append("BT /F%d %.2f Tf ET" % font)
+                fonts[page] = font
+            if align == "C":
+                dx = (w - sum(cw.get(ch, 0) for ch in txt) * size / 1000.0) / 2.0
+            elif align == "R":
+                dx = w - c_margin - sum(cw.get(ch, 0) for ch in txt) * size / 1000.0
+            else:
+                dx = c_margin
+            txt = txt.replace("\\", "\\\\").replace(")", "\\)").replace("(", "\\(").replace("\r", "\\r")
+            ops.append("q %s BT %.2f %.2f Td (%s) Tj ET Q" % (text_color, (x + dx) * k, baseline, txt))
+        return {page: ("\n".join(ops) + "\n").encode("latin-1") for page, ops in pages.items()}
+
+    def render(self, values):
+        stamped = self._stamp(values)
+        created = datetime.now().strftime("D:%Y%m%d%H%M%S").encode()
+
+        chunks = [self.header]
+        offsets = {}
+        pos = len(self.header)
+        for n, chunk in self.objects:
+            if n in self.content_objects:
+                page = self.content_objects[n]
+                data = zlib.compress(self.static_pages[page] + stamped.get(page, b""))
+                chunk = b"%d 0 obj\n<</Filter /FlateDecode /Length %d>>\nstream\n%s\nendstream\nendobj\n" % (n, len(data), data)
+            elif n == self.info_object:
+                chunk = re.sub(rb"/CreationDate \(D:\d+\)", b"/CreationDate (" + created + b")", chunk)
+            offsets[n] = pos
+            pos += len(chunk)
+            chunks.append(chunk)
+
+        chunks.append(b"xref\n0 %d\n0000000000 65535 f \n" % (self.object_count + 1))
+        chunks.extend(b"%010d 00000 n \n" % offsets[n] for n in range(1, self.object_count + 1))
+        chunks.append(self.trailer)
+        chunks.append(b"startxref\n%d\n%%%%EOF\n" % pos)
+        return b"".join(chunks)
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def build_pdf_from_template(bill, raw_needed, pkg, c, bands=None, sensitivity=None):
+    """
+    Same report as build_pdf(), stamped onto a per-process static template.
+
+    Falls back to build_pdf() on fpdf2, whose document internals differ, and
+    for reports with a sensitivity chart.
+    """
+    if not _LEGACY_FPDF or sensitivity is not None:
+        return build_pdf(bill, raw_needed, pkg, c, bands, sensitivity)
+    lap = laps("pdf")
+    values = report_values(bill, pkg, c, bands)
+    lap("values")
+    variant = (bool(c.include_battery), bands is not None)
+    template = _templates.get(variant)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(variant)
+            if template is None:
+                template = _templates[variant] = _ReportTemplate(*variant)
+    lap("template")  # the lookup, or drawing the template on the first report of a variant
+    data = template.render(values)
+    lap("stamp")
+    return io.BytesIO(data)
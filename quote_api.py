@@ -0,0 +1,562 @@
+"""
+JSON HTTP API over the quote engine, so the website and other front ends
+show the same numbers as the proposal UI.
+
+    python quote_api.py serve --port 8000 --workers 16 --pdf-workers 4
+    python quote_api.py loadtest --url http://127.0.0.1:8000 --requests 5000 --concurrency 32
+
+Endpoints:
+
+    GET  /health        {"status": "ok", "tariff_version": ..., cache and report counters}
+    GET  /metrics       stage timings, cache and report counters, Prometheus text format
+    POST /quote         one lead -> {"tariff_version", "lead", "result", "flow"[, "bands"]}
+    POST /quote/batch   {"leads": [lead, ...]} -> {"tariff_version", "quotes": [...]}
+    POST /pdf           one lead -> the proposal PDF (application/pdf)
+    GET  /              the static site in html/, whose calculator calls POST /quote
+
+A lead is a JSON object with the bulk_proposals.py column names:
+
+    bill      monthly bill in RM, >= 0 (required)
+    area      one of AREA_SUN_MAP, e.g. "Kuala Lumpur" (default "Default")
+    daytime   daytime usage share, 0-1 or a whole percentage up to 100:
+              0.3 or 30 (default 0.3)
+    panels    whole number of panels, 10-100 (default: the recommended count)
+    battery   include battery storage, true/false (default false)
+    online    online view pricing (+RM 3000), true/false (default false)
+
+plus, for /quote and /pdf, "bands": true for the Monte Carlo P10-P90
+ranges and, for /pdf, "sensitivity": true for the payback tornado chart.
+Unknown fields and out-of-range values are a 400 with {"error": ...}; in a
+batch a bad lead only fails its own entry ({"valid": false, "error": ...}).
+Non-finite numbers (e.g. roi_cash without any saving) are sent as null.
+
+Connections are handled by a fixed thread pool (--workers). Single quotes,
+bands and PDFs go through the process-wide caches in quote_cache, so repeat
+requests cost a dict lookup; a batch is priced in one quote_batch() pass.
+PDFs are rendered by a report_service.ReportService: --pdf-workers
+processes (0 renders in the request thread) behind a queue of at most
+--pdf-queue waiting reports. A /pdf that finds the queue full gets a 503
+and should retry shortly; one whose report is not ready within
+--pdf-timeout seconds gets a 504. The active tariff file is
+re-checked on every request (tariffs.current_tariff()). With --stage-timing
+(or SOLAR_STAGE_TIMING=1) every request and the engine and PDF stages
+under it are timed (stage_timing.py); /metrics reports the totals. The
+pdf.* stages are only included with --pdf-workers 0, since pool processes
+keep their own; report.queued and report.render are always recorded.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+
+from monte_carlo import uncertainty_bands
+from quote_cache import PDF_CACHE, QUOTE_CACHE, cached_pdf_bytes, cached_quote, quote_key
+from quote_table import load_table
+from report_service import ReportQueueFull, ReportService
+from sensitivity import sensitivity
+import stage_timing
+from solar_engine import AREA_SUN_MAP, PANEL_RANGE, RESULT_FIELDS, quote_batch, recommend_panels
+from tariffs import current_tariff
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "html")
+STATIC_FILES = {
+    "/": ("index.html", "text/html; charset=utf-8"),
+    "/index.html": ("index.html", "text/html; charset=utf-8"),
+    "/script.js": ("script.js", "text/javascript; charset=utf-8"),
+    "/style.css": ("style.css", "text/css; charset=utf-8"),
+}
+
+MAX_BODY_BYTES = 4 * 1024 * 1024
+MAX_BATCH_LEADS = 10_000
+PDF_TIMEOUT_SECONDS = 60.0
+LEAD_FIELDS = ("bill", "area", "daytime", "panels", "battery", "online")
+OPTION_FIELDS = {"/quote": ("bands",), "/pdf": ("bands", "sensitivity")}
+
+
+class ApiError(Exception):
+    """A request the API refuses; status is the HTTP status code."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _number(body, name, default=None):
+    value = body.get(name, default)
+    if value is None:
+        raise ValueError(f"{name} is required")
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    try:
+        value = float(value)
+    except OverflowError:
+        raise ValueError(f"{name} must be a finite number") from None  # an int too large for a float
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    return value
+
+
+def _boolean(body, name):
+    value = body.get(name, False)
+    if not isinstance(value, bool):
+        raise ValueError(f"{name} must be true or false, got {value!r}")
+    return value
+
+
+def parse_lead(body, options=()):
+    """
+    Validated lead from a JSON object: (lead dict, options dict).
+
+    The lead carries the resolved sunlight_hours and panel count (the
+    recommended one when "panels" is missing). Raises ValueError.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("a lead must be a JSON object")
+    unknown = sorted(set(body) - set(LEAD_FIELDS) - set(options))
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(unknown)}")
+
+    bill = _number(body, "bill")
+    if bill < 0:
+        raise ValueError("The monthly bill cannot be negative")
+    area = body.get("area", "Default")
+    if not isinstance(area, str) or area not in AREA_SUN_MAP:
+        raise ValueError(f"unknown area {area!r}")
+    daytime = _number(body, "daytime", 0.3)
+    if 1 < daytime <= 100 and daytime == int(daytime):
+        daytime /= 100  # given as a percentage
+    if not 0 <= daytime <= 1:
+        raise ValueError(f"daytime must be a share from 0 to 1 or a whole percentage up to 100, "
+                         f"got {body['daytime']!r}")
+    sunlight_hours = AREA_SUN_MAP[area]
+    panels = _number(body, "panels", recommend_panels(bill, sunlight_hours))
+    if not PANEL_RANGE[0] <= panels <= PANEL_RANGE[1] or panels != int(panels):
+        raise ValueError(f"panels must be a whole number from {PANEL_RANGE[0]} to {PANEL_RANGE[1]}, "
+                         f"got {body['panels']!r}")
+
+    lead = {
+        "bill": bill,
+        "area": area,
+        "sunlight_hours": sunlight_hours,
+        "daytime": daytime,
+        "panels": int(panels),
+        "battery": _boolean(body, "battery"),
+        "online": _boolean(body, "online"),
+    }
+    return lead, {name: _boolean(body, name) for name in options}
+
+
+def _jsonable(value):
+    """JSON-safe scalar: NumPy types to Python, NaN and inf to None."""
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def _jsonable_dict(d):
+    return {k: _jsonable(v) for k, v in d.items()}
+
+
+def _lead_key(lead):
+    return quote_key(lead["panels"], lead["sunlight_hours"], lead["bill"], lead["daytime"], lead["online"],
+                     lead["battery"])
+
+
+def _bands(lead):
+    key = _lead_key(lead)
+    return QUOTE_CACHE.get_or_compute(("bands",) + key, lambda: uncertainty_bands(*key))
+
+
+def quote_response(body):
+    """POST /quote: the full QuoteResult and EnergyFlow for one lead."""
+    tariff = current_tariff()
+    lead, options = parse_lead(body, OPTION_FIELDS["/quote"])
+    q = cached_quote(*_lead_key(lead))
+    response = {
+        "tariff_version": tariff.version,
+        "lead": lead,
+        "result": _jsonable_dict(asdict(q.result)),
+        "flow": _jsonable_dict(asdict(q.flow)),
+    }
+    if options["bands"]:
+        response["bands"] = _jsonable_dict(asdict(_bands(lead)))
+    return response
+
+
+def batch_response(body):
+    """POST /quote/batch: QuoteResult fields for every lead, priced in one quote_batch() pass."""
+    tariff = current_tariff()
+    leads = body.get("leads") if isinstance(body, dict) else None
+    if not isinstance(leads, list):
+        raise ValueError('expected {"leads": [...]}')
+    if len(leads) > MAX_BATCH_LEADS:
+        raise ApiError(413, f"at most {MAX_BATCH_LEADS:,} leads per batch, got {len(leads):,}")
+
+    quotes = [None] * len(leads)
+    parsed = []
+    for i, item in enumerate(leads):
+        try:
+            parsed.append((i, parse_lead(item)[0]))
+        except ValueError as e:
+            quotes[i] = {"valid": False, "error": str(e)}
+
+    if parsed:
+        column = {name: np.array([lead[name] for _, lead in parsed]) for name in (
+            "panels", "sunlight_hours", "bill", "daytime", "online", "battery")}
+        r = quote_batch(column["panels"], column["sunlight_hours"], column["bill"], column["daytime"],
+                        column["online"], column["battery"], tariff=tariff)
+        columns = {name: r[name].tolist() for name in RESULT_FIELDS}
+        for row, (i, lead) in enumerate(parsed):
+            quotes[i] = {
+                "valid": True,
+                "lead": lead,
+                "result": {name: _jsonable(columns[name][row]) for name in RESULT_FIELDS},
+            }
+    return {"tariff_version": tariff.version, "quotes": quotes}
+
+
+def pdf_response(body, reports=None, timeout=PDF_TIMEOUT_SECONDS):
+    """POST /pdf: the proposal PDF bytes for one lead, as the UI download renders it."""
+    lead, options = parse_lead(body, OPTION_FIELDS["/pdf"])
+    key = _lead_key(lead)
+    c = cached_quote(*key).result
+    bands = _bands(lead) if options["bands"] else None
+    sens = QUOTE_CACHE.get_or_compute(("sensitivity",) + key, lambda: sensitivity(*key)) \
+        if options["sensitivity"] else None
+
+    raw_needed = recommend_panels(lead["bill"], lead["sunlight_hours"])
+    if reports is None:
+        return cached_pdf_bytes(lead["bill"], raw_needed, lead["panels"], c, bands, sens)
+    try:
+        job = reports.submit(lead["bill"], raw_needed, lead["panels"], c, bands, sens)
+    except ReportQueueFull as e:
+        raise ApiError(503, str(e))
+    try:
+        return job.result(timeout)
+    except TimeoutError as e:
+        raise ApiError(504, str(e))
+
+
+def health_response(reports=None):
+    tariff = current_tariff()
+    health = {
+        "status": "ok",
+        "tariff_version": tariff.version,
+        "quote_cache": QUOTE_CACHE.cache_info()._asdict(),
+        "pdf_cache": PDF_CACHE.cache_info()._asdict(),
+    }
+    if reports is not None:
+        health["reports"] = reports.stats()._asdict()
+    return health
+
+
+def metrics_text(reports=None):
+    """GET /metrics: stage_timing's totals plus the quote and PDF cache and report queue counters."""
+    lines = [stage_timing.prometheus_text()]
+    for name, kind, help_text, field in (
+        ("solar_cache_hits_total", "counter", "Cache lookups answered from the cache.", "hits"),
+        ("solar_cache_misses_total", "counter", "Cache lookups that had to compute.", "misses"),
+        ("solar_cache_entries", "gauge", "Entries currently cached.", "currsize"),
+    ):
+        lines.append(f"# HELP {name} {help_text}\n# TYPE {name} {kind}\n")
+        for cache, info in (("quote", QUOTE_CACHE.cache_info()), ("pdf", PDF_CACHE.cache_info())):
+            lines.append(f'{name}{{cache="{cache}"}} {getattr(info, field)}\n')
+    if reports is not None:
+        stats = reports.stats()
+        for name, kind, help_text, field in (
+            ("solar_reports_queued", "gauge", "PDF reports waiting for a rendering process.", "queued"),
+            ("solar_reports_rendering", "gauge", "PDF reports being rendered.", "rendering"),
+            ("solar_reports_rendered_total", "counter", "PDF reports rendered.", "rendered"),
+            ("solar_reports_failed_total", "counter", "PDF reports that failed to render.", "failed"),
+            ("solar_reports_rejected_total", "counter", "PDF reports refused because the queue was full.",
+             "rejected"),
+        ):
+            lines.append(f"# HELP {name} {help_text}\n# TYPE {name} {kind}\n{name} {getattr(stats, field)}\n")
+    return "".join(lines)
+
+
+class QuoteRequestHandler(BaseHTTPRequestHandler):
+    server_version = "SolarQuoteAPI/1.0"
+    timeout = 30  # seconds a client may take to send its request
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self._send_json(200, health_response(self.server.reports))
+        if self.path == "/metrics":
+            text = metrics_text(self.server.reports)
+            return self._send(200, text.encode(), "text/plain; version=0.0.4; charset=utf-8")
+        if self.path in STATIC_FILES:
+            name, content_type = STATIC_FILES[self.path]
+            with open(os.path.join(STATIC_DIR, name), "rb") as f:
+                return self._send(200, f.read(), content_type)
+        if self.path in ("/quote", "/quote/batch", "/pdf"):
+            return self._send_json(405, {"error": "use POST"})
+        self._send_json(404, {"error": f"no such endpoint: {self.path}"})
+
+    def do_POST(self):
+        routes = {
+            "/quote": lambda body: (json.dumps(quote_response(body), allow_nan=False).encode(), "application/json"),
+            "/quote/batch": lambda body: (json.dumps(batch_response(body), allow_nan=False).encode(),
+                                          "application/json"),
+            "/pdf": lambda body: (pdf_response(body, self.server.reports, self.server.pdf_timeout),
+                                  "application/pdf"),
+        }
+        route = routes.get(self.path)
+        if route is None:
+            return self._send_json(404, {"error": f"no such endpoint: {self.path}"})
+        lap = stage_timing.laps("api")
+        try:
+            body = self._read_json()
+            try:
+                data, content_type = route(body)
+            except ValueError as e:
+                raise ApiError(400, str(e))
+            lap(self.path.strip("/").replace("/", "_"))
+        except ApiError as e:
+            return self._send_json(e.status, {"error": str(e)})
+        except Exception:
+            traceback.print_exc()
+            return self._send_json(500, {"error": "internal error"})
+        self._send(200, data, content_type)
+
+    def do_OPTIONS(self):
+        # CORS preflight, for a site served from another origin (--cors-origin)
+        self.send_response(204)
+        self._cors_headers()
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise ApiError(411, "Content-Length required")
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, f"request body over {MAX_BODY_BYTES:,} bytes")
+        try:
+            return json.loads(self.rfile.read(length))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ApiError(400, f"invalid JSON: {e}")
+
+    def _cors_headers(self):
+        if self.server.cors_origin:
+            self.send_header("Access-Control-Allow-Origin", self.server.cors_origin)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, allow_nan=False).encode(), "application/json")
+
+    def _send(self, status, data, content_type):
+        self.send_response(status)
+        self._cors_headers()
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that handles each connection on a fixed-size thread pool."""
+    request_queue_size = 128
+
+    def __init__(self, address, handler=QuoteRequestHandler, workers=16, reports=None, cors_origin=None,
+                 access_log=False, pdf_timeout=PDF_TIMEOUT_SECONDS):
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quote-api")
+        self.reports = reports
+        self.pdf_timeout = pdf_timeout
+        self.cors_origin = cors_origin
+        self.access_log = access_log
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def serve(host="127.0.0.1", port=8000, workers=16, pdf_workers=0, cors_origin=None, access_log=False,
+          stage_timing_on=False, pdf_queue=32, pdf_timeout=PDF_TIMEOUT_SECONDS):
+    """Run the API until interrupted."""
+    if stage_timing_on:
+        stage_timing.enable()
+    # Warm the per-process state the first requests would otherwise pay for. The report
+    # modules (fpdf, PIL) are only imported here or on the first /pdf, never at import.
+    from report_assets import load_assets
+
+    current_tariff()
+    load_table()
+    load_assets()
+
+    reports = ReportService(pdf_workers, pdf_queue) if pdf_workers else None
+    server = PooledHTTPServer((host, port), workers=workers, reports=reports, cors_origin=cors_origin,
+                              access_log=access_log, pdf_timeout=pdf_timeout)
+    print(f"Quote API on http://{host}:{server.server_port} ({workers} threads, {pdf_workers} PDF processes)",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if reports is not None:
+            reports.close(wait=False)
+
+
+def _loadtest_body(rng, endpoint):
+    lead = {
+        "bill": round(rng.uniform(80, 2000), 2),
+        "area": rng.choice(list(AREA_SUN_MAP)),
+        "daytime": rng.choice((0.2, 0.3, 0.5, 0.7)),
+        "battery": rng.random() < 0.3,
+    }
+    if endpoint == "quote/batch":
+        return {"leads": [dict(lead, bill=round(rng.uniform(80, 2000), 2)) for _ in range(100)]}
+    return lead
+
+
+def loadtest(url, requests=1000, concurrency=16, endpoint="quote", distinct=200, seed=0, timeout=60):
+    """
+    Send requests POSTs to url/endpoint from concurrency threads; returns a summary dict.
+
+    Bodies are drawn from distinct seeded leads, so repeats exercise the
+    server's caches the way returning visitors do.
+    """
+    # Client side only: urllib.request pulls in ssl and email, which the server never needs
+    import urllib.error
+    import urllib.request
+
+    rng = random.Random(seed)
+    bodies = [json.dumps(_loadtest_body(rng, endpoint)).encode() for _ in range(max(distinct, 1))]
+    target = f"{url.rstrip('/')}/{endpoint}"
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            req = urllib.request.Request(target, data=bodies[i % len(bodies)],
+                                         headers={"Content-Type": "application/json"})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=timeout) as resp:
+                    resp.read()
+            except (urllib.error.URLError, OSError) as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000 if latencies else np.array([np.nan])
+    return {
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON HTTP API over the quote engine.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    s = commands.add_parser("serve", help="run the API")
+    s.add_argument("--host", default="127.0.0.1")
+    s.add_argument("--port", type=int, default=8000)
+    s.add_argument("--workers", type=int, default=16, help="request threads (default 16)")
+    s.add_argument("--pdf-workers", type=int, default=os.cpu_count() or 1,
+                   help="PDF rendering processes (default: CPU count; 0 renders in the request thread)")
+    s.add_argument("--pdf-queue", type=int, default=32,
+                   help="PDFs that may wait for a rendering process before /pdf answers 503 (default 32)")
+    s.add_argument("--pdf-timeout", type=float, default=PDF_TIMEOUT_SECONDS,
+                   help=f"seconds /pdf waits for its report before answering 504 (default {PDF_TIMEOUT_SECONDS:g})")
+    s.add_argument("--cors-origin", metavar="ORIGIN",
+                   help="allow browser calls from this origin, e.g. https://example.com or *")
+    s.add_argument("--access-log", action="store_true", help="log every request to stderr")
+    s.add_argument("--stage-timing", action="store_true",
+                   help="time requests and engine/PDF stages for /metrics (also SOLAR_STAGE_TIMING=1)")
+
+    t = commands.add_parser("loadtest", help="load-test a running API")
+    t.add_argument("--url", default="http://127.0.0.1:8000")
+    t.add_argument("--endpoint", choices=("quote", "quote/batch", "pdf"), default="quote")
+    t.add_argument("--requests", type=int, default=1000)
+    t.add_argument("--concurrency", type=int, default=16)
+    t.add_argument("--distinct", type=int, default=200, help="distinct request bodies (default 200)")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        if args.workers < 1:
+            parser.error("--workers must be at least 1")
+        if args.pdf_workers < 0 or args.pdf_queue < 0:
+            parser.error("--pdf-workers and --pdf-queue cannot be negative")
+        if not args.pdf_timeout > 0:
+            parser.error("--pdf-timeout must be positive")
+        serve(args.host, args.port, args.workers, args.pdf_workers, args.cors_origin, args.access_log,
+              args.stage_timing, args.pdf_queue, args.pdf_timeout)
+        return 0
+
+    if args.requests < 1 or args.concurrency < 1:
+        parser.error("--requests and --concurrency must be at least 1")
+    summary = loadtest(args.url, args.requests, args.concurrency, args.endpoint, args.distinct)
+    print(
+        f"{summary['ok']:,}/{summary['requests']:,} OK in {summary['seconds']:.1f}s with {args.concurrency} "
+        f"clients: {summary['requests_per_second']:,.0f} req/s, p50 {summary['p50_ms']:.1f} ms, "
+        f"p95 {summary['p95_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms"
+    )
+    if summary["errors"]:
+        print(f"{summary['errors']:,} errors, first: {summary['first_error']}", file=sys.stderr)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Process-wide LRU caches for quote results and rendered PDF reports.
+
+Streamlit re-executes solar_calculator.py on every rerun, so anything that
+should outlive a rerun (and be shared by every session in the server
+process) has to live in an imported module like this one.
+
+Size limits are read from the environment and can be changed at runtime
+with resize():
+
+    SOLAR_QUOTE_CACHE_SIZE  Quote objects (default 4096)
+    SOLAR_PDF_CACHE_SIZE    rendered PDF reports (default 32)
+
+QUOTE_CACHE is cleared whenever tariffs activates a different tariff file,
+since everything in it was priced on the old one. Reports are keyed by
+their content and need no such reset.
+
+cached_quote() and cached_pdf_bytes() are the cached entry points shared by
+the Streamlit UI and the HTTP API (quote_api.py); report_service renders
+PDFs in the background into the same PDF_CACHE.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from dataclasses import astuple
+
+from tariffs import on_reload
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class LRUCache:
+    """Thread-safe mapping with least-recently-used eviction and hit/miss counters."""
+
+    def __init__(self, maxsize=4096):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._maxsize = max(int(maxsize), 0)
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, calling compute() and storing it on a miss."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+
+        # Compute outside the lock so one slow quote doesn't block other sessions
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def get(self, key, default=None):
+        """The cached value for key (counted as a hit), or default (counted as a miss)."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if self._maxsize:
+                self._data[key] = value
+                self._data.move_to_end(key)
+                while len(self._data) > self._maxsize:
+                    self._data.popitem(last=False)
+
+    def resize(self, maxsize):
+        with self._lock:
+            self._maxsize = max(int(maxsize), 0)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def cache_info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self._maxsize, len(self._data))
+
+    def cache_clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+QUOTE_CACHE = LRUCache(os.environ.get("SOLAR_QUOTE_CACHE_SIZE", 4096))
+PDF_CACHE = LRUCache(os.environ.get("SOLAR_PDF_CACHE_SIZE", 32))
+
+on_reload(lambda tariff: QUOTE_CACHE.cache_clear())
+
+
+def quote_key(no_panels, sunlight_hours, monthly_bill, daytime_option=0.7, online_view=False, include_battery=False):
+    """Normalised quote() inputs: whole panels, bill to the sen, hours/share to 4 dp."""
+    return (
+        int(no_panels),
+        round(float(sunlight_hours), 4),
+        round(float(monthly_bill) if monthly_bill else 0.0, 2),
+        round(float(daytime_option), 4),
+        bool(online_view),
+        bool(include_battery),
+    )
+
+
+def cached_quote(no_panels, sunlight_hours, monthly_bill, daytime_option=0.7, online_view=False, include_battery=False,
+                 hourly=False):
+    """
+    quote() through the process-wide QUOTE_CACHE.
+
+    Quote is immutable, so one cached instance can be handed to every
+    session that asks for the same (normalised) inputs. Misses on the UI
+    grid are read from the precomputed quote table. hourly=True prices the
+    8760-hour simulation (hourly_sim.quote_hourly) instead.
+    """
+    # Imported here: quote_table imports this module
+    from hourly_sim import quote_hourly
+    from quote_table import table_quote
+    from solar_engine import quote
+
+    key = quote_key(no_panels, sunlight_hours, monthly_bill, daytime_option, online_view, include_battery)
+    if hourly:
+        return QUOTE_CACHE.get_or_compute(("hourly",) + key, lambda: quote_hourly(*key))
+    return QUOTE_CACHE.get_or_compute(key, lambda: table_quote(*key) or quote(*key))
+
+
+def pdf_cache_key(bill, pkg, c, bands=None, sens=None):
+    """Content address of a report: SHA-256 over everything build_pdf() prints."""
+    payload = repr((round(float(bill or 0), 2), int(pkg), astuple(c), bands and astuple(bands), sens and astuple(sens)))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def render_pdf_bytes(bill, raw_needed, pkg, c, bands=None, sens=None):
+    """build_pdf_from_template() as bytes; a top-level function so a process pool can run it."""
+    from pdf_report import build_pdf_from_template
+
+    return build_pdf_from_template(bill, raw_needed, pkg, c, bands, sens).getvalue()
+
+
+def cached_pdf_bytes(bill, raw_needed, pkg, c, bands=None, sens=None, render=render_pdf_bytes):
+    """
+    build_pdf() bytes, rendered once per distinct quote and reused from PDF_CACHE.
+
+    render(bill, raw_needed, pkg, c, bands, sens) produces the bytes on a
+    miss; quote_api passes one that hands the work to its process pool.
+    """
+    return PDF_CACHE.get_or_compute(
+        pdf_cache_key(bill, pkg, c, bands, sens),
+        lambda: render(bill, raw_needed, pkg, c, bands, sens),
+    )
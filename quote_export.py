@@ -0,0 +1,192 @@
+"""
+Headless quote export: leads in, one row of quote metrics per lead out.
+
+    python quote_export.py leads.csv quotes.parquet
+    python quote_export.py leads.parquet quotes.csv --chunksize 250000
+
+Input is CSV or Parquet with the same columns as bulk_proposals.py (bill,
+area, daytime, panels, battery, online). Every input column is copied to
+the output, followed by "valid", every QuoteResult field and the full
+EnergyFlow breakdown as numeric columns. Rows that can't be quoted (negative bill, unknown area,
+missing numbers) are kept with valid=False and NaN metrics. --cashflow adds
+the 25-year NPV, IRR and discounted payback (cashflow.project_batch()) for
+cash and instalment payment. --tariff re-quotes every lead under another
+tariff file (see tariffs.py) and adds a "tariff_version" column:
+
+    python quote_export.py leads.csv requoted.parquet --tariff tariff_data/<version>.json
+
+Files are processed chunk by chunk, so memory is bounded by --chunksize no
+matter how many rows there are. Each chunk is priced with
+solar_engine.quote_batch(), the array form of what the proposal UI shows.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from bulk_proposals import TRUE_VALUES
+from cashflow import PAYMENTS, project_batch
+from solar_engine import AREA_SUN_MAP, FLOW_FIELDS, RESULT_FIELDS, quote_batch
+from tariffs import load_tariff
+
+QUOTE_COLUMNS = ("valid",) + RESULT_FIELDS + FLOW_FIELDS
+
+
+def _flags(col):
+    if col.dtype == bool:
+        return col.to_numpy()
+    if pd.api.types.is_numeric_dtype(col):
+        return col.fillna(0).to_numpy() != 0
+    return col.astype(str).str.strip().str.lower().isin(TRUE_VALUES).to_numpy()
+
+
+def quote_frame(leads, cashflow=False, tariff=None):
+    """
+    DataFrame of lead columns -> the same rows with the quote metrics (and, optionally, cash flow) appended.
+
+    tariff (a tariffs.Tariff) prices the leads instead of the active tariff
+    file and is recorded in a "tariff_version" column.
+    """
+    n = len(leads)
+    cols = {str(k).strip().lower(): k for k in leads.columns}
+
+    def number(name, default=np.nan):
+        if name not in cols:
+            return np.full(n, default)
+        return pd.to_numeric(leads[cols[name]], errors="coerce").to_numpy(dtype=float)
+
+    def flag(name):
+        return _flags(leads[cols[name]]) if name in cols else np.zeros(n, dtype=bool)
+
+    bill = number("bill")
+    panels = np.floor(number("panels"))
+    daytime = number("daytime", 0.3)
+    daytime = np.where(np.isnan(daytime), 0.3, daytime)
+    daytime = np.where(daytime > 1, daytime / 100, daytime)  # given as a percentage
+    if "area" in cols:
+        area = leads[cols["area"]].astype(str).str.strip().replace({"": "Default", "nan": "Default"})
+        sunlight = area.map(AREA_SUN_MAP).to_numpy(dtype=float)
+    else:
+        sunlight = np.full(n, AREA_SUN_MAP["Default"])
+
+    known = ~(np.isnan(bill) | np.isnan(panels) | np.isnan(sunlight)) & (daytime >= 0) & (daytime <= 1)
+    r = quote_batch(
+        np.where(known, panels, 0),
+        np.where(known, sunlight, AREA_SUN_MAP["Default"]),
+        np.where(known, bill, np.nan),
+        np.where(known, daytime, 0.3),
+        flag("online"),
+        flag("battery"),
+        tariff=tariff,
+    )
+    r["valid"] = r["valid"] & known
+
+    out = leads.reset_index(drop=True).copy()
+    for name in QUOTE_COLUMNS:
+        value = r[name]
+        if name not in ("valid", "include_battery"):
+            value = np.where(r["valid"], value, np.nan)
+        out[name] = value
+    if tariff is not None:
+        out["tariff_version"] = tariff.version
+    if cashflow:
+        for payment in PAYMENTS:
+            for name, value in project_batch(r, payment).items():
+                out[f"{payment}_{name}"] = np.where(r["valid"], value, np.nan)
+    return out
+
+
+def read_chunks(path, chunksize):
+    """Yield DataFrames of at most chunksize rows from a CSV or Parquet file."""
+    if path.lower().endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        # Strings throughout so pass-through columns keep one type in every chunk
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False)
+
+
+class _ArrowSink:
+    """Append DataFrames to one CSV or Parquet file, keeping the first chunk's schema."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.lower().endswith((".parquet", ".pq"))
+        self.writer = None
+        self.schema = None
+
+    def write(self, df):
+        import pyarrow as pa
+
+        if self.writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self.schema = table.schema
+            if self.parquet:
+                import pyarrow.parquet as pq
+
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                import pyarrow.csv as pacsv
+
+                self.writer = pacsv.CSVWriter(self.path, table.schema)
+        else:
+            table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def export_quotes(src, dst, chunksize=100_000, log=None, cashflow=False, tariff=None):
+    """Quote every lead in src and write the results to dst (.csv or .parquet). Returns (rows, valid)."""
+    sink = _ArrowSink(dst)
+    rows = valid = 0
+    started = time.perf_counter()
+    try:
+        for chunk in read_chunks(src, chunksize):
+            out = quote_frame(chunk, cashflow, tariff)
+            sink.write(out)
+            rows += len(out)
+            valid += int(out["valid"].sum())
+            if log:
+                print(f"{rows:,} rows, {rows / (time.perf_counter() - started):,.0f} rows/s", file=log)
+    finally:
+        sink.close()
+    return rows, valid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export full quote results for a file of leads.")
+    parser.add_argument("src", help="leads file (.csv or .parquet)")
+    parser.add_argument("dst", help="output file (.csv or .parquet)")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="rows per chunk (default 100000)")
+    parser.add_argument("--quiet", action="store_true", help="no per-chunk progress")
+    parser.add_argument("--cashflow", action="store_true",
+                        help="add 25-year NPV, IRR and discounted payback for cash and installment")
+    parser.add_argument("--tariff", metavar="FILE", help="price with this tariff file instead of the active one")
+    args = parser.parse_args(argv)
+
+    if args.chunksize < 1:
+        parser.error("--chunksize must be at least 1")
+    try:
+        tariff = load_tariff(args.tariff) if args.tariff else None
+    except (OSError, ValueError) as e:
+        parser.error(f"--tariff: {e}")
+    if os.path.abspath(args.src) == os.path.abspath(args.dst):
+        parser.error("src and dst must be different files")
+
+    started = time.perf_counter()
+    rows, valid = export_quotes(args.src, args.dst, args.chunksize, log=None if args.quiet else sys.stderr,
+                                cashflow=args.cashflow, tariff=tariff)
+    elapsed = time.perf_counter() - started
+    print(f"{rows:,} leads ({valid:,} quoted, {rows - valid:,} invalid) in {elapsed:.1f}s: "
+          f"{rows / elapsed if elapsed else 0:,.0f} rows/s -> {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Precomputed quote table for the interactive UI.
+
+The UI only offers a small discrete grid: the AREA_SUN_MAP locations, the
+DAYTIME_OPTIONS, panels 10–100, battery on/off and online view on/off. Bill
+is the only continuous input. Everything about a quote that doesn't depend
+on the bill (solar_engine._system(): generation, system size, battery size,
+prices and instalments) is computed once for that whole grid and stored as
+one structured NumPy array. It is saved under assets/.cache and
+memory-mapped on later starts. The file name carries a fingerprint of the
+engine source, the grid and the tariff file (prices are in the table), so
+a changed engine or a hot-reloaded tariff never reads a stale table.
+
+For a bill, bill_slice() completes all 91 panel counts of one configuration
+in a single vectorised pass and keeps the result in a small LRU cache.
+table_quote() is then an index into that slice: moving the panel slider
+does no arithmetic.
+
+Run `python quote_table.py` to rebuild the table ahead of a deploy.
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+import solar_engine
+from quote_cache import LRUCache
+from tariffs import current_tariff
+from solar_engine import (
+    AREA_SUN_MAP,
+    DAYTIME_OPTIONS,
+    PANEL_RANGE,
+    SYSTEM_FIELDS,
+    _quote_at,
+    _system,
+    _with_bill,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "assets", ".cache")
+
+# Table axes, in storage order
+SUNLIGHT_HOURS = tuple(AREA_SUN_MAP.values())
+PANELS = np.arange(PANEL_RANGE[0], PANEL_RANGE[1] + 1)
+FLAGS = (False, True)
+
+_BOOL_FIELDS = {"online_view", "include_battery"}
+TABLE_DTYPE = np.dtype([(f, np.bool_ if f in _BOOL_FIELDS else np.float64) for f in SYSTEM_FIELDS])
+TABLE_SHAPE = (len(SUNLIGHT_HOURS), len(DAYTIME_OPTIONS), len(FLAGS), len(FLAGS), len(PANELS))
+
+SLICE_CACHE = LRUCache(os.environ.get("SOLAR_SLICE_CACHE_SIZE", 256))
+
+_table = None           # (tariff fingerprint, table)
+_lock = threading.Lock()
+
+
+def _fingerprint(tariff):
+    with open(solar_engine.__file__, "rb") as f:
+        source = f.read()
+    axes = repr((SUNLIGHT_HOURS, DAYTIME_OPTIONS, PANEL_RANGE, TABLE_DTYPE.descr, tariff.fingerprint))
+    return hashlib.sha1(source + axes.encode()).hexdigest()[:12]
+
+
+def table_path(tariff=None):
+    return os.path.join(CACHE_DIR, f"quote_table-{_fingerprint(tariff or current_tariff())}.npy")
+
+
+def build_table(tariff=None):
+    """Structured array of _system() values, shape TABLE_SHAPE (area, daytime, battery, online, panels)."""
+    sunlight, daytime, battery, online, panels = np.meshgrid(
+        np.array(SUNLIGHT_HOURS), np.array(DAYTIME_OPTIONS), np.array(FLAGS), np.array(FLAGS),
+        PANELS.astype(float), indexing="ij",
+    )
+    values = _system(panels, sunlight, daytime, online, battery, tariff=tariff)
+    table = np.empty(TABLE_SHAPE, dtype=TABLE_DTYPE)
+    for f in SYSTEM_FIELDS:
+        table[f] = values[f]
+    return table
+
+
+def load_table(tariff=None):
+    """
+    The table for tariff (default: the active one), memory-mapped from CACHE_DIR
+    when present (built and saved on the first call otherwise).
+    """
+    global _table
+    tariff = tariff or current_tariff()
+    with _lock:
+        if _table is None or _table[0] != tariff.fingerprint:
+            path = table_path(tariff)
+            try:
+                table = np.load(path, mmap_mode="r")
+                if table.shape != TABLE_SHAPE or table.dtype != TABLE_DTYPE:
+                    raise ValueError("stale quote table")
+            except (OSError, ValueError):
+                table = build_table(tariff)
+                try:
+                    os.makedirs(CACHE_DIR, exist_ok=True)
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    with open(tmp, "wb") as f:
+                        np.save(f, table)
+                    os.replace(tmp, path)
+                    table = np.load(path, mmap_mode="r")
+                except OSError:
+                    pass  # read-only checkout: keep the in-memory copy only
+            _table = (tariff.fingerprint, table)
+    return _table[1]
+
+
+def _grid_index(sunlight_hours, daytime_option, online_view, include_battery):
+    try:
+        return (
+            SUNLIGHT_HOURS.index(sunlight_hours),
+            DAYTIME_OPTIONS.index(daytime_option),
+            FLAGS.index(bool(include_battery)),
+            FLAGS.index(bool(online_view)),
+        )
+    except ValueError:
+        return None
+
+
+def bill_slice(monthly_bill, sunlight_hours, daytime_option, online_view=False, include_battery=False):
+    """
+    Every quote value for panels 10–100 of one grid configuration, as arrays.
+
+    Returns None when the configuration is not on the UI grid.
+    """
+    index = _grid_index(sunlight_hours, daytime_option, online_view, include_battery)
+    if index is None:
+        return None
+    tariff = current_tariff()
+    monthly_bill = float(monthly_bill) if monthly_bill else 0.0
+
+    def compute():
+        row = load_table(tariff)[index]
+        values = _with_bill({f: np.asarray(row[f]) for f in SYSTEM_FIELDS}, monthly_bill, tariff=tariff)
+        return {k: np.broadcast_to(v, PANELS.shape) for k, v in values.items()}
+
+    return SLICE_CACHE.get_or_compute((tariff.fingerprint, monthly_bill) + index, compute)
+
+
+def table_quote(no_panels, sunlight_hours, monthly_bill, daytime_option=0.7, online_view=False, include_battery=False):
+    """solar_engine.quote() read from the table, or None when the inputs are off the UI grid."""
+    if not PANEL_RANGE[0] <= no_panels <= PANEL_RANGE[1] or int(no_panels) != no_panels:
+        return None
+    r = bill_slice(monthly_bill, sunlight_hours, daytime_option, online_view, include_battery)
+    if r is None:
+        return None
+    return _quote_at(r, int(no_panels) - PANEL_RANGE[0], no_panels)
+
+
+if __name__ == "__main__":
+    table = load_table()
+    print(f"{table_path()}: {table.size:,} configurations, {table.nbytes:,} bytes")
@@ -0,0 +1,158 @@
+"""
+Images embedded in the PDF report, read from disk once per process.
+
+build_pdf() used to download the logo for every report (into a shared temp
+file) and re-parse the closing page PNG each time. The bundled images are now
+loaded once, kept in memory and handed to FPDF without touching the
+filesystem or the network again.
+
+Full-page images (PAGE_IMAGES) are additionally cropped to the A4 page,
+capped at PAGE_DPI and re-encoded as JPEG. The result is cached under
+assets/.cache together with its pixel size, so reports embed a small
+ready-made DCT stream instead of re-compressing the original PNG. Run
+`python report_assets.py` to rebuild the cache ahead of a deploy.
+"""
+import io
+import json
+import os
+import struct
+import threading
+from dataclasses import dataclass
+
+from fpdf import FPDF, FPDF_VERSION
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGO_PATH = os.path.join(BASE_DIR, "company_logo.png")
+ASSET_DIR = os.path.join(BASE_DIR, "assets")
+CACHE_DIR = os.path.join(ASSET_DIR, ".cache")
+
+PAGE_IMAGES = {"closing_page.png"}
+PAGE_SIZE_MM = (210, 297)  # A4 portrait, FPDF's default page
+PAGE_DPI = 150
+JPEG_QUALITY = 85
+
+# PyFPDF 1.x only reads images from a path, but looks them up by name in
+# pdf.images first, so a pre-parsed entry can be injected instead. fpdf2
+# accepts file-like objects directly.
+_LEGACY_FPDF = FPDF_VERSION.startswith("1.")
+
+
+@dataclass(frozen=True)
+class ImageAsset:
+    name: str
+    data: bytes
+    width_px: int
+    height_px: int
+    fpdf_info: dict = None  # PyFPDF 1.x image dictionary, parsed once
+
+    def draw(self, pdf, x, y, w=0, h=0):
+        """Place the image on the current page straight from memory."""
+        if self.fpdf_info is None:
+            pdf.image(io.BytesIO(self.data), x, y, w, h)
+            return
+        if self.name not in pdf.images:
+            # Copy: FPDF numbers the entry and drops its data when writing
+            pdf.images[self.name] = dict(self.fpdf_info, i=len(pdf.images) + 1)
+        pdf.image(self.name, x, y, w, h)
+
+
+_assets = {}
+_lock = threading.Lock()
+
+
+def _load_png(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    width_px, height_px = struct.unpack(">II", data[16:24])  # IHDR
+    info = FPDF()._parsepng(path) if _LEGACY_FPDF else None
+    return ImageAsset(os.path.basename(path), data, width_px, height_px, info)
+
+
+def _page_jpeg(path):
+    """Crop/downscale a full-page image to A4 as JPEG, re-using the copy in CACHE_DIR when fresh."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    jpg_path = os.path.join(CACHE_DIR, f"{stem}.page.jpg")
+    meta_path = jpg_path + ".json"
+    stat = os.stat(path)
+    source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "dpi": PAGE_DPI, "quality": JPEG_QUALITY}
+
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["source"] == source:
+            with open(jpg_path, "rb") as f:
+                return f.read(), meta["width_px"], meta["height_px"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    from PIL import Image
+
+    page_w_mm, page_h_mm = PAGE_SIZE_MM
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        # Keep only what the "cover" placement in build_pdf() would show
+        w, h = img.size
+        if w / h > page_w_mm / page_h_mm:
+            crop_w = round(h * page_w_mm / page_h_mm)
+            img = img.crop(((w - crop_w) // 2, 0, (w - crop_w) // 2 + crop_w, h))
+        else:
+            crop_h = round(w * page_h_mm / page_w_mm)
+            img = img.crop((0, (h - crop_h) // 2, w, (h - crop_h) // 2 + crop_h))
+        img.thumbnail((round(page_w_mm / 25.4 * PAGE_DPI), round(page_h_mm / 25.4 * PAGE_DPI)), Image.LANCZOS)
+
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        data, (width_px, height_px) = buf.getvalue(), img.size
+
+    try:
+        # Other processes may be reading these: replace the JPEG first and the
+        # metadata that vouches for it last, each through a temp file
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{jpg_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, jpg_path)
+        tmp = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"source": source, "width_px": width_px, "height_px": height_px}, f)
+        os.replace(tmp, meta_path)
+    except OSError:
+        pass  # read-only checkout: keep the in-memory copy only
+    return data, width_px, height_px
+
+
+def _load_page_image(path):
+    data, width_px, height_px = _page_jpeg(path)
+    info = None
+    if _LEGACY_FPDF:
+        info = {"w": width_px, "h": height_px, "cs": "DeviceRGB", "bpc": 8, "f": "DCTDecode", "data": data}
+    return ImageAsset(os.path.basename(path), data, width_px, height_px, info)
+
+
+def load_assets():
+    """Load the logo and every PNG under assets/ (only the first call reads disk)."""
+    with _lock:
+        if not _assets:
+            paths = [LOGO_PATH]
+            if os.path.isdir(ASSET_DIR):
+                paths += sorted(
+                    os.path.join(ASSET_DIR, f) for f in os.listdir(ASSET_DIR) if f.lower().endswith(".png")
+                )
+            for path in paths:
+                if os.path.exists(path):
+                    if os.path.basename(path) in PAGE_IMAGES:
+                        asset = _load_page_image(path)
+                    else:
+                        asset = _load_png(path)
+                    _assets[asset.name] = asset
+    return _assets
+
+
+def get_asset(name):
+    """ImageAsset for a bundled file name such as "company_logo.png", or None if missing."""
+    return load_assets().get(name)
+
+
+if __name__ == "__main__":
+    for asset in load_assets().values():
+        print(f"{asset.name}: {asset.width_px}x{asset.height_px} px, {len(asset.data):,} bytes")
@@ -0,0 +1,240 @@
+"""
+Background PDF rendering with a bounded queue, shared by every session of a
+server process.
+
+    job = REPORTS.submit(bill, raw_needed, pkg, c, bands, sens)   # returns at once
+    job.state             # "queued", "rendering", "done" or "failed"
+    job.position()        # reports queued ahead of this one
+    job.progress()        # 0-1 estimate for a progress bar
+    job.result()          # the PDF bytes, waiting for them if need be
+
+A fixed number of worker threads each take the oldest queued report and
+hand it to a process pool, so FPDF's page layout runs outside the server
+process and never holds the GIL that the Streamlit scripts need. At most
+max_queue reports wait for a free worker; submit() beyond that raises
+ReportQueueFull instead of queueing more, and the caller asks the user (or
+API client) to retry shortly. A report already in PDF_CACHE comes back as a
+finished job, and asking again for a report that is queued or rendering
+returns the job already under way.
+
+Sizes are read from the environment:
+
+    SOLAR_PDF_WORKERS   reports rendered at once, one process each (default 2)
+    SOLAR_PDF_QUEUE     reports that may wait for a worker (default 16)
+
+ReportService(processes=False) renders in the worker threads instead.
+
+Worker threads and processes start on the first submit(), so importing this
+module costs nothing. With stage timing on, the time each report waited and
+rendered is recorded as report.queued and report.render.
+"""
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import stage_timing
+from quote_cache import PDF_CACHE, pdf_cache_key, render_pdf_bytes
+
+ReportStats = namedtuple("ReportStats", ["queued", "rendering", "rendered", "failed", "rejected"])
+
+DEFAULT_RENDER_SECONDS = 1.0  # progress estimate until the first report has rendered (mostly process start-up)
+
+
+class ReportQueueFull(RuntimeError):
+    """More reports are waiting than the queue allows; try again shortly."""
+
+
+class ReportJob:
+    """One report on its way through a ReportService."""
+
+    def __init__(self, key, args=None, service=None, pdf=None):
+        self.key = key
+        self.submitted = time.monotonic()
+        self.started = None
+        self.error = None
+        self._args = args
+        self._service = service
+        self._pdf = pdf
+        self._done = threading.Event()
+        self._lap = stage_timing.laps("report")
+        if pdf is None:
+            self.state = "queued"
+        else:
+            self.state = "done"
+            self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """The PDF bytes; re-raises the rendering error of a failed job."""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"report not ready after {timeout} s")
+        if self.error is not None:
+            raise self.error
+        return self._pdf
+
+    def position(self):
+        return self._service._position(self) if self._service and not self.done() else 0
+
+    def progress(self):
+        return self._service._progress(self) if self._service and not self.done() else 1.0
+
+    def _finish(self, pdf=None, error=None):
+        self._pdf, self.error = pdf, error
+        self.state = "failed" if error is not None else "done"
+        self._args = None
+        self._done.set()
+
+
+class ReportService:
+    """A bounded queue of PDF reports in front of workers rendering in a process pool."""
+
+    def __init__(self, workers=2, max_queue=16, processes=True):
+        self.workers = max(int(workers), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self.processes = processes
+        self._queue = deque()   # queued ReportJobs, oldest first
+        self._jobs = {}         # key -> ReportJob, queued or rendering
+        self._cond = threading.Condition()
+        self._threads = []
+        self._pool = None
+        self._busy = 0
+        self._render_seconds = deque(maxlen=20)
+        self._counts = {"rendered": 0, "failed": 0, "rejected": 0}
+        self._closed = False
+
+    def submit(self, bill, raw_needed, pkg, c, bands=None, sens=None):
+        """
+        A ReportJob for build_pdf_from_template(bill, raw_needed, pkg, c, bands, sens).
+
+        Never waits for a worker: raises ReportQueueFull when max_queue
+        reports are already waiting and no worker is free.
+        """
+        key = pdf_cache_key(bill, pkg, c, bands, sens)
+        pdf = PDF_CACHE.get(key)
+        if pdf is not None:
+            return ReportJob(key, pdf=pdf)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("report service is closed")
+            job = self._jobs.get(key)
+            if job is not None:
+                return job
+            if len(self._queue) >= self.max_queue + self.workers - self._busy:
+                self._counts["rejected"] += 1
+                raise ReportQueueFull(f"{len(self._queue)} reports are already waiting, try again shortly")
+            self._start()
+            job = self._jobs[key] = ReportJob(key, (bill, raw_needed, pkg, c, bands, sens), self)
+            self._queue.append(job)
+            self._cond.notify()
+        return job
+
+    def stats(self):
+        with self._cond:
+            return ReportStats(len(self._queue), self._busy, **self._counts)
+
+    def close(self, wait=True):
+        """Stop the workers once the queued reports are rendered (wait=False drops them)."""
+        with self._cond:
+            self._closed = True
+            dropped = [] if wait else list(self._queue)
+            if not wait:
+                self._queue.clear()
+            self._cond.notify_all()
+        for job in dropped:
+            self._jobs.pop(job.key, None)
+            job._finish(error=RuntimeError("report service closed"))
+        for thread in self._threads:
+            thread.join()
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def _start(self):
+        # Called with the lock held, on the first submit()
+        if self._threads:
+            return
+        if self.processes:
+            self._pool = self._new_pool()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"report-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _new_pool(self):
+        # spawn: forking a threaded server (Streamlit, the quote API) can copy held locks
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _replace_pool(self, broken):
+        with self._cond:
+            if self._pool is not broken or self._closed:
+                return  # another worker already replaced it
+            self._pool = self._new_pool()
+        broken.shutdown(wait=False)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                job = self._queue.popleft()
+                job.state = "rendering"
+                job.started = time.monotonic()
+                self._busy += 1
+            job._lap("queued")
+
+            pool = self._pool
+            try:
+                if pool is not None:
+                    pdf = pool.submit(render_pdf_bytes, *job._args).result()
+                else:
+                    pdf = render_pdf_bytes(*job._args)
+            except Exception as e:
+                error, pdf = e, None
+                if isinstance(e, BrokenProcessPool):
+                    self._replace_pool(pool)  # a render process died (e.g. out of memory)
+            else:
+                error = None
+                PDF_CACHE.put(job.key, pdf)
+            job._lap("render")
+
+            with self._cond:
+                self._busy -= 1
+                del self._jobs[job.key]
+                if error is None:
+                    self._counts["rendered"] += 1
+                    self._render_seconds.append(time.monotonic() - job.started)
+                else:
+                    self._counts["failed"] += 1
+            job._finish(pdf, error)
+
+    def _position(self, job):
+        with self._cond:
+            try:
+                return self._queue.index(job)
+            except ValueError:
+                return 0
+
+    def _progress(self, job):
+        """Time waited so far over the expected total, from recent render times; below 1 until done."""
+        with self._cond:
+            typical = statistics.median(self._render_seconds) if self._render_seconds else DEFAULT_RENDER_SECONDS
+            now = time.monotonic()
+            if job.started is not None:
+                left = typical - (now - job.started)
+            else:
+                # Workers free up every typical / workers seconds on average; then it renders itself
+                ahead = self._queue.index(job) if job in self._queue else 0
+                left = typical * (ahead + 1) / self.workers + typical
+            waited = now - job.submitted
+            return min(waited / (waited + max(left, 0.05 * typical)), 0.99)
+
+
+REPORTS = ReportService(os.environ.get("SOLAR_PDF_WORKERS", 2), os.environ.get("SOLAR_PDF_QUEUE", 16))
@@ -0,0 +1,117 @@
+"""
+Sensitivity (tornado) analysis for one quote.
+
+Which input moves the payback most? sensitivity() moves each input in
+SENSITIVITY_INPUTS down and then up by its step, one at a time, keeping
+everything else at the quote's own values:
+
+    sunlight_hours      hours/day, around the area's AREA_SUN_MAP value
+    daytime_option      daytime share of the household's use
+    export_rate_factor  the SMP export rate (0.2703/0.3703 RM/kWh), as a factor
+    sst_rate            SST on the new bill
+    kwtbb_rate          KWTBB on the new bill after SST
+    price_factor        the panel-count cost tier, as a factor
+
+The base quote and every variant are priced in one solar_engine._compute()
+pass over 2 * len(SENSITIVITY_INPUTS) + 1 rows, not one quote() per
+variant. Bars come back largest payback swing first, the order of a
+tornado chart.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from solar_engine import _compute
+from tariffs import current_tariff
+
+# input -> (label, step, (lowest, highest) allowed value, value format)
+SENSITIVITY_INPUTS = {
+    "sunlight_hours":     ("Sunlight hours",      0.3,   (0.0, np.inf), "{:.2f} h".format),
+    "daytime_option":     ("Daytime usage share", 0.1,   (0.0, 1.0),    "{:.0%}".format),
+    "export_rate_factor": ("Export rate",         0.2,   (0.0, np.inf), "{:.0%}".format),
+    "sst_rate":           ("SST rate",            0.02,  (0.0, np.inf), "{:.0%}".format),
+    "kwtbb_rate":         ("KWTBB rate",          0.006, (0.0, np.inf), "{:.1%}".format),
+    "price_factor":       ("System price tier",   0.1,   (0.0, np.inf), "{:.0%}".format),
+}
+
+
+@dataclass(frozen=True)
+class SensitivityBar:
+    """One input moved down and up; payback is the cash payback (cost / yearly saving), inf without saving."""
+    name: str
+    label: str
+    low_value: float
+    high_value: float
+    low_text: str
+    high_text: str
+    payback_years: tuple        # (low, high)
+    monthly_saving_rm: tuple    # (low, high)
+
+    def payback_swing(self):
+        low, high = self.payback_years
+        return abs(high - low) if np.isfinite(low) and np.isfinite(high) else np.inf
+
+
+@dataclass(frozen=True)
+class Sensitivity:
+    base_payback_years: float
+    base_monthly_saving_rm: float
+    bars: tuple                 # SensitivityBar, largest payback swing first
+
+    def table(self):
+        """One row per input, in bar order, with the payback change at each end."""
+        import pandas as pd  # only for display
+
+        return pd.DataFrame({
+            "Input": [b.label for b in self.bars],
+            "Low": [b.low_text for b in self.bars],
+            "High": [b.high_text for b in self.bars],
+            "Payback change at low (yrs)": [b.payback_years[0] - self.base_payback_years for b in self.bars],
+            "Payback change at high (yrs)": [b.payback_years[1] - self.base_payback_years for b in self.bars],
+            "Saving at low (RM/month)": [b.monthly_saving_rm[0] for b in self.bars],
+            "Saving at high (RM/month)": [b.monthly_saving_rm[1] for b in self.bars],
+        })
+
+
+def sensitivity(no_panels, sunlight_hours, monthly_bill, daytime_option=0.7, online_view=False, include_battery=False,
+                tariff=None):
+    """Tornado bars for one quote."""
+    tariff = tariff or current_tariff()
+    monthly_bill = float(monthly_bill) if monthly_bill else 0.0
+
+    base = {
+        "sunlight_hours": float(sunlight_hours),
+        "daytime_option": float(daytime_option),
+        "export_rate_factor": 1.0,
+        "sst_rate": tariff.sst_rate,
+        "kwtbb_rate": tariff.kwtbb_rate,
+        "price_factor": 1.0,
+    }
+    # Row 0 is the quote itself; rows 2i + 1 and 2i + 2 move input i down and up
+    rows = {name: np.full(2 * len(SENSITIVITY_INPUTS) + 1, value) for name, value in base.items()}
+    for i, (name, (_, step, limits, _)) in enumerate(SENSITIVITY_INPUTS.items()):
+        rows[name][2 * i + 1:2 * i + 3] = np.clip(base[name] + np.array([-step, step]), *limits)
+
+    r = _compute(
+        no_panels, rows["sunlight_hours"], monthly_bill, rows["daytime_option"], bool(online_view),
+        bool(include_battery), price_factor=rows["price_factor"], export_rate_factor=rows["export_rate_factor"],
+        sst_rate=rows["sst_rate"], kwtbb_rate=rows["kwtbb_rate"], tariff=tariff,
+    )
+    payback = r["roi_cash"].tolist()
+    saving = r["monthly_saving_rm"].tolist()
+
+    bars = []
+    for i, (name, (label, _, _, fmt)) in enumerate(SENSITIVITY_INPUTS.items()):
+        low, high = 2 * i + 1, 2 * i + 2
+        bars.append(SensitivityBar(
+            name=name,
+            label=label,
+            low_value=float(rows[name][low]),
+            high_value=float(rows[name][high]),
+            low_text=fmt(rows[name][low]),
+            high_text=fmt(rows[name][high]),
+            payback_years=(payback[low], payback[high]),
+            monthly_saving_rm=(saving[low], saving[high]),
+        ))
+    bars.sort(key=SensitivityBar.payback_swing, reverse=True)
+    return Sensitivity(base_payback_years=payback[0], base_monthly_saving_rm=saving[0], bars=tuple(bars))
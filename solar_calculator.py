@@ -1,10 +1,29 @@
-import math
+import numpy as np
+import pandas as pd
 import streamlit as st
-from PIL import Image
 
-# --- page-wide light yellow background ---
-st.markdown(
-    """
+from quote_cache import QUOTE_CACHE, cached_quote, pdf_cache_key, quote_key
+from quote_table import load_table
+from cashflow import DEGRADATION_RATE, OM_ESCALATION, PAYMENTS, TARIFF_ESCALATION, project
+from monte_carlo import MC_SAMPLES, uncertainty_bands
+from panel_optimizer import optimize_battery, optimize_panels
+from report_assets import load_assets
+from report_service import REPORTS, ReportQueueFull
+from sensitivity import sensitivity
+import stage_timing
+from tariffs import current_tariff
+from solar_engine import (
+    AREA_SUN_MAP,
+    DAYTIME_OPTIONS,
+    PANEL_RANGE,
+    consumption_for_bill,
+    recommend_panels,
+    tariff_for_bill,
+)
+
+# --- page-wide light yellow background and card styles (injected by main(), so importing this module
+# draws nothing; fragment reruns of the results page keep the copy sent by the last full run) ---
+PAGE_CSS = """
     <style>
       /* 1) keep the overall app light yellow */
       .stApp {
@@ -21,14 +40,44 @@ st.markdown(
       .stApp .stNumberInput>div>input {
         background-color: white !important;
       }
+      /* 4) metric cards of the results page */
+      .grid-container {
+        display: grid;
+        grid-template-columns: repeat(auto-fit, minmax(160px,1fr));
+        gap: 14px;
+        margin: 16px 0;
+      }
+      .card {
+        background: #fff;
+        border-radius: 10px;
+        padding: 12px 14px;
+        box-shadow: 0 1px 4px rgba(0,0,0,0.1);
+        display: flex;
+        flex-direction: column;
+        justify-content: space-between;
+        height: 90px; /* ✅ Fixed height for alignment */
+      }
+      .card .title {
+        font-size: 0.8rem;
+        color: #666;
+        margin-bottom: 6px;
+        line-height: 1.2;
+        white-space: normal;
+      }
+      .card .value {
+        font-size: 1.1rem;
+        font-weight: 600;
+        color: #222;
+        line-height: 1.2;
+      }
     </style>
-    """,
-    unsafe_allow_html=True
-)
+    """
+
+REPORT_POLL_SECONDS = 0.5  # how often the PDF panel checks a report that is being prepared
 
 # # --- Constants ---
 # PANEL_WATT = 640
-GENERAL_TARIFF = 1
+# GENERAL_TARIFF = 1
 # TARIFF_ENERGY = 1
 # DAILY_USAGE_RATIO = 0.7  # 70% daytime usage
 # INTEREST_RATE = 0.08
@@ -45,443 +94,14 @@ GENERAL_TARIFF = 1
 # MICROINV_UNITS   = 5.0        # units
 
 
+def main():
+    # --- page-wide light yellow background ---
+    st.markdown(PAGE_CSS, unsafe_allow_html=True)
 
-def calculate_values(no_panels, sunlight_hours, monthly_bill, daytime_option=0.7, online_view=False):
-    monthly_bill = float(monthly_bill) if monthly_bill else 0.0
-
-    # --- Step 1: Tariff selection based on bill ---
-    if monthly_bill <= 666.45:
-        GENERAL_TARIFF = 0.4443
-    elif monthly_bill >= 816.45:
-        GENERAL_TARIFF = 0.5443
-    else:
-        return {
-            "No Panels": no_panels,
-            "general_tariff": "Invalid range (666.45–816.45)",
-            "monthly_bill_warning": "Please enter a bill below RM 666.45 or above RM 816.45"
-        }
-
-    # --- Step 2: Fixed constants ---
-    PANEL_WATT = 640
-    ENERGY_OFFSET_RATIO = 0.6
-    ENERGY_TARIFF = GENERAL_TARIFF
-
-    # --- Step 3: Estimate total consumption ---
-    est_kwh = monthly_bill / GENERAL_TARIFF
-
-    # --- Step 4: Over-generation target (120%) ---
-    oversize_factor = 1.2
-    target_kwh = est_kwh * oversize_factor
-
-    # --- Step 5: Per-panel generation ---
-    per_panel_monthly_total = (PANEL_WATT / 1000) * sunlight_hours * 30
-    per_panel_daytime_kwh = per_panel_monthly_total
-
-    # --- Step 6: Recommended panels (EVEN PANEL RULE) ---
-    raw_needed = math.ceil(target_kwh / per_panel_monthly_total)
-
-    # Ensure even number
-    if raw_needed % 2 != 0:
-        raw_needed += 1
-
-    recommended = max(min(raw_needed, 20000), 10000)
-
-    # --- Step 7: System yield ---
-    kwp = no_panels * PANEL_WATT / 1000
-    total_solar_kwh = per_panel_monthly_total * no_panels
-
-    # Split generation into direct usage vs export
-    direct_used_kwh = est_kwh * daytime_option
-    exported_kwh = total_solar_kwh - direct_used_kwh
-
-    # --- Step 8: Export rate ---
-    export_rate = (0.2703 if est_kwh <= 1500 else 0.3703) # fixed SMP rate
-    export_credit_rm = exported_kwh * export_rate
-
-    # --- Step 9: Night usage and new bill calculation ---
-    night_kwh = est_kwh * (1 - daytime_option)
-
-    # Sub charges
-    energy_charge_rm = night_kwh * (0.2703 if est_kwh <= 1500 else 0.3703)
-    network_charge_rm = night_kwh * 0.1285
-    capacity_charge_rm = night_kwh * 0.0455
-    retail_charge_rm = 0.0 if est_kwh < 600 else 10.0
-
-    # Apply export credit ONLY to the energy charge
-    energy_charge_after_offset = max(energy_charge_rm - export_credit_rm, 0)
-
-    # Now calculate subtotal (export does NOT reduce other charges)
-    subtotal_rm = (
-        energy_charge_after_offset +
-        network_charge_rm +
-        capacity_charge_rm +
-        retail_charge_rm
-    )
-    subtotal_rm = max(subtotal_rm, 0)
-
-    # Taxes
-    if est_kwh < 600:
-        kwtbb_rm = 0.0
-        sst_rm = 0.0
-        final_new_bill_rm = subtotal_rm
-    else:
-        # ✅ SST first
-        sst_rm = subtotal_rm * 0.08
-        after_sst_rm = subtotal_rm + sst_rm
-
-        # ✅ KWTBB after SST
-        kwtbb_rm = after_sst_rm * 0.016
-        final_new_bill_rm = after_sst_rm + kwtbb_rm
-
-    # --- Step 10: Estimated Saving ---
-    estimated_saving = max(monthly_bill - final_new_bill_rm, 0)
-
-    # --- Step 11: Cost tiers ---
-    if no_panels < 10:
-        cost_cash = 20000
-    elif 10 <= no_panels <= 17:
-        cost_cash = 20000 + (no_panels - 10) * 1000
-    elif no_panels >= 18:
-        cost_cash = 29000 + (no_panels - 18) * 1000
-    else:
-        cost_cash = 60000
-
-    ONLINE_BUFFER = 3000 if online_view else 0
-    cost_cash += ONLINE_BUFFER
-
-    # --- Step 12: Installments ---
-    INTEREST_RATE = 0.08
-    INSTALLMENT_YEARS = 4
-    installment_total = cost_cash * (1 + INTEREST_RATE)
-    installment_4yrs = installment_total / (INSTALLMENT_YEARS * 12)
-
-    # --- Step 13: ROI ---
-    yearly_saving = estimated_saving * 12
-    roi_cash = cost_cash / yearly_saving if yearly_saving else float("inf")
-    roi_cc = installment_total / yearly_saving if yearly_saving else float("inf")
-    save_per_pv = yearly_saving / no_panels if no_panels else 0.0
-
-    # --- Step 14: Environmental Impact ---
-    total_fossil = 350 * kwp
-    total_trees = 2 * kwp
-    total_co2 = 0.85 * kwp
-
-    # --- Step 15: Battery Calculation ---
-    solar_capacity_kw = kwp
-    est_battery_capacity = solar_capacity_kw * 2  # solar * 2
-    battery_kwh = max(10, math.floor(est_battery_capacity / 5) * 5)  # round to nearest 5
-    battery_price = (battery_kwh / 5) * 3300  # RM 3300 per 5kWh
-
-    # --- Step 16: Return Dictionary (unchanged) ---
-    return {
-        "No Panels": no_panels,
-        "Recommended Panels": recommended,
-        "kWp": f"{kwp:.2f}".rstrip('0').rstrip('.'),
-        "Daily Yield (kWh)": f"{(total_solar_kwh / 30):.2f}".rstrip('0').rstrip('.'),
-        "Daytime Saving (kWh)": f"{direct_used_kwh / 30:.2f}".rstrip('0').rstrip('.'),
-        "Daytime Saving (RM)": f"{math.floor(estimated_saving / 30 + 0.5):,}",
-        "Daily Saving (RM)": f"{math.floor(estimated_saving / 30 + 0.5):,}",
-        "Monthly Saving (RM)": f"{math.floor(estimated_saving + 0.5):,}",
-        "Yearly Saving (RM)": f"{math.floor(yearly_saving + 0.5):,}",
-        "Total Cost (RM)": f"{math.floor(cost_cash + 0.5):,}",
-        "Installment 8% Interests": f"{math.floor(installment_total + 0.5):,}",
-        "Installment 4 Years (RM)": f"{installment_4yrs:,.2f}",
-        "monthly_gen_kwh": f"{math.floor(no_panels * per_panel_monthly_total + 0.5):,}",
-        "monthly_kwh": f"{est_kwh:.2f}",
-        "new_monthly": f"{math.floor(final_new_bill_rm + 0.5):,}",
-        "roi_cash": f"{roi_cash:.2f}".rstrip('0').rstrip('.'),
-        "roi_cc": f"{roi_cc:.2f}".rstrip('0').rstrip('.'),
-        "save_per_pv": f"{math.floor(save_per_pv + 0.5):,}",
-        "kwp_installed": f"{kwp:.2f}".rstrip('0').rstrip('.'),
-        "kwac": f"{(kwp * 0.9):.2f}".rstrip('0').rstrip('.'),
-        "cost_cash": f"{math.floor(cost_cash + 0.5):,}",
-        "cost_cc": f"{math.floor(installment_total + 0.5):,}",
-        "om_fee_monthly": f"{math.floor(cost_cash * 0.01 / 12 + 0.5):,}",
-        "total_fossil": f"{math.floor(total_fossil + 0.5):,}",
-        "total_trees": f"{math.floor(total_trees + 0.5):,}",
-        "total_co2": f"{math.floor(total_co2 + 0.5):,}",
-        "general_tariff": f"{GENERAL_TARIFF:.4f}",
-        "energy_tariff": f"{ENERGY_TARIFF:.4f}",
-        "energy_portion_rm": f"{math.floor(monthly_bill * ENERGY_OFFSET_RATIO + 0.5):,}",
-        "target_kwh": f"{math.floor(target_kwh + 0.5):,}",
-        "per_panel_monthly_total": f"{per_panel_monthly_total:.2f}".rstrip('0').rstrip('.'),
-        "per_panel_daytime_kwh": f"{per_panel_daytime_kwh:.2f}".rstrip('0').rstrip('.'),
-        "Battery Capacity (kWh)": f"{battery_kwh:.0f}",
-        "Battery Price (RM)": f"{math.floor(battery_price + 0.5):,}",
-    }
-
-def get_energy_charge_rate(monthly_bill):
-    """
-    Returns the correct ENERGY CHARGE (RM/kWh) based on total monthly consumption.
-    """
-    # Rough estimate to get monthly consumption (since the bill includes other charges)
-    est_kwh = monthly_bill / GENERAL_TARIFF
-
-    if est_kwh <= 1500:
-        return 0.2703  # Energy charge below 1500 kWh
-    else:
-        return 0.3703  # Energy charge above 1500 kWh
-
-def build_pdf(bill, raw_needed, pkg, c):
-    import io, re, os, urllib.request, tempfile
-    from fpdf import FPDF
-
-    # ---------- Helpers ----------
-    def clean_number(x):
-        if x is None:
-            return 0.0
-        if isinstance(x, (int, float)):
-            return float(x)
-        if isinstance(x, str):
-            s = re.sub(r"[^\d.\-]", "", x)
-            try:
-                return float(s)
-            except:
-                return 0.0
-        return 0.0
-
-    def get_str(key):
-        return str(c.get(key) or "-")
-
-    # ---------- PDF-only Financial Logic ----------
-    BASE_COST = clean_number(c.get("Total Cost (RM)"))
-    PDF_ESTIMATED_COST = BASE_COST
-
-    MONTHLY_SAVING = clean_number(c.get("Monthly Saving (RM)"))
-    YEARLY_SAVING = MONTHLY_SAVING * 12 if MONTHLY_SAVING else 0
-
-    PDF_ROI_CASH = round(PDF_ESTIMATED_COST / YEARLY_SAVING, 1) if YEARLY_SAVING else "-"
-
-    # ---------- PDF Setup ----------
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-
-    # ---------- Color Palette ----------
-    GREEN = (76, 175, 80)
-    YELLOW = (255, 193, 7)
-    LIGHT_BG = (255, 249, 230)
-    TEXT = (60, 60, 60)
-    GREY = (140, 140, 140)
-
-    # ---------- Header ----------
-    pdf.set_fill_color(*GREEN)
-    pdf.rect(0, 0, 210, 30, "F")
-
-    logo_url = "https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcRvUrQzbNoJwW7pypHZ9yweCafrQtCWeKRjUg&s"
-    tmp = tempfile.gettempdir()
-    logo = os.path.join(tmp, "logo.png")
-
-    try:
-        urllib.request.urlretrieve(logo_url, logo)
-        pdf.image(logo, 10, 6, 18)
-    except:
-        pass
-
-    pdf.set_xy(35, 8)
-    pdf.set_font("Helvetica", "B", 18)
-    pdf.set_text_color(255, 255, 255)
-    pdf.cell(0, 10, "Preliminary Solar Assessment Report", ln=True)
-
-    pdf.ln(20)
-    pdf.set_text_color(*TEXT)
-
-    # ---------- UI Components ----------
-    def section(title):
-        pdf.ln(4)
-        pdf.set_font("Helvetica", "B", 14)
-        pdf.set_fill_color(*YELLOW)
-        pdf.cell(0, 9, f"  {title}", ln=True, fill=True)
-        pdf.ln(3)
-
-    def table(rows):
-        label_w, value_w = 100, 90
-        for label, value in rows:
-            pdf.set_font("Helvetica", "", 11)
-            pdf.set_fill_color(*LIGHT_BG)
-            pdf.cell(label_w, 8, label, border=1, fill=True)
-            pdf.set_font("Helvetica", "B", 11)
-            pdf.cell(value_w, 8, str(value), border=1, ln=True, fill=True, align="C")
-        pdf.ln(3)
-
-    def summary_block(rows, highlight_label=None):
-        start_y = pdf.get_y()
-        block_height = len(rows) * 9 + 6
-
-        pdf.set_fill_color(245, 245, 245)
-        pdf.rect(10, start_y, 190, block_height, "F")
-
-        pdf.ln(4)
-        for label, value in rows:
-            is_highlight = (label == highlight_label)
-
-            pdf.set_font("Helvetica", "B" if is_highlight else "", 11)
-            pdf.set_text_color(0 if is_highlight else 60)
-
-            pdf.cell(120, 8, label)
-            pdf.cell(0, 8, value, ln=True, align="C")
-
-        pdf.ln(6)
-        pdf.set_text_color(*TEXT)
-
-    # ---------- Input Summary ----------
-    section("Input Summary")
-    table([
-        ("Monthly Bill (RM)", f"{float(bill):,.2f}" if bill else "0.00"),
-        ("Tariff Rate (RM/kWh)", get_str("general_tariff")),
-        ("Estimated Monthly Consumption (kWh)", get_str("monthly_kwh")),
-    ])
-
-    # ---------- System Size Overview ----------
-    section("System Size Overview")
-    summary_block([
-        ("System Size", f"{get_str('kwp_installed')} kWp"),
-        ("Solar Panels Installed", f"{pkg} panels"),
-        ("Inverter Capacity", f"{get_str('kwac')} kWac"),
-        ("Battery Capacity", f"{get_str('Battery Capacity (kWh)')} kWh" if c.get("include_battery") else "-"),
-    ], highlight_label="Solar Panels Installed")
-
-    # ---------- Key Savings Overview ----------
-    section("Key Savings Overview")
-    summary_block([
-        ("Estimated Monthly Saving", f"RM {MONTHLY_SAVING:,.0f}"),
-        ("Estimated Yearly Saving", f"RM {YEARLY_SAVING:,.0f}"),
-        ("New Estimated Monthly Bill", f"RM {get_str('new_monthly')}"),
-    ], highlight_label="Estimated Monthly Saving")
-
-    # ---------- Financial Details (PDF-only adjusted) ----------
-    section("Financial Details")
-    summary_block([
-        ("Estimated System Price", f"RM {PDF_ESTIMATED_COST:,.0f}"),
-        ("Estimated ROI (Cash Purchase)", f"{PDF_ROI_CASH} years"),
-    ], highlight_label="Estimated System Price")
-
-    pdf.set_font("Helvetica", "I", 9)
-    pdf.set_text_color(*GREY)
-    pdf.multi_cell(
-        0, 5,
-        "Pricing shown is an estimated budgetary figure for preliminary assessment only. "
-        "Final system price and return on investment will be confirmed after site survey "
-        "and detailed engineering design."
-    )
-    pdf.set_text_color(*TEXT)
-    pdf.ln(40)
-    pdf.ln(60)
-
-    # ---------- Key Metrics ----------
-    section("Key Metrics")
-    table([
-        ("Estimated Monthly Generation (kWh)", get_str("monthly_gen_kwh")),
-        ("Estimated Daytime Saving (kWh/day)", get_str("Daytime Saving (kWh)")),
-        ("Estimated Daily Saving (RM)", get_str("Daily Saving (RM)")),
-        ("Estimated Monthly Saving (RM)", get_str("Monthly Saving (RM)")),
-        ("Estimated Yearly Saving (RM)", get_str("Yearly Saving (RM)")),
-        ("Estimated New Monthly Bill (RM)", get_str("new_monthly")),
-    ])
-
-    # ---------- Solar System Details ----------
-    section("Solar System Details")
-    table([
-        ("Installed Capacity (kWp)", get_str("kwp_installed")),
-        ("Inverter Output (kWac)", get_str("kwac")),
-        ("Per Panel Yield (kWh / month)", get_str("per_panel_monthly_total")),
-    ])
-
-    # ---------- Battery ----------
-    if c.get("include_battery"):
-        section("Battery Details")
-        table([
-            ("Battery Capacity (kWh)", get_str("Battery Capacity (kWh)")),
-        ])
-
-    # ---------- Environmental Impact ----------
-    section("Environmental Impact")
-    table([
-        ("Fossil Fuel Saved (kg)", get_str("total_fossil")),
-        ("Trees Saved", get_str("total_trees")),
-        ("CO2 Avoided (tons)", get_str("total_co2")),
-    ])
-
-    # ---------- Footer ----------
-    pdf.ln(5)
-    pdf.set_font("Helvetica", "I", 9)
-    pdf.set_text_color(*GREY)
-    pdf.multi_cell(
-        0, 5,
-        "Note: All figures shown are estimates based on provided inputs. "
-        "Actual savings and performance may vary depending on site conditions, "
-        "weather, and usage behavior."
-    )
-
-    # ==========================================
-    # Closing Page (Full Page Image)
-    # ==========================================
-    final_image_path = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)),
-        "assets",
-        "closing_page.png"
-    )
-
-    if os.path.exists(final_image_path):
-
-        # Add new page
-        pdf.add_page()
-
-        # PDF page size
-        PAGE_W = pdf.w
-        PAGE_H = pdf.h
-
-        # Read image size
-        img = Image.open(final_image_path)
-        img_w_px, img_h_px = img.size
-
-        img_ratio = img_w_px / img_h_px
-        page_ratio = PAGE_W / PAGE_H
-
-        # Scale image to completely cover page
-        if img_ratio > page_ratio:
-            # Image is wider than page
-            img_h = PAGE_H
-            img_w = img_h * img_ratio
-            x = -(img_w - PAGE_W) / 2
-            y = 0
-        else:
-            # Image is taller than page
-            img_w = PAGE_W
-            img_h = img_w / img_ratio
-            x = 0
-            y = -(img_h - PAGE_H) / 2
-
-        # Draw image
-        pdf.image(
-            final_image_path,
-            x=x,
-            y=y,
-            w=img_w,
-            h=img_h
-        )
-
-    else:
-        print(f"Closing image not found: {final_image_path}")
-
-    # def draw_page_background(pdf, color):
-    #     pdf.set_fill_color(*color)
-    #     pdf.rect(0, 0, 248, 352, style="F")  # A4 size in mm
-
-    # LIGHT_GREEN_BG = (235, 245, 235)  # RGB
-    # draw_page_background(pdf, LIGHT_GREEN_BG)
-
-        
-
-    # ---------- Output ----------
-    pdf_bytes = pdf.output(dest="S")
-    if isinstance(pdf_bytes, str):
-        pdf_bytes = pdf_bytes.encode("latin-1")
-
-    return io.BytesIO(pdf_bytes)
-
+    # Report images and the quote table are loaded once per process; later reruns reuse them
+    load_assets()
+    load_table()
 
-def main():
     st.title("☀️ Solar Savings Calculator")
 
     if 'calculated' not in st.session_state:
@@ -504,8 +124,8 @@ def main():
             bill_input = st.text_input(
                 "Monthly Electricity Bill (MYR):",
                 key="bill_input",
-                placeholder="Below 666.45 or above 816.45",
-                help="Please enter a bill amount below RM 666.45 or above RM 816.45"
+                placeholder="e.g. 450",
+                help="Your average monthly electricity bill in RM, including SST and KWTBB"
             )
             bill_input = float(bill_input) if bill_input else 0
             submitted = st.form_submit_button("Calculate")
@@ -518,13 +138,7 @@ def main():
         # --- Step 0: Select location (for sunlight hours) ---
         st.subheader("📍 Select Location")
 
-        area_sun_map = {
-            "Johor Bahru":   3.42,
-            "BP/Muar":       3.56,
-            "Kuala Lumpur":  3.62,
-            "North":         3.75,
-            "Default": 3.5
-        }
+        area_sun_map = AREA_SUN_MAP
 
         # Default 3.5 hours/day if nothing selected
         selected_area = st.selectbox(
@@ -569,411 +183,433 @@ def main():
 
 
     if st.session_state.calculated:
-        bill = st.session_state.bill
-
-        st.subheader("📦 Solar Panel Package Selection")
-
-        # --- Step 2: Tariff selection based on bill ---
-        if bill <= 666.45:
-            GENERAL_TARIFF = 0.4443
-        elif bill >= 816.45:
-            GENERAL_TARIFF = 0.5443
-        else:
-            st.warning("⚠️ Please enter a bill below RM 666.45 or above RM 816.45.")
-            st.stop()
-
-        # --- Step 3: Constants ---
-        PANEL_WATT = 640
-
-        # --- Step 4: Estimate monthly consumption ---
-        est_kwh = bill / GENERAL_TARIFF  # total kWh/month (approx)
-
-        # --- Step 5: Daytime usage selection ---
-        daytime_option = st.radio(
-            "Select estimated daytime usage portion:",
-            options=[0.2, 0.3, 0.5, 0.7],
-            index=[0.2, 0.3, 0.5, 0.7].index(st.session_state.get("daytime_option", 0.3) if st.session_state.get("daytime_option", 0.3) in [0.2, 0.3, 0.5, 0.7] else 0.3),
-            format_func=lambda x: f"{int(x*100)}% daytime usage",
-            horizontal=True,
-            help="Estimate how much of your solar energy is used directly during the day."
-        )
-        st.session_state.daytime_option = daytime_option
-
-        # --- Step 6: Solar generation per panel (kWh/month) ---
-        per_panel_monthly_total = (PANEL_WATT / 1000) * sunlight_hours * 30
-
-        # --- Step 7: Recommended number of panels ---
-        raw_needed = math.ceil(est_kwh / per_panel_monthly_total)
-
-        # Force even number
-        if raw_needed % 2 != 0:
-            raw_needed += 1
-
-        # Keep within 10–100 range
-        recommended = min(max(raw_needed, 10), 100000)
-
-        # Reset slider if sunlight changed
-        if "last_sunlight" not in st.session_state or st.session_state.last_sunlight != sunlight_hours:
-            st.session_state.pkg = recommended
-            st.session_state.last_sunlight = sunlight_hours
-
-        # Reset slider if daytime option changed
-        if "last_daytime_option" not in st.session_state or st.session_state.last_daytime_option != daytime_option:
-            st.session_state.pkg = recommended
-            st.session_state.last_daytime_option = daytime_option
-
-        # --- Step 8: Panel count slider ---
-        pkg = st.slider(
-            "Number of panels:",
-            min_value=10,
-            max_value=100,
-            step=1,
-            value=st.session_state.get("pkg", recommended),
-            help=f"Recommended to slightly exceed your RM {bill:.0f} monthly usage ({est_kwh:.0f} kWh)."
-        )
+        results_page(st.session_state.bill, sunlight_hours)
 
-        # --- Proposal Mode ---
-        st.subheader("📄 Proposal Mode")
+    if stage_timing.enabled():
+        stage_timing_panel()
 
-        online_view = st.checkbox(
-            "Online View (+3000 on the total cost)",
-            value=False,
-            help="Online enquiries include an estimation buffer. Final price will be confirmed after site survey."
-        )
 
-        st.session_state.online_view = online_view
-
-        # --- Online estimation buffer ---
-        ONLINE_BUFFER = 3000 if st.session_state.get("online_view", True) else 0
-
-        # --- Battery Mode ---
-        st.subheader("🔋 Battery Mode")
-
-        # --- Battery option ---
-        include_battery = st.checkbox("🔋 Include Battery Storage?", value=st.session_state.get("include_battery", False))
-        st.session_state.include_battery = include_battery
-
-        battery_kwh = 0
-        battery_price = 0
-
-        if include_battery:
-            solar_capacity_kw = (pkg * PANEL_WATT) / 1000
-            est_capacity = solar_capacity_kw * 2
-            battery_kwh = max(10, math.floor(est_capacity / 5) * 5)
-            battery_price = (battery_kwh / 5) * 3300
-
-        st.session_state.battery_kwh = battery_kwh
-        st.session_state.battery_price = battery_price
-
-        # --- Step 9: Solar generation & battery logic ---
-        total_solar_kwh = per_panel_monthly_total * pkg
-
-        # Daily values
-        daily_solar = total_solar_kwh / 30
-        daily_usage = est_kwh / 30
-        daily_day_use = daily_usage * daytime_option
-        daily_night_use = daily_usage * (1 - daytime_option)
-
-        # Direct daytime usage
-        direct_used_day = min(daily_solar, daily_day_use)
-        excess_after_day = daily_solar - direct_used_day
-
-        # Battery charging
-        if include_battery:
-            battery_capacity = battery_kwh
-            battery_store = min(excess_after_day, battery_capacity)
-            solar_left_after_battery = excess_after_day - battery_store
-        else:
-            battery_store = 0
-            solar_left_after_battery = excess_after_day
-
-        # Nighttime usage offset from battery
-        if include_battery:
-            battery_discharge = min(battery_store, daily_night_use)
-            night_from_grid = daily_night_use - battery_discharge
-        else:
-            battery_discharge = 0
-            night_from_grid = daily_night_use
-
-        # Export only if all battery is full
-        export_kwh_daily = max(solar_left_after_battery, 0)
-
-        # Convert back to monthly
-        direct_used_kwh = direct_used_day * 30
-        battery_charge_kwh = battery_store * 30
-        battery_to_night_kwh = battery_discharge * 30
-        night_from_grid_kwh = night_from_grid * 30
-        exported_kwh = export_kwh_daily * 30
-
-        # --- Step 10: Savings calculations ---
-        export_rate = (0.2703 if est_kwh <= 1500 else 0.3703)
-
-        direct_saving_rm = direct_used_kwh * GENERAL_TARIFF
-        battery_saving_rm = battery_to_night_kwh * GENERAL_TARIFF
-        export_credit_rm = exported_kwh * export_rate
-
-        total_saving_rm = direct_saving_rm + battery_saving_rm + export_credit_rm
-
-        # --- Step 11: Bill calculation using NIGHT FROM GRID ---
-        def get_energy_charge_rate(monthly_bill):
-            est_kwh = monthly_bill / GENERAL_TARIFF
-            return 0.2703 if est_kwh <= 1500 else 0.3703
-
-        energy_charge_rm = night_from_grid_kwh * get_energy_charge_rate(bill)
-        network_charge_rm = night_from_grid_kwh * 0.1285
-        capacity_charge_rm = night_from_grid_kwh * 0.0455
-        retail_charge_rm = 0.0 if est_kwh < 600 else 10.0
-
-        # Apply export credit to energy charge
-        energy_charge_after_offset = max(energy_charge_rm - export_credit_rm, 0)
-
-        subtotal_rm = (
-            energy_charge_after_offset
-            + network_charge_rm
-            + capacity_charge_rm
-            + retail_charge_rm
-        )
+@st.fragment
+def results_page(bill, sunlight_hours):
+    """Everything below the form; its widgets rerun only this fragment, not the whole page."""
+    lap = stage_timing.laps("ui")
 
-        if est_kwh < 600:
-            kwtbb_rm = 0.0
-            sst_rm = 0.0
-            final_new_bill_rm = subtotal_rm
-        else:
-            # ✅ SST first
-            sst_rm = subtotal_rm * 0.08
-            after_sst_rm = subtotal_rm + sst_rm
-
-            # ✅ KWTBB after SST
-            kwtbb_rm = after_sst_rm * 0.016
-            final_new_bill_rm = after_sst_rm + kwtbb_rm
-
-        estimated_saving_rm = max(bill - final_new_bill_rm, 0)
-
-        # --- Step 12: Summary ---
-
-        # --- Overview ---
-        st.subheader("📄 Overview")
-
-        st.success(
-            f"""
-            💰 **Estimated Monthly Saving:** RM {estimated_saving_rm:,.2f}  
-            🧾 **New Bill (after solar):** RM {final_new_bill_rm:,.2f}  
-            ☀️ **Solar Generation:** {total_solar_kwh:.0f} kWh/month  
-            🔋 Battery Charge: {battery_charge_kwh:.0f} kWh/month  
-            🌙 Nighttime Offset from Battery: {battery_to_night_kwh:.0f} kWh/month  
-            📤 Exported Energy: {exported_kwh:.0f} kWh/month  
-            Recommended Panels: **{recommended}**
-            """
-        )
+    # Checked once per rerun: an edited tariff file takes effect here (and clears QUOTE_CACHE)
+    tariff = current_tariff()
 
-        st.markdown(
-            f"_Note: Savings depend on your actual daytime consumption, nighttime usage, and export credit rate._",
-            unsafe_allow_html=True
+    st.subheader("📦 Solar Panel Package Selection")
+
+    # --- Step 2-4: Monthly consumption behind the bill, and its tariff block ---
+    est_kwh = consumption_for_bill(bill, tariff)  # every charge and tax inverted
+    GENERAL_TARIFF = tariff_for_bill(bill, tariff)
+
+    # --- Step 5: Daytime usage selection ---
+    daytime_option = st.radio(
+        "Select estimated daytime usage portion:",
+        options=list(DAYTIME_OPTIONS),
+        index=DAYTIME_OPTIONS.index(st.session_state.get("daytime_option", 0.3) if st.session_state.get("daytime_option", 0.3) in DAYTIME_OPTIONS else 0.3),
+        format_func=lambda x: f"{int(x*100)}% daytime usage",
+        horizontal=True,
+        help="Estimate how much of your solar energy is used directly during the day."
+    )
+    st.session_state.daytime_option = daytime_option
+
+    # --- Step 6-7: Recommended number of panels ---
+    recommended = recommend_panels(bill, sunlight_hours, tariff)
+
+    # Reset slider if sunlight changed
+    if "last_sunlight" not in st.session_state or st.session_state.last_sunlight != sunlight_hours:
+        st.session_state.pkg = recommended
+        st.session_state.last_sunlight = sunlight_hours
+
+    # Reset slider if daytime option changed
+    if "last_daytime_option" not in st.session_state or st.session_state.last_daytime_option != daytime_option:
+        st.session_state.pkg = recommended
+        st.session_state.last_daytime_option = daytime_option
+
+    # --- Step 8: Panel count slider ---
+    pkg = st.slider(
+        "Number of panels:",
+        min_value=PANEL_RANGE[0],
+        max_value=PANEL_RANGE[1],
+        step=1,
+        value=st.session_state.get("pkg", recommended),
+        help=f"Recommended to slightly exceed your RM {bill:.0f} monthly usage ({est_kwh:.0f} kWh)."
+    )
+
+    # --- Proposal Mode ---
+    st.subheader("📄 Proposal Mode")
+
+    online_view = st.checkbox(
+        "Online View (+3000 on the total cost)",
+        value=False,
+        help="Online enquiries include an estimation buffer. Final price will be confirmed after site survey."
+    )
+
+    st.session_state.online_view = online_view
+
+    # --- Battery Mode ---
+    st.subheader("🔋 Battery Mode")
+
+    # --- Battery option ---
+    include_battery = st.checkbox("🔋 Include Battery Storage?", value=st.session_state.get("include_battery", False))
+    st.session_state.include_battery = include_battery
+
+    if include_battery:
+        sweep = QUOTE_CACHE.get_or_compute(
+            ("battery_sizing", pkg, sunlight_hours, round(float(bill), 2), daytime_option, online_view),
+            lambda: optimize_battery(pkg, sunlight_hours, bill, daytime_option, online_view),
         )
+        if sweep.best_kwh != sweep.rule_kwh:
+            st.caption(
+                f"💡 Hour-by-hour dispatch suggests **{sweep.best_kwh:.0f} kWh** for this system "
+                f"(battery pays back in {sweep.best_payback_years:.1f} years); the quote uses the "
+                f"standard {sweep.rule_kwh:.0f} kWh."
+            )
 
-        # --- Your calculate_values integration ---
-        c = calculate_values(pkg, sunlight_hours if sunlight_hours else 3.5, bill, daytime_option, online_view=st.session_state.get("online_view", True))
-
-        if include_battery:
-            # Parsing helper
-            def parse_float(val):
-                try:
-                    return float(str(val).replace(",", ""))
-                except:
-                    return 0.0
-
-            cost_cash_val = parse_float(c.get("Total Cost (RM)", 0))
-            battery_price_val = float(battery_price) if include_battery else 0
-
-            total_cost_with_battery = cost_cash_val + battery_price_val + ONLINE_BUFFER
-
-            interest_rate = 0.08
-            months = 48
-            installment_total = total_cost_with_battery * (1 + interest_rate)
-            installment_monthly = installment_total / months
-
-            yearly_saving_rm = float(estimated_saving_rm) * 12
-            roi_cash_years = total_cost_with_battery / yearly_saving_rm if yearly_saving_rm else float("inf")
-            roi_cc_years = installment_total / yearly_saving_rm if yearly_saving_rm else float("inf")
-
-            c["Total Cost (RM)"] = f"{total_cost_with_battery:,.0f}"
-            c["Installment 8% Interests"] = f"{installment_total:,.0f}"
-            c["Installment 4 Years (RM)"] = f"{installment_monthly:,.2f}"
-            c["roi_cash"] = f"{roi_cash_years:.2f}".rstrip("0").rstrip(".")
-            c["roi_cc"] = f"{roi_cc_years:.2f}".rstrip("0").rstrip(".")
-            c['include_battery'] = include_battery
-            c['new_monthly'] = f"{final_new_bill_rm:,.0f}"
-            c["Monthly Saving (RM)"] = f"{estimated_saving_rm:,.0f}"
-
-        # Inject card CSS
-        st.markdown("""
-        <style>
-        .grid-container {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(160px,1fr));
-            gap: 14px;
-            margin: 16px 0;
-        }
-        .card {
-            background: #fff;
-            border-radius: 10px;
-            padding: 12px 14px;
-            box-shadow: 0 1px 4px rgba(0,0,0,0.1);
-            display: flex;
-            flex-direction: column;
-            justify-content: space-between;
-            height: 90px; /* ✅ Fixed height for alignment */
-        }
-        .card .title {
-            font-size: 0.8rem;
-            color: #666;
-            margin-bottom: 6px;
-            line-height: 1.2;
-            white-space: normal;
-        }
-        .card .value {
-            font-size: 1.1rem;
-            font-weight: 600;
-            color: #222;
-            line-height: 1.2;
-        }
-        </style>
-        """, unsafe_allow_html=True)
+    # --- Hourly simulation option ---
+    hourly = st.checkbox(
+        "⏱️ Hourly simulation (8760 h)",
+        value=False,
+        help="Simulate every hour of a clear-sky year for your area instead of an average day. "
+             "Battery charging and discharging include round-trip losses."
+    )
 
-        # === KEY METRICS ===
-        st.subheader("📈 Key Metrics")
-        st.markdown(f"""
-        <div class="grid-container">
-        <div class="card"><div class="title">Estimated Solar Panel Needed</div><div class="value">{c['No Panels']}</div></div>
-        <div class="card"><div class="title">Estimated Monthly Saving (RM)</div><div class="value">RM {c['Monthly Saving (RM)']}</div></div>
-        <div class="card"><div class="title">Previous Bill</div><div class="value">RM {bill:,.0f}</div></div>
-        <div class="card"><div class="title">New Bill</div><div class="value">RM {c['new_monthly']}</div></div>
-        <div class="card"><div class="title">Total Cost (Cash)</div><div class="value">RM {c['Total Cost (RM)']}</div></div>
-        <div class="card"><div class="title">Total Installment (4 Years @ 8% Interest)</div><div class="value">RM {c['Installment 8% Interests']}</div></div>
-        <div class="card"><div class="title">Estimated ROI (Cash)</div><div class="value">{c['roi_cash']} yrs</div></div>
-        <div class="card"><div class="title">Estimated ROI (CC)</div><div class="value">{c['roi_cc']} yrs</div></div>
-        </div>
-        """, unsafe_allow_html=True)
+    # --- Step 9-11: Solar generation, battery flow, new bill and pricing (one engine pass) ---
+    q = cached_quote(pkg, sunlight_hours, bill, daytime_option, online_view, include_battery, hourly)
+    c, flow = q.result, q.flow
 
-        # Show battery info if applicable
-        if c.get("include_battery"):
-            st.markdown(f"""
-            <div class="grid-container">
-            <div class="card"><div class="title">Battery Storage</div><div class="value">{c['Battery Capacity (kWh)']} kWh</div></div>
-            <div class="card"><div class="title">Battery Cost</div><div class="value">RM {c['Battery Price (RM)']}</div></div>
-            </div>
-            """, unsafe_allow_html=True)
-
-        # === PANEL & SAVINGS SUMMARY ===
-        st.subheader("🔆 Panel & Savings Summary")
-        st.markdown(f"""
-        <div class="grid-container">
-        <div class="card"><div class="title">Consumption</div><div class="value">{c['monthly_kwh']} kWh</div></div>
-        <div class="card"><div class="title">Estimated No. of Panels</div><div class="value">{c['No Panels']}</div></div>
-        <div class="card"><div class="title">Installed Capacity</div><div class="value">{c['kWp']} kWp</div></div>
-        <div class="card"><div class="title">Estimated Daily Yield</div><div class="value">{c['Daily Yield (kWh)']} kWh</div></div>
-        <div class="card"><div class="title">Estimated Daytime Saving (kWh)</div><div class="value">{c['Daytime Saving (kWh)']} kWh</div></div>
-        <div class="card"><div class="title">Estimated Daytime Saving (RM)</div><div class="value">RM {c['Daytime Saving (RM)']}</div></div>
-        <div class="card"><div class="title">Estimated Daily Saving (RM)</div><div class="value">RM {c['Daily Saving (RM)']}</div></div>
-        <div class="card"><div class="title">Estimated Monthly Saving (RM)</div><div class="value">RM {c['Monthly Saving (RM)']}</div></div>
-        <div class="card"><div class="title">Estimated Yearly Saving (RM)</div><div class="value">RM {c['Yearly Saving (RM)']}</div></div>
-        </div>
-        """, unsafe_allow_html=True)
+    battery_kwh = c.battery_kwh if include_battery else 0
+    battery_price = c.battery_price if include_battery else 0
+
+    st.session_state.battery_kwh = battery_kwh
+    st.session_state.battery_price = battery_price
+
+    # --- Step 12: Summary ---
+
+    # --- Overview ---
+    st.subheader("📄 Overview")
+
+    st.success(
+        f"""
+        💰 **Estimated Monthly Saving:** RM {flow.estimated_saving_rm:,.2f}  
+        🧾 **New Bill (after solar):** RM {flow.final_new_bill_rm:,.2f}  
+        ☀️ **Solar Generation:** {flow.total_solar_kwh:.0f} kWh/month  
+        🔋 Battery Charge: {flow.battery_charge_kwh:.0f} kWh/month  
+        🌙 Nighttime Offset from Battery: {flow.battery_to_night_kwh:.0f} kWh/month  
+        📤 Exported Energy: {flow.exported_kwh:.0f} kWh/month  
+        Recommended Panels: **{recommended}**
+        """
+    )
+
+    st.markdown(
+        f"_Note: Savings depend on your actual daytime consumption, nighttime usage, and export credit rate._",
+        unsafe_allow_html=True
+    )
 
-        # === FINANCIAL SUMMARY ===
-        st.subheader("💰 Financial Summary")
+    d = c.display()
+
+    # === KEY METRICS ===
+    st.subheader("📈 Key Metrics")
+    st.markdown(f"""
+    <div class="grid-container">
+    <div class="card"><div class="title">Estimated Solar Panel Needed</div><div class="value">{d['No Panels']}</div></div>
+    <div class="card"><div class="title">Estimated Monthly Saving (RM)</div><div class="value">RM {d['Monthly Saving (RM)']}</div></div>
+    <div class="card"><div class="title">Previous Bill</div><div class="value">RM {bill:,.0f}</div></div>
+    <div class="card"><div class="title">New Bill</div><div class="value">RM {d['new_monthly']}</div></div>
+    <div class="card"><div class="title">Total Cost (Cash)</div><div class="value">RM {d['Total Cost (RM)']}</div></div>
+    <div class="card"><div class="title">Total Installment (4 Years @ 8% Interest)</div><div class="value">RM {d['Installment 8% Interests']}</div></div>
+    <div class="card"><div class="title">Estimated ROI (Cash)</div><div class="value">{d['roi_cash']} yrs</div></div>
+    <div class="card"><div class="title">Estimated ROI (CC)</div><div class="value">{d['roi_cc']} yrs</div></div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Show battery info if applicable
+    if c.include_battery:
         st.markdown(f"""
         <div class="grid-container">
-        <div class="card"><div class="title">Estimated Total Sav/Month</div><div class="value">RM {c['Monthly Saving (RM)']}</div></div>
-        <div class="card"><div class="title">Estimated Total Sav/Year</div><div class="value">RM {c['Yearly Saving (RM)']}</div></div>
-        <div class="card"><div class="title">Total Cost (Cash)</div><div class="value">RM {c['Total Cost (RM)']}</div></div>
-        <div class="card"><div class="title">Installment (8% Interest)</div><div class="value">RM {c['Installment 8% Interests']}</div></div>
-        <div class="card"><div class="title">Installment (4 Years)</div><div class="value">RM {c['Installment 4 Years (RM)']}</div></div>
-        <div class="card"><div class="title">Estimated ROI (Cash)</div><div class="value">{c['roi_cash']} yrs</div></div>
-        <div class="card"><div class="title">Estimated ROI (CC)</div><div class="value">{c['roi_cc']} yrs</div></div>
+        <div class="card"><div class="title">Battery Storage</div><div class="value">{d['Battery Capacity (kWh)']} kWh</div></div>
+        <div class="card"><div class="title">Battery Cost</div><div class="value">RM {d['Battery Price (RM)']}</div></div>
+        </div>
         """, unsafe_allow_html=True)
 
-        # Show battery info if applicable
-        if c.get("include_battery"):
-            st.markdown(f"""
-            <div class="grid-container">
-            <div class="card"><div class="title">Battery Storage</div><div class="value">{c['Battery Capacity (kWh)']} kWh</div></div>
-            <div class="card"><div class="title">Battery Cost</div><div class="value">RM {c['Battery Price (RM)']}</div></div>
-            </div>
-            """, unsafe_allow_html=True)
-
-        # === ENVIRONMENTAL BENEFITS ===
-        st.subheader("🌳 Environmental Benefits")
+    # === PANEL & SAVINGS SUMMARY ===
+    st.subheader("🔆 Panel & Savings Summary")
+    st.markdown(f"""
+    <div class="grid-container">
+    <div class="card"><div class="title">Consumption</div><div class="value">{d['monthly_kwh']} kWh</div></div>
+    <div class="card"><div class="title">Estimated No. of Panels</div><div class="value">{d['No Panels']}</div></div>
+    <div class="card"><div class="title">Installed Capacity</div><div class="value">{d['kWp']} kWp</div></div>
+    <div class="card"><div class="title">Estimated Daily Yield</div><div class="value">{d['Daily Yield (kWh)']} kWh</div></div>
+    <div class="card"><div class="title">Estimated Daytime Saving (kWh)</div><div class="value">{d['Daytime Saving (kWh)']} kWh</div></div>
+    <div class="card"><div class="title">Estimated Daytime Saving (RM)</div><div class="value">RM {d['Daytime Saving (RM)']}</div></div>
+    <div class="card"><div class="title">Estimated Daily Saving (RM)</div><div class="value">RM {d['Daily Saving (RM)']}</div></div>
+    <div class="card"><div class="title">Estimated Monthly Saving (RM)</div><div class="value">RM {d['Monthly Saving (RM)']}</div></div>
+    <div class="card"><div class="title">Estimated Yearly Saving (RM)</div><div class="value">RM {d['Yearly Saving (RM)']}</div></div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # === FINANCIAL SUMMARY ===
+    st.subheader("💰 Financial Summary")
+    st.markdown(f"""
+    <div class="grid-container">
+    <div class="card"><div class="title">Estimated Total Sav/Month</div><div class="value">RM {d['Monthly Saving (RM)']}</div></div>
+    <div class="card"><div class="title">Estimated Total Sav/Year</div><div class="value">RM {d['Yearly Saving (RM)']}</div></div>
+    <div class="card"><div class="title">Total Cost (Cash)</div><div class="value">RM {d['Total Cost (RM)']}</div></div>
+    <div class="card"><div class="title">Installment (8% Interest)</div><div class="value">RM {d['Installment 8% Interests']}</div></div>
+    <div class="card"><div class="title">Installment (4 Years)</div><div class="value">RM {d['Installment 4 Years (RM)']}</div></div>
+    <div class="card"><div class="title">Estimated ROI (Cash)</div><div class="value">{d['roi_cash']} yrs</div></div>
+    <div class="card"><div class="title">Estimated ROI (CC)</div><div class="value">{d['roi_cc']} yrs</div></div>
+    """, unsafe_allow_html=True)
+
+    # Show battery info if applicable
+    if c.include_battery:
         st.markdown(f"""
         <div class="grid-container">
-        <div class="card"><div class="title">Total Fossil /1 kWp</div><div class="value">{c['total_fossil']} kg</div></div>
-        <div class="card"><div class="title">Total Trees /1 kWp</div><div class="value">{c['total_trees']}</div></div>
-        <div class="card"><div class="title">Total CO₂ /1 kWp</div><div class="value">{c['total_co2']} t</div></div>
+        <div class="card"><div class="title">Battery Storage</div><div class="value">{d['Battery Capacity (kWh)']} kWh</div></div>
+        <div class="card"><div class="title">Battery Cost</div><div class="value">RM {d['Battery Price (RM)']}</div></div>
         </div>
         """, unsafe_allow_html=True)
 
-        # === DOWNLOAD PDF BUTTON ===
-        pdf_buffer = build_pdf(bill, raw_needed, pkg, c)
-        st.download_button(
-            label="📄 Download Report as PDF",
-            data=pdf_buffer,
-            file_name="Solar_Saving_Report.pdf",
-            mime="application/pdf"
-        )
-
-        # --- Step 11: Display results ---
+    # === UNCERTAINTY BANDS (seeded Monte Carlo, same numbers as the PDF) ===
+    key = quote_key(pkg, sunlight_hours, bill, daytime_option, online_view, include_battery)
+    if hourly:
+        # The bands sample the average-day model and need not contain an hourly quote
+        bands = None
+        st.caption("Likely ranges are based on the average-day model and are not shown with the hourly simulation.")
+    else:
+        bands = QUOTE_CACHE.get_or_compute(("bands",) + key, lambda: uncertainty_bands(*key))
+        saving_p10, saving_p50, saving_p90 = bands.monthly_saving_rm
         st.markdown(
-            f"""
-            ## ☀️ Solar Generation & Usage
-            - **Monthly consumption:** {est_kwh:.0f} kWh  
-            - **Total solar generation:** {total_solar_kwh:.0f} kWh/month  
-            - **Direct daytime usage:** {direct_used_kwh:.0f} kWh × RM {GENERAL_TARIFF:.4f} = RM {direct_saving_rm:.2f}  
-            {"- **Battery discharge (nighttime offset):** " + f"{battery_to_night_kwh:.0f} kWh × RM {GENERAL_TARIFF:.4f} = RM {battery_saving_rm:.2f}" if include_battery else ""}
-            - **Exported:** {exported_kwh:.0f} kWh × RM {export_rate:.4f} = RM {export_credit_rm:.2f}  
-
-            ## 🔋 Battery Flow Breakdown {("(Enabled)" if include_battery else "(Not used)")}
-            - **Battery capacity:** {battery_kwh:.0f} kWh  
-            - **Solar stored into battery:** {battery_charge_kwh:.0f} kWh/month  
-            - **Battery discharged at night:** {battery_to_night_kwh:.0f} kWh/month  
-            - **Nighttime grid usage:** {night_from_grid_kwh:.0f} kWh/month  
-
-            ## 🧾 New Monthly Bill Breakdown (with Formulas)
-            ### 🌙 Nighttime Charges (after battery offset)
-            **Nighttime kWh (from grid):** {night_from_grid_kwh:.0f}
-
-            | Charge Type | Formula | Amount (RM) |
-            |-------------|---------|-------------|
-            | Energy Charge | {night_from_grid_kwh:.0f} × {get_energy_charge_rate(bill):.4f} | {energy_charge_rm:.2f} |
-            | Network Charge | {night_from_grid_kwh:.0f} × 0.1285 | {network_charge_rm:.2f} |
-            | Capacity Charge | {night_from_grid_kwh:.0f} × 0.0455 | {capacity_charge_rm:.2f} |
-            | Retail Charge | {"❌ Waived" if est_kwh < 600 else "Flat RM 10"} | {0.00 if est_kwh < 600 else retail_charge_rm:.2f} |
-            | Export Credit | − {exported_kwh:.0f} × {export_rate:.4f} | −{export_credit_rm:.2f} |
-
-            _Note: Only can fully offset Energy Charge only._
-
-            **Subtotal (before tax)**  
-            → **RM {subtotal_rm:.2f}**
-
-            ## ⚡ Taxes & Fees
+            f"**Likely range ({MC_SAMPLES:,} scenarios, P10–P90):** monthly saving "
+            f"{bands.saving_range()} (median RM {saving_p50:,.0f}), cash payback {bands.payback_range()}"
+        )
 
-            **SST (8%)**  
-            {"❌ Waived" if est_kwh < 600 else f"{subtotal_rm:.2f} × 8% → **RM {sst_rm:.2f}**"}
+    # === 25-YEAR CASH FLOW and PANEL COUNT OPTIMIZER (own fragments: their radios rerun only them) ===
+    cash_flow_panel(c)
+    optimizer_panel(bill, sunlight_hours, daytime_option, online_view)
+
+    # === SENSITIVITY (TORNADO) ===
+    # The sweep and its chart are only built while the expander is open, or when the PDF includes them
+    sens_key = ("sensitivity",) + key
+    with st.expander("🌪️ Which input moves the payback most?", key="sensitivity_open", on_change="rerun") as expander:
+        if expander.open:
+            sens = QUOTE_CACHE.get_or_compute(sens_key, lambda: sensitivity(*key))
+            st.markdown(
+                f"**Cash payback:** {sens.base_payback_years:.1f} yrs. Each bar moves one input to its low "
+                f"or high value and shows the change in years (negative pays back sooner)."
+            )
+            table = sens.table()
+            table["Input"] = table["Input"] + " (" + table["Low"] + " / " + table["High"] + ")"
+            changes = table.set_index("Input")[["Payback change at low (yrs)", "Payback change at high (yrs)"]]
+            changes.columns = ["low", "high"]
+            st.bar_chart(
+                changes.where(np.isfinite(changes)),
+                horizontal=True, sort=False, stack="layered", x_label="payback change (years)", y_label="",
+            )
+            st.dataframe(table.round(2), hide_index=True)
+        add_to_pdf = st.checkbox("Add this chart to the PDF report", key="pdf_sensitivity")
+    pdf_sens = QUOTE_CACHE.get_or_compute(sens_key, lambda: sensitivity(*key)) if add_to_pdf else None
+
+    # === ENVIRONMENTAL BENEFITS ===
+    st.subheader("🌳 Environmental Benefits")
+    st.markdown(f"""
+    <div class="grid-container">
+    <div class="card"><div class="title">Total Fossil /1 kWp</div><div class="value">{d['total_fossil']} kg</div></div>
+    <div class="card"><div class="title">Total Trees /1 kWp</div><div class="value">{d['total_trees']}</div></div>
+    <div class="card"><div class="title">Total CO₂ /1 kWp</div><div class="value">{d['total_co2']} t</div></div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # === DOWNLOAD PDF BUTTON ===
+    # Rendered in the background by REPORTS; the panel polls while this session's report is under way
+    job = st.session_state.get("report_job")
+    polling = job is not None and not job.done()
+    st.fragment(report_panel, run_every=REPORT_POLL_SECONDS if polling else None)(
+        bill, recommended, pkg, c, bands, pdf_sens, polling
+    )
 
-            **After SST**  
-            {"RM {:.2f}".format(after_sst_rm) if est_kwh >= 600 else "RM 0.00"}
+    # --- Step 11: Display results ---
+    taxed = est_kwh >= tariff.tax_threshold_kwh  # retail charge, SST and KWTBB apply
+    st.markdown(
+        f"""
+        ## ☀️ Solar Generation & Usage
+        - **Monthly consumption:** {est_kwh:.0f} kWh  
+        - **Total solar generation:** {flow.total_solar_kwh:.0f} kWh/month  
+        - **Direct daytime usage:** {flow.direct_used_kwh:.0f} kWh × RM {GENERAL_TARIFF:.4f} = RM {flow.direct_saving_rm:.2f}  
+        {"- **Battery discharge (nighttime offset):** " + f"{flow.battery_to_night_kwh:.0f} kWh × RM {GENERAL_TARIFF:.4f} = RM {flow.battery_saving_rm:.2f}" if include_battery else ""}
+        - **Exported:** {flow.exported_kwh:.0f} kWh × RM {flow.export_rate:.4f} = RM {flow.export_credit_rm:.2f}  
+
+        ## 🔋 Battery Flow Breakdown {("(Enabled)" if include_battery else "(Not used)")}
+        - **Battery capacity:** {battery_kwh:.0f} kWh  
+        - **Solar stored into battery:** {flow.battery_charge_kwh:.0f} kWh/month  
+        - **Battery discharged at night:** {flow.battery_to_night_kwh:.0f} kWh/month  
+        - **Nighttime grid usage:** {flow.night_from_grid_kwh:.0f} kWh/month  
+        {f"- **Daytime grid usage (solar shortfall):** {flow.day_from_grid_kwh:.0f} kWh/month" if flow.day_from_grid_kwh > 0 else ""}
+
+        ## 🧾 New Monthly Bill Breakdown (with Formulas)
+        ### 🌙 Nighttime Charges (after battery offset)
+        **kWh from grid:** {flow.grid_kwh:.0f}
+
+        | Charge Type | Formula | Amount (RM) |
+        |-------------|---------|-------------|
+        | Energy Charge | {flow.grid_kwh:.0f} × {flow.energy_rate:.4f} | {flow.energy_charge_rm:.2f} |
+        | Network Charge | {flow.grid_kwh:.0f} × {tariff.network_rate:.4f} | {flow.network_charge_rm:.2f} |
+        | Capacity Charge | {flow.grid_kwh:.0f} × {tariff.capacity_rate:.4f} | {flow.capacity_charge_rm:.2f} |
+        | Retail Charge | {"❌ Waived" if not taxed else f"Flat RM {tariff.retail_charge:g}"} | {0.00 if not taxed else flow.retail_charge_rm:.2f} |
+        | Export Credit | − {flow.exported_kwh:.0f} × {flow.export_rate:.4f} | −{flow.export_credit_rm:.2f} |
+
+        _Note: Only can fully offset Energy Charge only._
+
+        **Subtotal (before tax)**  
+        → **RM {flow.subtotal_rm:.2f}**
+
+        ## ⚡ Taxes & Fees
+
+        **SST ({tariff.sst_rate:.0%})**  
+        {"❌ Waived" if not taxed else f"{flow.subtotal_rm:.2f} × {tariff.sst_rate:.0%} → **RM {flow.sst_rm:.2f}**"}
+
+        **After SST**  
+        {"RM {:.2f}".format(flow.after_sst_rm) if taxed else "RM 0.00"}
+
+        **KWTBB ({tariff.kwtbb_rate:.1%})**  
+        {"❌ Waived" if not taxed else f"{flow.after_sst_rm:.2f} × {tariff.kwtbb_rate:.1%} → **RM {flow.kwtbb_rm:.2f}**"}
+
+        ---
+
+        ### ✅ **Final New Monthly Bill**
+        #### 💰 **RM {flow.final_new_bill_rm:.2f}**
+        """,
+        unsafe_allow_html=True
+    )
 
-            **KWTBB (1.6%)**  
-            {"❌ Waived" if est_kwh < 600 else f"{after_sst_rm:.2f} × 1.6% → **RM {kwtbb_rm:.2f}**"}
+    lap("results")
 
-            ---
 
-            ### ✅ **Final New Monthly Bill**
-            #### 💰 **RM {final_new_bill_rm:.2f}**
-            """,
-            unsafe_allow_html=True
+@st.fragment
+def cash_flow_panel(c):
+    """25-year cash flow of the quote; the payment radio reruns only this fragment."""
+    lap = stage_timing.laps("ui")
+    # Projection and charts are only built while the expander is open
+    with st.expander("📈 25-year cash flow", key="cashflow_open", on_change="rerun") as expander:
+        payment = st.radio(
+            "Payment:",
+            options=list(PAYMENTS),
+            format_func=lambda x: "Cash" if x == "cash" else "Installment (4 years, 8%)",
+            horizontal=True,
+            key="cashflow_payment",
         )
-
+        if expander.open:
+            projection = project(c, payment)
+            irr_text = f"{projection.irr * 100:.1f}%" if np.isfinite(projection.irr) else "n/a (no upfront payment)"
+            payback_text = (
+                f"{projection.discounted_payback_years:.1f} yrs"
+                if np.isfinite(projection.discounted_payback_years) else "not within 25 years"
+            )
+            st.markdown(
+                f"**NPV ({projection.discount_rate:.0%}):** RM {projection.npv_rm:,.0f} · "
+                f"**IRR:** {irr_text} · **Discounted payback:** {payback_text}"
+            )
+            st.caption(
+                f"Panels lose {DEGRADATION_RATE:.1%} a year, tariffs rise {TARIFF_ESCALATION:.0%} a year, "
+                f"O&M of RM {c.om_fee_monthly * 12:,.0f}/year rises {OM_ESCALATION:.0%} a year."
+            )
+            table = projection.table()
+            st.line_chart(table.set_index("Year")["Cumulative (RM)"], y_label="cumulative cash (RM)")
+            st.dataframe(table.round(0), hide_index=True)
+    lap("cash_flow")
+
+
+@st.fragment
+def optimizer_panel(bill, sunlight_hours, daytime_option, online_view):
+    """Payback or NPV across panel counts; the objective radio reruns only this fragment."""
+    lap = stage_timing.laps("ui")
+    # The sweep and its chart are only built while the expander is open
+    with st.expander("🔍 Which panel count pays back fastest?", key="optimizer_open", on_change="rerun") as expander:
+        objective = st.radio(
+            "Optimise for:",
+            options=["payback", "npv"],
+            format_func=lambda x: "Fastest payback" if x == "payback" else "Highest 25-year NPV",
+            horizontal=True,
+            key="optimizer_objective",
+        )
+        if expander.open:
+            sweep = optimize_panels(bill, sunlight_hours, daytime_option, online_view, objective)
+            payback_text = (
+                f"{sweep.best_payback_years:.1f} yrs"
+                if np.isfinite(sweep.best_payback_years) else "not within 25 years"
+            )
+            st.markdown(
+                f"**Best:** {sweep.best_panels} panels, "
+                f"{'with' if sweep.best_battery else 'without'} battery, paid by {sweep.best_payment} — "
+                f"discounted payback {payback_text}, 25-year NPV RM {sweep.best_npv_rm:,.0f}"
+            )
+            curves = {}
+            for with_batt in (False, True):
+                for payment in sweep.payment:
+                    panels, payback, npv = sweep.curve(with_batt, payment)
+                    label = f"{payment}{' + battery' if with_batt else ''}"
+                    curves[label] = np.where(np.isfinite(payback), payback, np.nan) if objective == "payback" else npv
+            st.line_chart(
+                pd.DataFrame(curves, index=pd.Index(panels, name="panels")),
+                y_label="discounted payback (years)" if objective == "payback" else "25-year NPV (RM)",
+            )
+    lap("optimizer")
+
+
+def report_panel(bill, recommended, pkg, c, bands, sens, polling):
+    """PDF report: queued on REPORTS' workers, with a progress bar until its download is ready."""
+    job = st.session_state.get("report_job")
+    if polling and (job is None or job.done()):
+        # A full run redraws this panel without run_every, which stops the polling
+        st.rerun()
+    if job is not None and job.key != pdf_cache_key(bill, pkg, c, bands, sens):
+        job = None  # made for other inputs
+
+    if job is not None and not job.done():
+        ahead = job.position()
+        st.progress(
+            job.progress(),
+            text=f"⏳ Preparing your report ({ahead} ahead of it in the queue)…" if ahead else "⏳ Preparing your report…",
+        )
+    elif job is not None and job.error is None:
+        st.download_button(
+            label="📄 Download Report as PDF",
+            data=job.result,
+            file_name="Solar_Saving_Report.pdf",
+            mime="application/pdf"
+        )
+    else:
+        if job is not None:
+            st.error(f"The report could not be prepared: {job.error}")
+        if st.button("📄 Prepare PDF Report"):
+            try:
+                st.session_state.report_job = REPORTS.submit(bill, recommended, pkg, c, bands, sens)
+            except ReportQueueFull:
+                st.warning("Many reports are being prepared right now, please try again in a few seconds.")
+            else:
+                st.rerun()  # full run: starts the polling, or shows the download of a cached report
+
+
+def stage_timing_panel():
+    """Debug panel: per-stage totals for this server process (SOLAR_STAGE_TIMING=1)."""
+    with st.expander("⏱️ Stage timings (debug)"):
+        stats = stage_timing.snapshot()
+        st.caption("Totals for every session of this server process; one vectorised call counts once.")
+        st.dataframe(pd.DataFrame({
+            "Stage": list(stats),
+            "Calls": [s.calls for s in stats.values()],
+            "Total (ms)": [s.seconds * 1e3 for s in stats.values()],
+            "Mean (ms)": [s.seconds / s.calls * 1e3 for s in stats.values()],
+            "Max (ms)": [s.max_seconds * 1e3 for s in stats.values()],
+        }).round(3), hide_index=True)
+        st.code(stage_timing.prometheus_text(stats), language="text")
+        if st.button("Reset timings"):
+            stage_timing.reset()
+            st.rerun()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    lap = stage_timing.laps("ui")
+    main()
+    lap("rerun")
\ No newline at end of file
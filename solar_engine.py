@@ -0,0 +1,559 @@
+"""
+Quote engine shared by the Streamlit UI, the PDF report and the batch tools.
+
+One pass over the inputs selects the tariff, splits the monthly solar
+generation into direct use, battery and export, bills whatever still comes
+from the grid (energy, network, capacity and retail charges, SST, KWTBB)
+and prices the system:
+
+    quote()        one lead -> Quote(result=QuoteResult, flow=EnergyFlow)
+    quote_batch()  the same code on arrays -> dict of arrays
+
+QuoteResult holds what the report and the metric cards print, EnergyFlow the
+full flow and bill breakdown behind it. calculate_values() and
+calculate_values_batch() remain as the no-battery entry points.
+
+Tariff bands, grid charges, taxes and our prices come from a tariffs.Tariff:
+the active tariff file (tariffs.current_tariff()) unless a tariff= is passed.
+
+The numbered steps are timed as "quote.*" stages when stage_timing is on.
+"""
+import math
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+from stage_timing import laps
+from tariffs import current_tariff
+
+PANEL_WATT = 640
+
+AREA_SUN_MAP = {
+    "Johor Bahru":   3.42,
+    "BP/Muar":       3.56,
+    "Kuala Lumpur":  3.62,
+    "North":         3.75,
+    "Default": 3.5
+}
+
+# Inputs offered by the UI
+DAYTIME_OPTIONS = (0.2, 0.3, 0.5, 0.7)
+PANEL_RANGE = (10, 100)  # panel slider, inclusive
+
+
+
+# --- Display formatting ---
+def _trim2(x):
+    return f"{x:.2f}".rstrip('0').rstrip('.')
+
+def _whole(x):
+    return f"{math.floor(x + 0.5):,}"
+
+# Display label -> (QuoteResult field, formatter)
+QUOTE_DISPLAY_FORMATS = {
+    "No Panels": ("no_panels", "{:.0f}".format),
+    "Recommended Panels": ("recommended_panels", "{:.0f}".format),
+    "kWp": ("kwp", _trim2),
+    "Daily Yield (kWh)": ("daily_yield_kwh", _trim2),
+    "Daytime Saving (kWh)": ("daytime_saving_kwh", _trim2),
+    "Daytime Saving (RM)": ("daily_saving_rm", _whole),
+    "Daily Saving (RM)": ("daily_saving_rm", _whole),
+    "Monthly Saving (RM)": ("monthly_saving_rm", _whole),
+    "Yearly Saving (RM)": ("yearly_saving_rm", _whole),
+    "Total Cost (RM)": ("cost_cash", _whole),
+    "Installment 8% Interests": ("installment_total", _whole),
+    "Installment 4 Years (RM)": ("installment_monthly", "{:,.2f}".format),
+    "monthly_gen_kwh": ("monthly_gen_kwh", _whole),
+    "monthly_kwh": ("monthly_kwh", "{:.2f}".format),
+    "new_monthly": ("new_monthly", _whole),
+    "roi_cash": ("roi_cash", _trim2),
+    "roi_cc": ("roi_cc", _trim2),
+    "save_per_pv": ("save_per_pv", _whole),
+    "kwp_installed": ("kwp", _trim2),
+    "kwac": ("kwac", _trim2),
+    "cost_cash": ("cost_cash", _whole),
+    "cost_cc": ("installment_total", _whole),
+    "om_fee_monthly": ("om_fee_monthly", _whole),
+    "total_fossil": ("total_fossil", _whole),
+    "total_trees": ("total_trees", _whole),
+    "total_co2": ("total_co2", _whole),
+    "general_tariff": ("general_tariff", "{:.4f}".format),
+    "energy_tariff": ("energy_tariff", "{:.4f}".format),
+    "energy_portion_rm": ("energy_portion_rm", _whole),
+    "target_kwh": ("target_kwh", _whole),
+    "per_panel_monthly_total": ("per_panel_monthly_total", _trim2),
+    "per_panel_daytime_kwh": ("per_panel_daytime_kwh", _trim2),
+    "Battery Capacity (kWh)": ("battery_kwh", "{:.0f}".format),
+    "Battery Price (RM)": ("battery_price", _whole),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class QuoteResult:
+    """Unformatted numbers for one quote. Field names match quote_batch() columns."""
+    no_panels: float
+    recommended_panels: float
+    kwp: float
+    daily_yield_kwh: float
+    daytime_saving_kwh: float
+    daily_saving_rm: float
+    monthly_saving_rm: float
+    yearly_saving_rm: float
+    cost_cash: float
+    installment_total: float
+    installment_monthly: float
+    monthly_gen_kwh: float
+    monthly_kwh: float
+    new_monthly: float
+    roi_cash: float
+    roi_cc: float
+    save_per_pv: float
+    kwac: float
+    om_fee_monthly: float
+    total_fossil: float
+    total_trees: float
+    total_co2: float
+    general_tariff: float
+    energy_tariff: float
+    energy_portion_rm: float
+    target_kwh: float
+    per_panel_monthly_total: float
+    per_panel_daytime_kwh: float
+    battery_kwh: float
+    battery_price: float
+    include_battery: bool = False
+
+    def display(self):
+        """Formatted strings keyed by the report labels, built on first access."""
+        return QuoteDisplay(self)
+
+
+class QuoteDisplay(Mapping):
+    """Read-only, lazily formatted view of a QuoteResult (see QUOTE_DISPLAY_FORMATS)."""
+    __slots__ = ("_result", "_formatted")
+
+    def __init__(self, result):
+        self._result = result
+        self._formatted = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._formatted[key]
+        except KeyError:
+            field, fmt = QUOTE_DISPLAY_FORMATS[key]
+            value = self._formatted[key] = fmt(getattr(self._result, field))
+            return value
+
+    def __iter__(self):
+        return iter(QUOTE_DISPLAY_FORMATS)
+
+    def __len__(self):
+        return len(QUOTE_DISPLAY_FORMATS)
+
+
+@dataclass(frozen=True, slots=True)
+class EnergyFlow:
+    """Monthly solar/battery/grid split and the new bill's line items. Field names match quote_batch() columns."""
+    total_solar_kwh: float
+    direct_used_kwh: float
+    battery_charge_kwh: float
+    battery_to_night_kwh: float
+    night_from_grid_kwh: float
+    day_from_grid_kwh: float
+    grid_kwh: float
+    exported_kwh: float
+    export_rate: float
+    energy_rate: float
+    direct_saving_rm: float
+    battery_saving_rm: float
+    export_credit_rm: float
+    total_saving_rm: float
+    energy_charge_rm: float
+    network_charge_rm: float
+    capacity_charge_rm: float
+    retail_charge_rm: float
+    subtotal_rm: float
+    sst_rm: float
+    after_sst_rm: float
+    kwtbb_rm: float
+    final_new_bill_rm: float
+    estimated_saving_rm: float
+
+
+@dataclass(frozen=True, slots=True)
+class Quote:
+    result: QuoteResult
+    flow: EnergyFlow
+
+
+RESULT_FIELDS = tuple(f.name for f in fields(QuoteResult))
+FLOW_FIELDS = tuple(f.name for f in fields(EnergyFlow))
+
+
+def consumption_for_bill(monthly_bill, tariff=None):
+    """Estimated monthly kWh behind a bill (scalar or array), inverting every charge and tax of the tariff."""
+    return (tariff or current_tariff()).kwh_for_bill(monthly_bill)
+
+
+def tariff_for_bill(monthly_bill, tariff=None):
+    """General tariff (RM/kWh, energy + network + capacity) of the usage block a bill falls in."""
+    tariff = tariff or current_tariff()
+    return tariff.general_rate[tariff.usage_block(tariff.kwh_for_bill(monthly_bill))]
+
+
+def recommend_panels(monthly_bill, sunlight_hours, tariff=None):
+    """Panels whose generation covers the estimated consumption: even, within the 10–100 UI slider."""
+    est_kwh = consumption_for_bill(monthly_bill, tariff)
+    per_panel_monthly_total = (PANEL_WATT / 1000) * sunlight_hours * 30
+    raw_needed = math.ceil(est_kwh / per_panel_monthly_total)
+
+    # Force even number
+    if raw_needed % 2 != 0:
+        raw_needed += 1
+
+    return min(max(raw_needed, 10), 100)
+
+
+# Bill-independent values produced by _system(); quote_table precomputes them for the UI grid
+SYSTEM_FIELDS = (
+    "no_panels", "sunlight_hours", "daytime_option", "online_view", "include_battery",
+    "per_panel_monthly_total", "kwp", "total_solar_kwh", "battery_kwh", "battery_price", "storage_kwh",
+    "solar_cost", "cost_cash", "installment_total", "installment_monthly",
+)
+
+
+def _system(no_panels, sunlight_hours, daytime_option, online_view, include_battery, battery_kwh=None,
+            price_factor=1.0, tariff=None):
+    """
+    Everything about a quote that doesn't depend on the bill, as a dict of scalars or arrays.
+
+    battery_kwh overrides the kWp-based battery size (e.g. with candidate sizes
+    from panel_optimizer.optimize_battery()). price_factor scales the
+    panel-count cost tier (sensitivity.py moves it). Prices come from tariff.
+    """
+    tariff = tariff or current_tariff()
+    lap = laps("quote")
+
+    # --- Per-panel generation ---
+    per_panel_monthly_total = (PANEL_WATT / 1000) * sunlight_hours * 30
+
+    # --- System size and battery sizing ---
+    kwp = no_panels * PANEL_WATT / 1000
+    total_solar_kwh = per_panel_monthly_total * no_panels
+    module_kwh = tariff.battery_module_kwh
+    if battery_kwh is None:
+        # solar kWp * kwh_per_kwp (2), rounded down to whole modules, at least min_kwh
+        battery_kwh = np.maximum(tariff.battery_min_kwh, np.floor(kwp * tariff.battery_kwh_per_kwp / module_kwh) * module_kwh)
+    battery_price = (battery_kwh / module_kwh) * tariff.battery_module_price  # RM 3300 per 5 kWh module
+    storage_kwh = np.where(include_battery, battery_kwh, 0)
+
+    # --- Cost tiers (+ online estimation buffer, + battery) ---
+    solar_cost = tariff.solar_price(no_panels) * price_factor
+    solar_cost = solar_cost + np.where(online_view, tariff.online_view_surcharge, 0)
+    cost_cash = solar_cost + np.where(include_battery, battery_price, 0)
+
+    # --- Installments ---
+    INTEREST_RATE = 0.08
+    INSTALLMENT_YEARS = 4
+    installment_total = cost_cash * (1 + INTEREST_RATE)
+    installment_monthly = installment_total / (INSTALLMENT_YEARS * 12)
+    lap("system")
+
+    return {
+        "no_panels": no_panels,
+        "sunlight_hours": sunlight_hours,
+        "daytime_option": daytime_option,
+        "online_view": online_view,
+        "include_battery": include_battery,
+        "per_panel_monthly_total": per_panel_monthly_total,
+        "kwp": kwp,
+        "total_solar_kwh": total_solar_kwh,
+        "battery_kwh": battery_kwh,
+        "battery_price": battery_price,
+        "storage_kwh": storage_kwh,
+        "solar_cost": solar_cost,
+        "cost_cash": cost_cash,
+        "installment_total": installment_total,
+        "installment_monthly": installment_monthly,
+    }
+
+
+# Average-day kWh split produced by _daily_flows(); hourly_sim supplies the same keys from an 8760-hour year
+DAILY_FLOW_KEYS = ("direct_used", "battery_store", "battery_discharge", "night_from_grid", "day_from_grid", "export")
+
+
+def _daily_flows(system, est_kwh):
+    """Average-day solar/battery/grid split in kWh/day, keyed by DAILY_FLOW_KEYS."""
+    daytime_option = system["daytime_option"]
+    storage_kwh = system["storage_kwh"]
+
+    daily_solar = system["total_solar_kwh"] / 30
+    daily_usage = est_kwh / 30
+    daily_day_use = daily_usage * daytime_option
+    daily_night_use = daily_usage * (1 - daytime_option)
+
+    # Solar covers daytime use first; any shortfall is drawn from the grid
+    direct_used_day = np.minimum(daily_solar, daily_day_use)
+    day_from_grid = daily_day_use - direct_used_day
+    excess_after_day = daily_solar - direct_used_day
+
+    # Surplus charges the battery, which offsets night use
+    battery_store = np.where(storage_kwh > 0, np.minimum(excess_after_day, storage_kwh), 0)
+    battery_discharge = np.where(storage_kwh > 0, np.minimum(battery_store, daily_night_use), 0)
+    night_from_grid = daily_night_use - battery_discharge
+
+    # Export only what is left once the battery is full
+    export_kwh_daily = np.maximum(excess_after_day - battery_store, 0)
+
+    return {
+        "direct_used": direct_used_day,
+        "battery_store": battery_store,
+        "battery_discharge": battery_discharge,
+        "night_from_grid": night_from_grid,
+        "day_from_grid": day_from_grid,
+        "export": export_kwh_daily,
+    }
+
+
+def _with_bill(system, monthly_bill, flows=None, export_rate_factor=1.0, sst_rate=None, kwtbb_rate=None,
+               tariff=None):
+    """
+    Complete a _system() dict for a bill: energy flow, new bill, savings and ROI.
+
+    flows, when given, replaces the average-day energy split: kWh/day for
+    every DAILY_FLOW_KEYS entry (e.g. from hourly_sim.simulate_year()).
+    export_rate_factor scales the SMP export rate; sst_rate and kwtbb_rate
+    replace the tariff's tax rates. Like every input they may be arrays.
+    """
+    tariff = tariff or current_tariff()
+    lap = laps("quote")
+    sst_rate = tariff.sst_rate if sst_rate is None else sst_rate
+    kwtbb_rate = tariff.kwtbb_rate if kwtbb_rate is None else kwtbb_rate
+
+    no_panels = system["no_panels"]
+    per_panel_monthly_total = system["per_panel_monthly_total"]
+    kwp = system["kwp"]
+    total_solar_kwh = system["total_solar_kwh"]
+    cost_cash = system["cost_cash"]
+    installment_total = system["installment_total"]
+
+    # --- Step 1: Consumption from the bill, every charge and tax inverted (tariffs.Tariff.kwh_for_bill) ---
+    est_kwh = tariff.kwh_for_bill(monthly_bill)
+    GENERAL_TARIFF = tariff.general_rate[tariff.usage_block(est_kwh)]
+    ENERGY_OFFSET_RATIO = 0.6
+    lap("consumption")
+
+    # --- Step 2: Over-generation target (120%) ---
+    target_kwh = est_kwh * 1.2
+
+    # --- Step 3: Recommended panels (EVEN PANEL RULE, within the 10–100 slider) ---
+    raw_needed = np.ceil(target_kwh / per_panel_monthly_total)
+    raw_needed = raw_needed + (raw_needed % 2 != 0)
+    recommended = np.clip(raw_needed, 10, 100)
+    lap("recommended_panels")
+
+    # --- Step 4: Daily energy flow ---
+    if flows is None:
+        flows = _daily_flows(system, est_kwh)
+    direct_used_day = flows["direct_used"]
+
+    # Convert back to monthly
+    direct_used_kwh = direct_used_day * 30
+    battery_charge_kwh = flows["battery_store"] * 30
+    battery_to_night_kwh = flows["battery_discharge"] * 30
+    night_from_grid_kwh = flows["night_from_grid"] * 30
+    day_from_grid_kwh = flows["day_from_grid"] * 30
+    grid_kwh = night_from_grid_kwh + day_from_grid_kwh
+    exported_kwh = flows["export"] * 30
+    lap("energy_flow")
+
+    # --- Step 5: Savings ---
+    block = tariff.usage_block(est_kwh)  # 600/1500 kWh thresholds: see the tariff file
+    export_rate = tariff.export_rate[block] * export_rate_factor  # fixed SMP rate
+    direct_saving_rm = direct_used_kwh * GENERAL_TARIFF
+    battery_saving_rm = battery_to_night_kwh * GENERAL_TARIFF
+    export_credit_rm = exported_kwh * export_rate
+    total_saving_rm = direct_saving_rm + battery_saving_rm + export_credit_rm
+    lap("savings")
+
+    # --- Step 6: New bill for the energy still drawn from the grid ---
+    energy_rate = tariff.energy_rate[block]
+    energy_charge_rm = grid_kwh * energy_rate
+    network_charge_rm = grid_kwh * tariff.network_rate
+    capacity_charge_rm = grid_kwh * tariff.capacity_rate
+    taxed = est_kwh >= tariff.tax_threshold_kwh
+    retail_charge_rm = np.where(taxed, tariff.retail_charge, 0.0)
+
+    # Export credit only offsets the energy charge
+    energy_charge_after_offset = np.maximum(energy_charge_rm - export_credit_rm, 0)
+    subtotal_rm = (
+        energy_charge_after_offset
+        + network_charge_rm
+        + capacity_charge_rm
+        + retail_charge_rm
+    )
+
+    # SST first, KWTBB after SST (both waived below the tax threshold, 600 kWh)
+    sst_rm = np.where(taxed, subtotal_rm * sst_rate, 0.0)
+    after_sst_rm = subtotal_rm + sst_rm
+    kwtbb_rm = np.where(taxed, after_sst_rm * kwtbb_rate, 0.0)
+    final_new_bill_rm = np.where(taxed, after_sst_rm + kwtbb_rm, subtotal_rm)
+
+    # A bill inside a jump of bill(kWh) maps to the threshold's kWh, whose bill is either below it
+    # (just above the 1500 kWh block: the excess isn't counted) or above it (just below the 600 kWh
+    # tax threshold); measure the saving from the lower of the two, never more than the customer pays
+    baseline_bill = np.minimum(monthly_bill, tariff.modelled_bill(monthly_bill))
+    estimated_saving = np.maximum(baseline_bill - final_new_bill_rm, 0)
+    lap("new_bill")
+
+    # --- Step 7: ROI ---
+    yearly_saving = estimated_saving * 12
+    has_saving = yearly_saving != 0
+    safe_saving = np.where(has_saving, yearly_saving, 1.0)
+    roi_cash = np.where(has_saving, cost_cash / safe_saving, np.inf)
+    roi_cc = np.where(has_saving, installment_total / safe_saving, np.inf)
+    save_per_pv = np.where(no_panels != 0, yearly_saving / np.where(no_panels != 0, no_panels, 1), 0.0)
+    lap("roi")
+
+    return {
+        # QuoteResult
+        "no_panels": no_panels,
+        "recommended_panels": recommended,
+        "kwp": kwp,
+        "daily_yield_kwh": total_solar_kwh / 30,
+        "daytime_saving_kwh": direct_used_day,
+        "daily_saving_rm": estimated_saving / 30,
+        "monthly_saving_rm": estimated_saving,
+        "yearly_saving_rm": yearly_saving,
+        "cost_cash": cost_cash,
+        "installment_total": installment_total,
+        "installment_monthly": system["installment_monthly"],
+        "monthly_gen_kwh": no_panels * per_panel_monthly_total,
+        "monthly_kwh": est_kwh,
+        "new_monthly": final_new_bill_rm,
+        "roi_cash": roi_cash,
+        "roi_cc": roi_cc,
+        "save_per_pv": save_per_pv,
+        "kwac": kwp * 0.9,
+        "om_fee_monthly": system["solar_cost"] * 0.01 / 12,
+        "total_fossil": 350 * kwp,
+        "total_trees": 2 * kwp,
+        "total_co2": 0.85 * kwp,
+        "general_tariff": GENERAL_TARIFF,
+        "energy_tariff": GENERAL_TARIFF,
+        "energy_portion_rm": monthly_bill * ENERGY_OFFSET_RATIO,
+        "target_kwh": target_kwh,
+        "per_panel_monthly_total": per_panel_monthly_total,
+        "per_panel_daytime_kwh": per_panel_monthly_total,
+        "battery_kwh": system["battery_kwh"],
+        "battery_price": system["battery_price"],
+        "include_battery": system["include_battery"],
+        # EnergyFlow
+        "total_solar_kwh": total_solar_kwh,
+        "direct_used_kwh": direct_used_kwh,
+        "battery_charge_kwh": battery_charge_kwh,
+        "battery_to_night_kwh": battery_to_night_kwh,
+        "night_from_grid_kwh": night_from_grid_kwh,
+        "day_from_grid_kwh": day_from_grid_kwh,
+        "grid_kwh": grid_kwh,
+        "exported_kwh": exported_kwh,
+        "export_rate": export_rate,
+        "energy_rate": energy_rate,
+        "direct_saving_rm": direct_saving_rm,
+        "battery_saving_rm": battery_saving_rm,
+        "export_credit_rm": export_credit_rm,
+        "total_saving_rm": total_saving_rm,
+        "energy_charge_rm": energy_charge_rm,
+        "network_charge_rm": network_charge_rm,
+        "capacity_charge_rm": capacity_charge_rm,
+        "retail_charge_rm": retail_charge_rm,
+        "subtotal_rm": subtotal_rm,
+        "sst_rm": sst_rm,
+        "after_sst_rm": after_sst_rm,
+        "kwtbb_rm": kwtbb_rm,
+        "final_new_bill_rm": final_new_bill_rm,
+        "estimated_saving_rm": estimated_saving,
+    }
+
+
+def _compute(no_panels, sunlight_hours, monthly_bill, daytime_option, online_view, include_battery, flows=None,
+             price_factor=1.0, tariff=None, **bill_rates):
+    """
+    The whole quote on scalars or broadcastable arrays.
+
+    price_factor goes to _system(), bill_rates (export_rate_factor,
+    sst_rate, kwtbb_rate) to _with_bill(); both use the same tariff.
+    """
+    tariff = tariff or current_tariff()
+    system = _system(no_panels, sunlight_hours, daytime_option, online_view, include_battery,
+                     price_factor=price_factor, tariff=tariff)
+    return _with_bill(system, monthly_bill, flows, tariff=tariff, **bill_rates)
+
+
+def _quote_at(r, i, no_panels):
+    """Quote for element i of a _with_bill() dict (i=() for scalars); no_panels is kept as given."""
+    result = {k: float(r[k][i]) for k in RESULT_FIELDS}
+    result["no_panels"] = no_panels
+    result["include_battery"] = bool(r["include_battery"][i])
+    return Quote(
+        result=QuoteResult(**result),
+        flow=EnergyFlow(**{k: float(r[k][i]) for k in FLOW_FIELDS}),
+    )
+
+
+def quote(no_panels, sunlight_hours, monthly_bill, daytime_option=0.7, online_view=False, include_battery=False,
+          flows=None, tariff=None):
+    """
+    Price one lead. Raises ValueError for a negative bill.
+
+    flows optionally overrides the average-day energy split (see _with_bill());
+    hourly_sim.quote_hourly() uses it to price an 8760-hour simulation.
+    """
+    tariff = tariff or current_tariff()
+    monthly_bill = float(monthly_bill) if monthly_bill else 0.0
+    if monthly_bill < 0:
+        raise ValueError("The monthly bill cannot be negative")
+
+    r = _compute(no_panels, float(sunlight_hours), monthly_bill, float(daytime_option),
+                 bool(online_view), bool(include_battery), flows, tariff=tariff)
+    return _quote_at({k: np.asarray(v) for k, v in r.items()}, (), no_panels)
+
+
+def quote_batch(no_panels, sunlight_hours, monthly_bill, daytime_option=0.7, online_view=False, include_battery=False,
+                tariff=None):
+    """
+    quote() for many leads at once.
+
+    Every argument may be a scalar or an array (e.g. a DataFrame column); they
+    are broadcast together. Returns a dict of NumPy arrays keyed by the
+    QuoteResult and EnergyFlow field names, plus "valid". Negative bills are
+    flagged False in "valid" and their outputs are NaN; missing bills count as 0.
+    """
+    tariff = tariff or current_tariff()
+    no_panels, sunlight_hours, monthly_bill, daytime_option, online_view, include_battery = np.broadcast_arrays(
+        np.asarray(no_panels, dtype=float),
+        np.asarray(sunlight_hours, dtype=float),
+        np.nan_to_num(np.asarray(monthly_bill, dtype=float)),
+        np.asarray(daytime_option, dtype=float),
+        np.asarray(online_view, dtype=bool),
+        np.asarray(include_battery, dtype=bool),
+    )
+    r = _compute(no_panels, sunlight_hours, monthly_bill, daytime_option, online_view, include_battery, tariff=tariff)
+
+    valid = monthly_bill >= 0
+    out = {"valid": valid}
+    for k, v in r.items():
+        v = np.broadcast_to(v, valid.shape)
+        out[k] = v if v.dtype == bool else np.where(valid, v, np.nan)
+    return out
+
+
+def calculate_values(no_panels, sunlight_hours, monthly_bill, daytime_option=0.7, online_view=False):
+    """QuoteResult for a quote without battery storage."""
+    return quote(no_panels, sunlight_hours, monthly_bill, daytime_option, online_view).result
+
+
+def calculate_values_batch(no_panels, sunlight_hours, monthly_bill, daytime_option=0.7, online_view=False):
+    """quote_batch() without battery storage."""
+    return quote_batch(no_panels, sunlight_hours, monthly_bill, daytime_option, online_view)
@@ -0,0 +1,104 @@
+"""
+Per-stage wall time and call counts for the quote engine, the PDF report and the UI.
+
+Hot paths mark the end of each of their stages:
+
+    lap = laps("quote")
+    ...                         # Step 1
+    lap("consumption")
+    ...                         # Step 2-3
+    lap("recommended_panels")
+
+Each lap adds the time since the previous lap (or since laps()) to its
+stage, here "quote.consumption" and "quote.recommended_panels", and counts
+one call. A vectorised call over many quotes is one call.
+
+Timing is off unless SOLAR_STAGE_TIMING=1 is set or enable() turns it on.
+While it is off, laps() hands out a shared no-op, so an instrumented stage
+costs one empty function call and reads no clock.
+
+snapshot() returns the totals so far, prometheus_text() the same in the
+Prometheus text exposition format. quote_api.py serves that at /metrics,
+and the Streamlit UI shows a debug panel while timing is on.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+StageStats = namedtuple("StageStats", ["calls", "seconds", "max_seconds"])
+
+_enabled = os.environ.get("SOLAR_STAGE_TIMING", "").strip().lower() in {"1", "y", "yes", "true", "on"}
+_stats = {}             # stage -> [calls, seconds, max_seconds]
+_lock = threading.Lock()
+
+
+def _noop(stage):
+    pass
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    """Turn timing on or off for the whole process; totals recorded so far are kept."""
+    global _enabled
+    _enabled = bool(on)
+
+
+def laps(prefix):
+    """A lap(stage) function for one pass through an instrumented function (the no-op while disabled)."""
+    if not _enabled:
+        return _noop
+    clock = time.perf_counter
+    last = clock()
+
+    def lap(stage):
+        nonlocal last
+        now = clock()
+        _record(f"{prefix}.{stage}", now - last)
+        last = clock()  # leave the bookkeeping out of the next stage
+
+    return lap
+
+
+def _record(stage, seconds):
+    with _lock:
+        stats = _stats.get(stage)
+        if stats is None:
+            stats = _stats[stage] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += seconds
+        if seconds > stats[2]:
+            stats[2] = seconds
+
+
+def snapshot():
+    """{stage: StageStats} recorded since start-up or the last reset(), in stage order."""
+    with _lock:
+        return {stage: StageStats(*stats) for stage, stats in sorted(_stats.items())}
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def prometheus_text(stats=None):
+    """Stage totals in the Prometheus text format (version 0.0.4)."""
+    stats = snapshot() if stats is None else stats
+    lines = [
+        "# HELP solar_stage_timing_enabled Whether stage timing is recording (1) or off (0).",
+        "# TYPE solar_stage_timing_enabled gauge",
+        f"solar_stage_timing_enabled {int(_enabled)}",
+    ]
+    for name, kind, help_text, field in (
+        ("solar_stage_calls_total", "counter", "Calls of each stage.", "calls"),
+        ("solar_stage_seconds_total", "counter", "Wall time spent in each stage.", "seconds"),
+        ("solar_stage_max_seconds", "gauge", "Longest single call of each stage.", "max_seconds"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f'{name}{{stage="{stage}"}} {getattr(s, field):.9g}' for stage, s in stats.items())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,278 @@
+"""
+Tariff and price tables, read from a versioned JSON file.
+
+Everything the engine used to hard-code about the grid tariff and our
+prices lives in tariff_data/<version>.json (schema SCHEMA_VERSION):
+
+    usage_blocks       energy and SMP export rate, by monthly kWh
+    network_rate, capacity_rate, retail_charge, tax_threshold_kwh,
+    sst_rate, kwtbb_rate
+    pricing            panel-count cost tiers, the online-view surcharge and
+                       battery module size, price and sizing rule
+
+load_tariff() parses a file once into a Tariff of sorted NumPy arrays.
+Band lookups are a bisect for one value and np.searchsorted for arrays,
+so they are O(log n) in the number of bands. The Tariff also tabulates
+the piecewise-linear bill(kWh) those charges add up to, so a customer's
+consumption is recovered from their bill (kwh_for_bill()) by the same
+kind of binary search, for any bill.
+
+current_tariff() is the tariff the engine uses unless it is handed one.
+It is read from TARIFF_FILE (env SOLAR_TARIFF_FILE) and re-read when the
+file changes on disk, checked at most every RELOAD_CHECK_SECONDS: editing
+the file hot-reloads a running server. A file that fails to parse is
+reported and the previous tariff stays active. Functions registered with
+on_reload() are called with each new tariff (e.g. to drop cached quotes).
+To re-quote leads under another version, load it and pass it on:
+
+    quote_batch(..., tariff=load_tariff("tariff_data/<version>.json"))
+"""
+import bisect
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TARIFF_DIR = os.path.join(BASE_DIR, "tariff_data")
+TARIFF_FILE = os.environ.get("SOLAR_TARIFF_FILE", os.path.join(TARIFF_DIR, "tnb-2025-07.json"))
+SCHEMA_VERSION = 2  # 2: consumption from the full bill; no general_tariff bill bands
+RELOAD_CHECK_SECONDS = 2.0
+
+
+@dataclass(frozen=True, eq=False)
+class Tariff:
+    """One parsed tariff file. Band arrays are sorted; see the module docstring for the fields."""
+    version: str
+    fingerprint: str            # hash of the file contents, for cache keys
+    # Usage blocks: block i covers up to block_max_kwh[i] (the last is open-ended)
+    block_max_kwh: np.ndarray
+    energy_rate: np.ndarray
+    export_rate: np.ndarray
+    network_rate: float
+    capacity_rate: float
+    retail_charge: float
+    tax_threshold_kwh: float
+    sst_rate: float
+    kwtbb_rate: float
+    # Panel tiers: from tier_min_panels[i] on, price = tier_base_price[i] + extra panels * tier_per_panel[i]
+    tier_min_panels: np.ndarray
+    tier_base_price: np.ndarray
+    tier_per_panel: np.ndarray
+    online_view_surcharge: float
+    battery_module_kwh: float
+    battery_module_price: float
+    battery_kwh_per_kwp: float
+    battery_min_kwh: float
+
+    def __post_init__(self):
+        # bill(kWh) is linear between the usage-block and tax thresholds: segment i starts at
+        # knot_kwh[i] with bill knot_bill[i] and rises by knot_slope[i] RM/kWh up to knot_kwh[i + 1]
+        knots = np.unique(np.concatenate((
+            [0.0, self.tax_threshold_kwh], self.block_max_kwh[np.isfinite(self.block_max_kwh)],
+        )))
+        ends = np.append(knots[1:], np.inf)
+        inside = np.where(np.isfinite(ends), (knots + ends) / 2, knots + 1)  # one kWh value within each segment
+        taxed = inside >= self.tax_threshold_kwh
+        factor = np.where(taxed, (1 + self.sst_rate) * (1 + self.kwtbb_rate), 1.0)
+        slope = self.general_rate[self.usage_block(inside)] * factor
+        start = slope * knots + np.where(taxed, self.retail_charge, 0.0) * factor
+        with np.errstate(invalid="ignore"):
+            end_bill = np.where(np.isfinite(ends), start + slope * (ends - knots), np.inf)  # just before the next knot
+        for name, value in (("knot_kwh", knots), ("knot_end_kwh", ends), ("knot_bill", start), ("knot_slope", slope),
+                            ("knot_end_bill", end_bill)):
+            value.flags.writeable = False
+            object.__setattr__(self, name, value)
+        # Plain-float copies for the scalar bisect
+        object.__setattr__(self, "_knots", tuple(a.tolist() for a in (knots, ends, start, slope)))
+
+    @property
+    def general_rate(self):
+        """RM per kWh drawn from the grid in each usage block before taxes: energy + network + capacity."""
+        return self.energy_rate + self.network_rate + self.capacity_rate
+
+    def usage_block(self, monthly_kwh):
+        """Index of the usage block for a scalar or array of monthly kWh."""
+        return np.searchsorted(self.block_max_kwh[:-1], monthly_kwh, side="left")
+
+    def bill_for_kwh(self, monthly_kwh):
+        """The monthly bill (RM) for a consumption: every charge, retail, SST and KWTBB, as the engine bills it."""
+        monthly_kwh = np.asarray(monthly_kwh, dtype=float)
+        taxed = monthly_kwh >= self.tax_threshold_kwh
+        subtotal = monthly_kwh * self.general_rate[self.usage_block(monthly_kwh)] + np.where(taxed, self.retail_charge, 0.0)
+        return np.where(taxed, subtotal * (1 + self.sst_rate) * (1 + self.kwtbb_rate), subtotal)
+
+    def kwh_for_bill(self, monthly_bill):
+        """
+        Monthly kWh whose bill is monthly_bill: bill_for_kwh() inverted by binary search over its segments.
+
+        Works on a scalar (bisect, returns a NumPy float) or an array (np.searchsorted).
+        bill(kWh) jumps up at the thresholds (retail charge and taxes at
+        tax_threshold_kwh, a dearer energy rate above a block); a bill inside
+        such a jump maps to the threshold itself. Bills below zero give 0.
+        """
+        if np.ndim(monthly_bill) == 0:
+            knots, ends, start, slope = self._knots
+            i = max(bisect.bisect_right(start, monthly_bill) - 1, 0)
+            return np.float64(max(min(knots[i] + (monthly_bill - start[i]) / slope[i], ends[i]), 0.0))
+        i = np.maximum(np.searchsorted(self.knot_bill, monthly_bill, side="right") - 1, 0)
+        kwh = self.knot_kwh[i] + (monthly_bill - self.knot_bill[i]) / self.knot_slope[i]
+        return np.maximum(np.minimum(kwh, self.knot_end_kwh[i]), 0.0)
+
+    def modelled_bill(self, monthly_bill):
+        """
+        bill_for_kwh(kwh_for_bill(monthly_bill)): the bill itself, except that
+        a bill inside a jump becomes the bill at the threshold it maps to.
+        """
+        monthly_bill = np.asarray(monthly_bill, dtype=float)
+        billed = self.bill_for_kwh(self.kwh_for_bill(monthly_bill))
+        # Compared rather than looked up by segment: a threshold bills like the segment above it
+        # (taxes from tax_threshold_kwh) or below it (block_max_kwh is still that block)
+        return np.where(np.isclose(billed, monthly_bill, rtol=1e-9, atol=1e-6), monthly_bill, billed)
+
+    def solar_price(self, no_panels):
+        """Panel-count cost tier price (before the online-view surcharge and any battery)."""
+        i = np.maximum(np.searchsorted(self.tier_min_panels, no_panels, side="right") - 1, 0)
+        return self.tier_base_price[i] + (no_panels - self.tier_min_panels[i]) * self.tier_per_panel[i]
+
+
+def _sorted_rows(rows, key, what):
+    if not rows:
+        raise ValueError(f"{what}: at least one entry is required")
+    rows = sorted(rows, key=key)
+    if any(key(a) == key(b) for a, b in zip(rows, rows[1:])):
+        raise ValueError(f"{what}: duplicate band start")
+    return rows
+
+
+def _array(values):
+    a = np.array(values, dtype=float)
+    a.flags.writeable = False
+    return a
+
+
+def parse_tariff(data, fingerprint=""):
+    """Tariff from an already-decoded tariff document; ValueError if it doesn't fit the schema."""
+    if data.get("schema") != SCHEMA_VERSION:
+        raise ValueError(f"unsupported tariff schema {data.get('schema')!r}, expected {SCHEMA_VERSION}")
+    try:
+        blocks = _sorted_rows(data["usage_blocks"], lambda b: np.inf if b["max_kwh"] is None else b["max_kwh"],
+                              "usage_blocks")
+        pricing = data["pricing"]
+        tiers = _sorted_rows(pricing["panel_tiers"], lambda t: t["min_panels"], "panel_tiers")
+        battery = pricing["battery"]
+
+        if blocks[-1]["max_kwh"] is not None:
+            raise ValueError("usage_blocks: the last block must have max_kwh null")
+
+        return Tariff(
+            version=str(data["version"]),
+            fingerprint=fingerprint,
+            block_max_kwh=_array([np.inf if b["max_kwh"] is None else b["max_kwh"] for b in blocks]),
+            energy_rate=_array([b["energy_rate"] for b in blocks]),
+            export_rate=_array([b["export_rate"] for b in blocks]),
+            network_rate=float(data["network_rate"]),
+            capacity_rate=float(data["capacity_rate"]),
+            retail_charge=float(data["retail_charge"]),
+            tax_threshold_kwh=float(data["tax_threshold_kwh"]),
+            sst_rate=float(data["sst_rate"]),
+            kwtbb_rate=float(data["kwtbb_rate"]),
+            tier_min_panels=_array([t["min_panels"] for t in tiers]),
+            tier_base_price=_array([t["base_price"] for t in tiers]),
+            tier_per_panel=_array([t["per_panel"] for t in tiers]),
+            online_view_surcharge=float(pricing["online_view_surcharge"]),
+            battery_module_kwh=float(battery["module_kwh"]),
+            battery_module_price=float(battery["module_price"]),
+            battery_kwh_per_kwp=float(battery["kwh_per_kwp"]),
+            battery_min_kwh=float(battery["min_kwh"]),
+        )
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"malformed tariff: {e!r}") from None
+
+
+def load_tariff(path=TARIFF_FILE):
+    """Read and parse one tariff file. Raises OSError or ValueError."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{path}: {e}") from None
+    return parse_tariff(data, hashlib.sha1(raw).hexdigest()[:12])
+
+
+_active = None          # (path, file signature, Tariff)
+_checked_at = 0.0
+_lock = threading.Lock()
+_listeners = []
+
+
+def _signature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _activate(path, signature, tariff):
+    global _active
+    changed = _active is not None and _active[2].fingerprint != tariff.fingerprint
+    _active = (path, signature, tariff)
+    if changed:
+        for listener in list(_listeners):
+            listener(tariff)
+
+
+def current_tariff():
+    """The active tariff, re-read from its file when that changed on disk."""
+    global _checked_at
+    active = _active
+    now = time.monotonic()
+    if active is not None and now - _checked_at < RELOAD_CHECK_SECONDS:
+        return active[2]
+    with _lock:
+        active = _active
+        path = active[0] if active else TARIFF_FILE
+        try:
+            signature = _signature(path)
+        except OSError:
+            if active is None:
+                raise
+            signature = active[1]  # file briefly missing mid-save: keep what we have
+        if active is None or signature != active[1]:
+            try:
+                _activate(path, signature, load_tariff(path))
+            except (OSError, ValueError) as e:
+                if active is None:
+                    raise
+                print(f"Tariff reload failed, keeping {active[2].version}: {e}", file=sys.stderr)
+                _activate(path, signature, active[2])  # don't retry until the file changes again
+        _checked_at = now
+        return _active[2]
+
+
+def reload_tariff(path=None):
+    """Load path (default: the active file) now and make it the active tariff. Raises on a bad file."""
+    global _checked_at
+    with _lock:
+        path = path or (_active[0] if _active else TARIFF_FILE)
+        signature = _signature(path)
+        _activate(path, signature, load_tariff(path))
+        _checked_at = time.monotonic()
+        return _active[2]
+
+
+def on_reload(listener):
+    """Call listener(tariff) whenever a different tariff becomes active."""
+    _listeners.append(listener)
+    return listener
+
+
+if __name__ == "__main__":
+    t = load_tariff(sys.argv[1] if len(sys.argv) > 1 else TARIFF_FILE)
+    print(f"{t.version} ({t.fingerprint}): {len(t.energy_rate)} usage blocks, {len(t.tier_base_price)} panel tiers")
+    for kwh, bill, slope in zip(t.knot_kwh, t.knot_bill, t.knot_slope):
+        print(f"  from {kwh:7,.0f} kWh: RM {bill:9,.2f} + RM {slope:.4f}/kWh")
@@ -0,0 +1,95 @@
+"""
+Input validation of the quote API: every bad lead is a 400, never a 500.
+
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import quote_api  # noqa: E402
+from quote_api import PooledHTTPServer, parse_lead  # noqa: E402
+
+HUGE_INT = int("1" * 401)  # valid JSON, too large for a float
+
+
+@pytest.mark.parametrize("body", [
+    [450],
+    {},
+    {"bill": 450, "colour": "red"},
+    {"bill": "450"},
+    {"bill": True},
+    {"bill": -1},
+    {"bill": HUGE_INT},
+    {"bill": 450, "area": "Atlantis"},
+    {"bill": 450, "area": ["Kuala Lumpur"]},
+    {"bill": 450, "daytime": -0.1},
+    {"bill": 450, "daytime": 1.5},
+    {"bill": 450, "daytime": 30.5},
+    {"bill": 450, "daytime": 101},
+    {"bill": 450, "daytime": HUGE_INT},
+    {"bill": 450, "panels": 9},
+    {"bill": 450, "panels": 101},
+    {"bill": 450, "panels": 1e9},
+    {"bill": 450, "panels": 20.5},
+    {"bill": 450, "panels": HUGE_INT},
+    {"bill": 450, "battery": "yes"},
+])
+def test_bad_leads_are_rejected(body):
+    with pytest.raises(ValueError):
+        parse_lead(body)
+
+
+@pytest.mark.parametrize("daytime, share", [(0, 0.0), (0.3, 0.3), (1, 1.0), (30, 0.3), (100, 1.0), (70.0, 0.7)])
+def test_daytime_share_or_whole_percentage(daytime, share):
+    assert parse_lead({"bill": 450, "daytime": daytime})[0]["daytime"] == pytest.approx(share)
+
+
+def test_default_panels_are_in_range():
+    for bill in (0, 50, 450, 5_000, 100_000):
+        lead, _ = parse_lead({"bill": bill})
+        assert quote_api.PANEL_RANGE[0] <= lead["panels"] <= quote_api.PANEL_RANGE[1]
+
+
+@pytest.fixture(scope="module")
+def api_url():
+    server = PooledHTTPServer(("127.0.0.1", 0), workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def _post(url, raw):
+    request = urllib.request.Request(url, raw, {"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize("raw", [
+    pytest.param(b'{"bill": ' + b"1" * 401 + b"}", id="huge-int"),
+    pytest.param(b'{"bill": 450, "area": ["x"]}', id="area-list"),
+    pytest.param(b'{"bill": 450, "panels": 1e9}', id="panels-1e9"),
+    pytest.param(b'{"bill": 450, "daytime": 1.5}', id="daytime-1.5"),
+])
+def test_bad_leads_are_400_over_http(api_url, raw):
+    status, body = _post(api_url + "/quote", raw)
+    assert status == 400, body
+    assert "error" in body
+
+
+def test_good_lead_over_http(api_url):
+    status, body = _post(api_url + "/quote", b'{"bill": 450, "daytime": 30}')
+    assert status == 200
+    assert body["lead"]["daytime"] == pytest.approx(0.3)
@@ -0,0 +1,123 @@
+"""
+Regression tests for consumption from the full tiered bill (Tariff.kwh_for_bill).
+
+    python -m pytest tests
+
+Everything runs on the shipped tariff file, so an edit to it or to the
+engine that moves customers' quotes fails here first.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from quote_table import table_quote  # noqa: E402
+from solar_engine import (  # noqa: E402
+    AREA_SUN_MAP, DAYTIME_OPTIONS, FLOW_FIELDS, PANEL_RANGE, RESULT_FIELDS, quote, quote_batch,
+)
+from tariffs import TARIFF_DIR, current_tariff, load_tariff  # noqa: E402
+
+SHIPPED_TARIFF = os.path.join(TARIFF_DIR, "tnb-2025-07.json")
+SEED = 20240501
+
+
+@pytest.fixture(scope="module")
+def tariff():
+    return load_tariff(SHIPPED_TARIFF)
+
+
+def _bills(tariff, n=2_000):
+    """Random bills over every segment, plus each knot and both edges of each jump."""
+    rng = np.random.default_rng(SEED)
+    edges = np.concatenate((tariff.knot_bill, tariff.knot_end_bill[np.isfinite(tariff.knot_end_bill)]))
+    return np.concatenate((rng.uniform(0, 3_000, n), edges, np.nextafter(edges, 0), np.nextafter(edges, np.inf)))
+
+
+def _jumps(tariff):
+    """(bill just below, bill at, kWh) for each threshold where bill(kWh) jumps up."""
+    return [(tariff.knot_end_bill[i - 1], tariff.knot_bill[i], tariff.knot_kwh[i])
+            for i in range(1, len(tariff.knot_kwh)) if tariff.knot_bill[i] > tariff.knot_end_bill[i - 1]]
+
+
+def test_known_consumption(tariff):
+    # Pinned: a change here re-prices every quote
+    assert tariff.kwh_for_bill(450.0) == pytest.approx(900.5289, abs=1e-4)
+    assert tariff.kwh_for_bill(0.0) == 0.0
+    assert tariff.kwh_for_bill(-5.0) == 0.0
+    assert [(round(float(lo), 2), round(float(hi), 2), float(kwh)) for lo, hi, kwh in _jumps(tariff)] == \
+        [(266.58, 303.49, 600.0), (742.26, 906.85, 1500.0)]
+
+
+def test_scalar_and_array_agree(tariff):
+    bills = _bills(tariff)
+    scalar = np.array([tariff.kwh_for_bill(b) for b in bills.tolist()])
+    np.testing.assert_allclose(tariff.kwh_for_bill(bills), scalar, rtol=1e-12, atol=1e-9)
+
+
+def test_round_trip(tariff):
+    bills = _bills(tariff)
+    modelled = tariff.modelled_bill(bills)
+    np.testing.assert_allclose(tariff.bill_for_kwh(tariff.kwh_for_bill(bills)), modelled, rtol=1e-12, atol=1e-9)
+
+    # Which edge of a jump is billed exactly depends on the threshold; skip both
+    in_jump = np.zeros(bills.shape, dtype=bool)
+    for lo, hi, _ in _jumps(tariff):
+        in_jump |= (bills >= lo) & (bills <= hi)
+    np.testing.assert_allclose(modelled[~in_jump], bills[~in_jump], rtol=1e-12, atol=1e-9)
+
+
+def test_bills_inside_a_jump_map_to_the_threshold(tariff):
+    for lo, hi, kwh in _jumps(tariff):
+        bills = np.linspace(lo, hi, 50)[1:-1]
+        assert np.all(tariff.kwh_for_bill(bills) == kwh)
+        assert all(tariff.kwh_for_bill(b) == kwh for b in bills.tolist())
+        np.testing.assert_allclose(tariff.modelled_bill(bills), tariff.bill_for_kwh(kwh), rtol=1e-12)
+
+
+@pytest.mark.parametrize("include_battery", [False, True])
+def test_saving_inside_a_jump_is_never_more_than_the_bill(tariff, include_battery):
+    for lo, hi, kwh in _jumps(tariff):
+        threshold_bill = float(tariff.bill_for_kwh(kwh))
+        for bill in np.linspace(lo, hi, 12)[1:-1].tolist():
+            r = quote(100, 3.75, bill, 0.7, include_battery=include_battery, tariff=tariff).result
+            assert r.monthly_saving_rm <= bill
+            # Measured from what the customer pays, or from the threshold's bill if that is lower
+            # (the excess of a bill just above the 1500 kWh block is not saved)
+            assert r.monthly_saving_rm == pytest.approx(min(bill, threshold_bill) - r.new_monthly, rel=1e-12)
+            if bill < threshold_bill:
+                assert r.monthly_saving_rm == pytest.approx(bill - r.new_monthly, rel=1e-12)
+
+
+def _leads(n=500):
+    rng = np.random.default_rng(SEED)
+    return list(zip(
+        rng.integers(PANEL_RANGE[0], PANEL_RANGE[1] + 1, n).tolist(),
+        rng.choice(np.array(list(AREA_SUN_MAP.values())), n).tolist(),
+        np.round(rng.uniform(0, 3_000, n), 2).tolist(),
+        rng.choice(np.array(DAYTIME_OPTIONS), n).tolist(),
+        (rng.random(n) < 0.2).tolist(),
+        (rng.random(n) < 0.3).tolist(),
+    ))
+
+
+def test_quote_quote_batch_and_table_agree():
+    tariff = current_tariff()  # table_quote() always prices with the active tariff
+    leads = _leads()
+    batch = quote_batch(*(np.array(column) for column in zip(*leads)), tariff=tariff)
+    assert batch["valid"].all()
+    for i, lead in enumerate(leads):
+        q = quote(*lead, tariff=tariff)
+        table = table_quote(*lead)
+        assert table is not None, lead
+        for field in RESULT_FIELDS:
+            expected = getattr(q.result, field)
+            np.testing.assert_allclose(batch[field][i], expected, rtol=1e-9, err_msg=f"{lead} {field}")
+            np.testing.assert_allclose(getattr(table.result, field), expected, rtol=1e-9,
+                                       err_msg=f"{lead} {field}")
+        for field in FLOW_FIELDS:
+            np.testing.assert_allclose(batch[field][i], getattr(q.flow, field), rtol=1e-9,
+                                       err_msg=f"{lead} {field}")